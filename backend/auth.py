@@ -1,44 +1,173 @@
 import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+
 import jwt
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from concurrency import run_blocking
+from logs import get_logger
+from metrics import stage
+
+log = get_logger("auth")
+
+# Clerk Dashboard -> API Keys -> JWKS URL (optional, enables key rotation)
+JWKS_URL = os.getenv("CLERK_JWKS_URL")
+JWKS_REFRESH_SECONDS = int(os.getenv("CLERK_JWKS_REFRESH_SECONDS", "3600"))
+# Unknown kids trigger a refetch, but not more often than this
+JWKS_MIN_REFETCH_SECONDS = 30
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+
+
+def load_public_key(raw):
+    """Parse the PEM from env (with or without header lines) into a key object once."""
+    if not raw:
+        return None
+    # Robust PEM formatting
+    key_body = raw.replace("-----BEGIN PUBLIC KEY-----", "").replace("-----END PUBLIC KEY-----", "").strip()
+    public_key_pem = f"-----BEGIN PUBLIC KEY-----\n{key_body}\n-----END PUBLIC KEY-----"
+    return load_pem_public_key(public_key_pem.encode())
+
+
+class JWKSKeyStore:
+    """
+    kid -> public key cache for a JWKS endpoint. Refreshed in the
+    background and on demand when a token carries an unseen kid.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._client = jwt.PyJWKClient(url, cache_jwk_set=False)
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self):
+        return self._fetched_at > 0
+
+    async def refresh(self):
+        jwk_set = await run_blocking(self._client.get_jwk_set, True)
+        self._keys = {k.key_id: k.key for k in jwk_set.keys if k.key_id}
+        self._fetched_at = time.monotonic()
+
+    async def get(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        async with self._lock:
+            key = self._keys.get(kid)
+            if key is None and time.monotonic() - self._fetched_at > JWKS_MIN_REFETCH_SECONDS:
+                await self.refresh()
+                key = self._keys.get(kid)
+        return key
+
+    async def refresh_forever(self):
+        """Background task: pick up rotated keys before tokens need them."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.warning("JWKS refresh failed (keeping previous keys)", extra={"error": str(e)})
+            await asyncio.sleep(JWKS_REFRESH_SECONDS)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token hash -> payload, valid until the token's exp."""
+
+    def __init__(self, maxsize=AUTH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        exp, payload = entry
+        if exp <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return payload
+
+    def set(self, token, payload):
+        exp = payload.get("exp")
+        if not exp:
+            return
+        self._data[self._key(token)] = (exp, payload)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
 class VerifyToken:
     """
     Validate the Clerk JWT Token with Signature Verification.
+    Create one instance and share it between routes; the key is parsed
+    once and repeat tokens are served from the verified-token cache.
     """
     def __init__(self):
         self.security = HTTPBearer()
         # In Production, you get this from Clerk Dashboard -> Paths -> JWT Templates -> Public Key
-        self.public_key = os.getenv("CLERK_JWT_PUBLIC_KEY")
-        if self.public_key:
-            print(f"DEBUG: CLERK_JWT_PUBLIC_KEY loaded (Length: {len(self.public_key)})")
+        self.public_key = load_public_key(os.getenv("CLERK_JWT_PUBLIC_KEY"))
+        self.jwks = JWKSKeyStore(JWKS_URL) if JWKS_URL else None
+        self.cache = VerifiedTokenCache()
+        self._warned_unverified = False
+
+    async def _signing_key(self, token):
+        if self.jwks is not None:
+            kid = jwt.get_unverified_header(token).get("kid")
+            if kid:
+                key = await self.jwks.get(kid)
+                if key is not None:
+                    return key
+        if self.public_key is not None:
+            return self.public_key
+        raise jwt.InvalidTokenError("No signing key for token")
 
     async def __call__(self, credentials: HTTPAuthorizationCredentials = Security(HTTPBearer())):
-        token = credentials.credentials
-        
-        if not self.public_key:
+        with stage("auth_verify"):
+            return await self.verify(credentials.credentials)
+
+    async def verify(self, token):
+        if not self.public_key and not self.jwks:
             # Fallback for development if key isn't set yet, but log a warning
-            print("WARNING: CLERK_JWT_PUBLIC_KEY not set. Falling back to unverified decode (UNSAFE FOR PROD)")
+            if not self._warned_unverified:
+                log.warning("CLERK_JWT_PUBLIC_KEY not set. Falling back to unverified decode (UNSAFE FOR PROD)")
+                self._warned_unverified = True
             return jwt.decode(token, options={"verify_signature": False})
 
+        payload = self.cache.get(token)
+        if payload is not None:
+            return payload
+
         try:
-            # Robust PEM formatting
-            key_body = self.public_key.replace("-----BEGIN PUBLIC KEY-----", "").replace("-----END PUBLIC KEY-----", "").strip()
-            public_key_pem = f"-----BEGIN PUBLIC KEY-----\n{key_body}\n-----END PUBLIC KEY-----"
-            
             payload = jwt.decode(
-                token, 
-                public_key_pem, 
+                token,
+                await self._signing_key(token),
                 algorithms=["RS256"],
                 options={"verify_exp": True}
             )
-            return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token has expired")
         except jwt.InvalidTokenError as e:
-            print(f"JWT Error: {e}")
+            log.info("JWT rejected", extra={"error": str(e)})
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         except Exception as e:
-            print(f"Auth Exception: {e}")
+            log.warning("Auth exception", extra={"error": str(e)})
             raise HTTPException(status_code=401, detail="Authentication failed")
+
+        self.cache.set(token, payload)
+        return payload
+
+
+# Shared by every route: Depends(verify_token)
+verify_token = VerifyToken()
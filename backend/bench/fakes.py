@@ -0,0 +1,275 @@
+"""
+In-process stand-ins for Supabase, Gemini and PayPal used by the
+benchmarks. Each takes a `Faults` describing artificial latency and
+error rate so runs can model a slow DB or a flaky LLM.
+"""
+import os
+import csv
+import json
+import time
+import random
+import asyncio
+import threading
+import datetime
+import types
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOOKS_CSV = os.path.join(os.path.dirname(HERE), "hook.csv")
+
+
+class Faults:
+    """Latency (mean, jitter) in milliseconds plus a failure probability."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def delay(self):
+        if not self.latency_ms and not self.jitter_ms:
+            return 0.0
+        # Exponential tail on top of the base latency, like real backends
+        extra = self._random.expovariate(1 / self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.latency_ms + extra) / 1000
+
+    def should_fail(self):
+        return self.error_rate and self._random.random() < self.error_rate
+
+
+class FakeServiceError(Exception):
+    code = 503
+
+
+# -------------------------------------------------------------------
+#  SUPABASE
+# -------------------------------------------------------------------
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """The subset of the postgrest query builder main.py uses."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.conflict = None
+        self.filters = []
+        self.bounds = None
+
+    def select(self, *_, **__):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def ilike(self, column, pattern):
+        needle = pattern.strip("%").lower()
+        self.filters.append(lambda row: needle in str(row.get(column, "")).lower())
+        return self
+
+    def order(self, *_, **__):
+        return self
+
+    def limit(self, n):
+        self.bounds = (0, n - 1)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def insert(self, payload, **_):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **_):
+        self.op, self.payload, self.conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def execute(self):
+        self.db.io()
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            matched = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.op == "select":
+                if self.bounds:
+                    matched = matched[self.bounds[0]:self.bounds[1] + 1]
+                return _Result([dict(r) for r in matched])
+            if self.op == "update":
+                for row in matched:
+                    row.update(self.payload)
+                return _Result(matched)
+
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            for item in payload:
+                existing = None
+                if self.op == "upsert":
+                    existing = next((r for r in rows if r.get(self.conflict) == item.get(self.conflict)), None)
+                if existing is not None:
+                    existing.update(item)
+                else:
+                    rows.append(dict(item, id=len(rows) + 1, created_at=datetime.datetime.utcnow().isoformat()))
+            return _Result(payload)
+
+
+class _Rpc:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        self.db.io()
+        with self.db.lock:
+            return _Result(getattr(self.db, f"_rpc_{self.name}")(self.params))
+
+
+class FakeSupabase:
+    """
+    Dict-of-lists tables plus the RPCs from setup_users_table.sql.
+    `execute()` sleeps on the calling (pool) thread like the real client.
+    """
+
+    def __init__(self, faults=None, templates=True, default_plan="pro"):
+        self.faults = faults or Faults()
+        # New users start on this plan; "pro" keeps credits out of the way
+        self.default_plan = default_plan
+        self.lock = threading.Lock()
+        self.tables = {}
+        if templates:
+            self.tables["hook_templates"] = load_templates()
+
+    def io(self):
+        delay = self.faults.delay()
+        if delay:
+            time.sleep(delay)
+        if self.faults.should_fail():
+            raise FakeServiceError("supabase unavailable")
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _Rpc(self, name, params or {})
+
+    def _user(self, user_id, email=""):
+        users = self.tables.setdefault("users", [])
+        for row in users:
+            if row["user_id"] == user_id:
+                return row
+        row = {"user_id": user_id, "email": email, "plan": self.default_plan, "credits": 3,
+               "last_reset_date": datetime.date.today().isoformat()}
+        users.append(row)
+        return row
+
+    def _rpc_consume_credits(self, p):
+        user = self._user(p["p_user_id"], p.get("p_email", ""))
+        amount = p.get("p_amount", 1)
+        if user["plan"] != "free":
+            return [{"allowed": True, "user_plan": user["plan"], "balance": user["credits"]}]
+        allowed = user["credits"] >= amount
+        if allowed:
+            user["credits"] -= amount
+        return [{"allowed": allowed, "user_plan": "free", "balance": user["credits"]}]
+
+    def _rpc_sync_credits(self, p):
+        user = self._user(p["p_user_id"], p.get("p_email", ""))
+        return [{"allowed": True, "user_plan": user["plan"], "balance": user["credits"]}]
+
+    def _rpc_refund_credits(self, p):
+        user = self._user(p["p_user_id"])
+        if user["plan"] == "free":
+            user["credits"] += p.get("p_amount", 1)
+        return [{"allowed": True, "user_plan": user["plan"], "balance": user["credits"]}]
+
+    def _rpc_get_dashboard(self, p):
+        user = self._user(p["p_user_id"])
+        history = [r for r in self.tables.get("generations", []) if r["user_id"] == p["p_user_id"]]
+        history.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        if p.get("p_before_id"):
+            before = (p["p_before_created_at"], p["p_before_id"])
+            history = [r for r in history if (r["created_at"], r["id"]) < before]
+        return {"plan": user["plan"], "credits": user["credits"], "total_generated": len(history),
+                "history": history[:p["p_limit"]]}
+
+
+def load_templates(path=HOOKS_CSV):
+    """hook.csv rows keyed like the hook_templates table (lower-case columns)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="latin1") as f:
+        return [{k.lower(): v for k, v in row.items()} for row in csv.DictReader(f)]
+
+
+# -------------------------------------------------------------------
+#  GEMINI
+# -------------------------------------------------------------------
+
+def fake_reply(count=10):
+    """A fenced JSON array valid for both HookItem and CaptionItem."""
+    items = [
+        {
+            "id": i,
+            "hook": f"Hook {i}: the one thing nobody tells you",
+            "text": f"Caption {i} that sounds like a person wrote it",
+            "caption": "Short caption #tag",
+            "hashtags": ["#growth", "#creator"],
+            "strategy_leak": "Curiosity Gap: withholds the answer.",
+        }
+        for i in range(count)
+    ]
+    return "```json\n" + json.dumps(items, indent=2) + "\n```"
+
+
+class FakeModel:
+    """Duck-types genai.GenerativeModel.generate_content_async."""
+
+    def __init__(self, faults=None, chunk_size=64):
+        self.faults = faults or Faults()
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False, **_):
+        self.calls += 1
+        await asyncio.sleep(self.faults.delay())
+        if self.faults.should_fail():
+            raise FakeServiceError("503 model overloaded")
+        text = fake_reply()
+        if not stream:
+            return types.SimpleNamespace(text=text)
+
+        async def chunks():
+            for i in range(0, len(text), self.chunk_size):
+                yield types.SimpleNamespace(text=text[i:i + self.chunk_size])
+        return chunks()
+
+
+# -------------------------------------------------------------------
+#  PAYPAL
+# -------------------------------------------------------------------
+
+def paypal_transport(faults=None):
+    """httpx.MockTransport answering the OAuth and order lookups PayPalClient makes."""
+    faults = faults or Faults()
+
+    async def handler(request):
+        await asyncio.sleep(faults.delay())
+        if faults.should_fail():
+            return httpx.Response(503, json={"name": "SERVICE_UNAVAILABLE"})
+        if request.url.path == "/v1/oauth2/token":
+            return httpx.Response(200, json={"access_token": "fake", "expires_in": 32400})
+        order_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={"id": order_id, "status": "COMPLETED"})
+
+    return httpx.MockTransport(handler)
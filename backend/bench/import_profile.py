@@ -0,0 +1,83 @@
+"""
+Import-time profile for main.py (what a cold worker pays before it can
+answer /). Runs `python -X importtime -c "import main"` in fresh
+interpreters and reports the median wall time plus the slowest modules.
+
+    cd backend && python bench/import_profile.py [--runs 5] [--top 15]
+    python bench/import_profile.py --budget-ms 1500    # exit 1 if slower
+
+Exits 1 if the import exceeds --budget-ms or pulls in any module that
+should only load on first use (see DEFERRED), so it can gate CI.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded lazily by state.py / webhooks.py; importing main must not touch them
+DEFERRED = ("google.generativeai", "supabase", "svix")
+
+
+def profile_once():
+    """(wall seconds, {module: cumulative microseconds}) for one cold import."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    # Missing credentials must not break the import any more
+    for name in ("SUPABASE_URL", "SUPABASE_KEY", "GEMINI_API_KEY"):
+        env.pop(name, None)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        sys.exit(f"import main failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative_us)
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median import is slower")
+    args = parser.parse_args()
+
+    walls, modules = [], {}
+    for _ in range(args.runs):
+        wall, modules = profile_once()
+        walls.append(wall)
+
+    median_ms = statistics.median(walls) * 1000
+    main_ms = modules.get("main", 0) / 1000
+    print(f"import main: {main_ms:.0f} ms (importtime), {median_ms:.0f} ms wall incl. interpreter "
+          f"(median of {args.runs}, min {min(walls) * 1000:.0f})")
+
+    print(f"\n{'cumulative ms':>14}  module")
+    top_level = {name: us for name, us in modules.items() if "." not in name}
+    for name, us in sorted(top_level.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{us / 1000:>14.1f}  {name}")
+
+    failed = False
+    loaded = sorted(name for name in modules if any(name == d or name.startswith(d + ".") for d in DEFERRED))
+    if loaded:
+        print(f"\nFAIL: imported eagerly: {', '.join(loaded[:5])}{' ...' if len(loaded) > 5 else ''}")
+        failed = True
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"\nFAIL: {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Load and latency benchmark for main.py. The app runs in-process (ASGI,
+no sockets) with Supabase, Gemini and PayPal replaced by the fakes in
+bench/fakes.py, each with configurable latency and error rate.
+
+Reports RPS and p50/p95/p99 per endpoint, plus the same percentiles per
+stage (auth, ratelimit, credits, templates, llm, parse, db) measured by
+wrapping the functions main.py calls; db is every Supabase query, from
+whichever module issues it. Results are written as JSON so
+runs on different commits can be compared.
+
+    cd backend && python bench/load_bench.py --requests 500 --concurrency 32 \\
+        --llm-latency 800 --llm-jitter 400 --llm-error-rate 0.02
+    python bench/load_bench.py --compare bench/results/a.json bench/results/b.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import datetime
+import platform
+import functools
+import subprocess
+from collections import Counter, defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import jwt  # noqa: E402
+import httpx  # noqa: E402
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+
+from bench import fakes  # noqa: E402
+
+ENDPOINTS = ("hooks", "captions", "dashboard", "clerk", "payment")
+DEFAULT_ENDPOINTS = ("hooks", "captions", "dashboard", "clerk")
+WEBHOOK_SECRET = "whsec_" + "YmVuY2htYXJrLXdlYmhvb2stc2VjcmV0LTMyYg=="
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class StageTimer:
+    """Collects wall time per stage; reset between endpoints."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def reset(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+        else:
+            @functools.wraps(fn)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+        return timed
+
+    def report(self):
+        return {stage: percentiles(samples) for stage, samples in sorted(self.samples.items())}
+
+
+def _configure_env(private_key):
+    """Everything main.py reads at import time; must run before importing it."""
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    os.environ.update({
+        "SUPABASE_URL": "http://supabase.bench.invalid",
+        "SUPABASE_KEY": jwt.encode({"role": "service_role"}, "bench", algorithm="HS256"),
+        "GEMINI_API_KEY": "bench",
+        "CLERK_JWT_PUBLIC_KEY": public_pem,
+        "CLERK_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "PAYPAL_CLIENT_ID": "bench",
+        "PAYPAL_CLIENT_SECRET": "bench",
+        "PAYPAL_API_BASE": "https://paypal.bench.invalid",
+    })
+    os.environ.pop("CLERK_JWKS_URL", None)
+    # The benchmark measures the pipeline, not the limiter turning it away
+    for name in ("FREE", "PRO", "GLOBAL"):
+        os.environ[f"RATE_{name}_BURST"] = "1000000000"
+        os.environ[f"RATE_{name}_PER_MINUTE"] = "1000000000"
+
+
+def _load_app(args, timer):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    _configure_env(private_key)
+
+    import auth
+    import main
+    from llm import LLMClient
+
+    main.supabase = fakes.FakeSupabase(
+        fakes.Faults(args.db_latency, args.db_jitter, args.db_error_rate, seed=1)
+    )
+    model = fakes.FakeModel(fakes.Faults(args.llm_latency, args.llm_jitter, args.llm_error_rate, seed=2))
+    main.llm = LLMClient([model], hedge=args.hedge)
+    main.paypal_client._transport = fakes.paypal_transport(
+        fakes.Faults(args.paypal_latency, args.paypal_jitter, args.paypal_error_rate, seed=3)
+    )
+
+    auth.VerifyToken.__call__ = timer.wrap("auth", auth.VerifyToken.__call__)
+    main.rate_limiter.enforce = timer.wrap("ratelimit", main.rate_limiter.enforce)
+    main.consume_credits = timer.wrap("credits", main.consume_credits)
+    main.pick_examples_text = timer.wrap("templates", main.pick_examples_text)
+    main.llm.generate = timer.wrap("llm", main.llm.generate)
+    main.parse_items = timer.wrap("parse", main.parse_items)
+    main.fetch_dashboard = timer.wrap("dashboard", main.fetch_dashboard)
+    # credits, history, templates and webhooks import run_db themselves:
+    # rebind every module's copy so "db" covers all Supabase queries
+    import concurrency
+    run_db = concurrency.run_db
+    timed_db = timer.wrap("db", run_db)
+    for module in list(sys.modules.values()):
+        if getattr(module, "run_db", None) is run_db:
+            module.run_db = timed_db
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    tokens = [
+        jwt.encode(
+            {"sub": f"bench_user_{i}", "email": f"user{i}@bench.invalid", "exp": now + datetime.timedelta(hours=1)},
+            private_key, algorithm="RS256",
+        )
+        for i in range(args.users)
+    ]
+    return main, model, tokens
+
+
+def _request_factories(args, tokens):
+    from svix.webhooks import Webhook
+    signer = Webhook(WEBHOOK_SECRET)
+    distinct = args.distinct_topics or args.requests
+
+    def headers(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    async def hooks(client, i):
+        params = {"topic": f"bench topic {i % distinct}", "tone": "Bold", "niche": "Fitness",
+                  "goal": "Viral Reach", "platform": "TikTok", "psychology": "Curiosity Gap"}
+        return await client.get("/api/hooks/generate", params=params, headers=headers(i))
+
+    async def captions(client, i):
+        params = {"topic": f"bench topic {i % distinct}", "platform": "Instagram", "tone": "Casual"}
+        return await client.get("/api/captions/generate", params=params, headers=headers(i))
+
+    async def dashboard(client, i):
+        return await client.get("/api/user/dashboard", params={"limit": 20}, headers=headers(i))
+
+    async def clerk(client, i):
+        msg_id = f"msg_{uuid.uuid4().hex}"
+        sent_at = datetime.datetime.now(datetime.timezone.utc)
+        body = json.dumps({
+            "type": "user.updated",
+            "data": {
+                "id": f"bench_user_{i % len(tokens)}",
+                "primary_email_address_id": "e1",
+                "email_addresses": [{"id": "e1", "email_address": f"user{i}@bench.invalid"}],
+            },
+        })
+        return await client.post("/api/webhooks/clerk", content=body, headers={
+            "svix-id": msg_id,
+            "svix-timestamp": str(int(sent_at.timestamp())),
+            "svix-signature": signer.sign(msg_id, sent_at, body),
+            "content-type": "application/json",
+        })
+
+    async def payment(client, i):
+        return await client.post("/api/verify-payment", json={"orderID": f"ORDER-{uuid.uuid4().hex}"}, headers=headers(i))
+
+    return {"hooks": hooks, "captions": captions, "dashboard": dashboard, "clerk": clerk, "payment": payment}
+
+
+async def drive(client, make_request, total, concurrency):
+    latencies = []
+    statuses = Counter()
+    indices = iter(range(total))
+
+    async def worker():
+        for i in indices:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else None,
+        "status": dict(statuses),
+        "latency": percentiles(latencies),
+    }
+
+
+async def run(args):
+    timer = StageTimer()
+    main, model, tokens = _load_app(args, timer)
+    factories = _request_factories(args, tokens)
+    results = {}
+
+    async with main.app.router.lifespan_context(main.app):
+        # Unhandled app errors come back as 500s instead of raising here
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if args.warmup:
+                await drive(client, factories["dashboard"], args.warmup, min(args.warmup, args.concurrency))
+            for name in args.endpoints:
+                timer.reset()
+                calls_before = model.calls
+                result = await drive(client, factories[name], args.requests, args.concurrency)
+                result["stages"] = timer.report()
+                result["llm_calls"] = model.calls - calls_before
+                results[name] = result
+                _print_endpoint(name, result)
+                # Let queued history rows land before the next endpoint reads them
+                await asyncio.sleep(main.history_writer.flush_interval)
+    return results
+
+
+def _print_endpoint(name, result):
+    lat = result["latency"]
+    print(f"\n{name:<10} {result['rps']:>9} rps  p50 {lat['p50_ms']:>9.2f}  p95 {lat['p95_ms']:>9.2f}"
+          f"  p99 {lat['p99_ms']:>9.2f} ms  status {result['status']}")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<10} n={stats['count']:<6} p50 {stats['p50_ms']:>9.2f}  p95 {stats['p95_ms']:>9.2f}"
+              f"  p99 {stats['p99_ms']:>9.2f} ms")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    print(f"{'endpoint':<12}{'rps':>18}{'p50 ms':>22}{'p95 ms':>22}{'p99 ms':>22}")
+    for name, after in new["endpoints"].items():
+        before = old["endpoints"].get(name)
+        if before is None:
+            continue
+        row = f"{name:<12}{_delta(before['rps'], after['rps']):>18}"
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            row += f"{_delta(before['latency'][q], after['latency'][q]):>22}"
+        print(row)
+
+
+def _delta(before, after):
+    if not before:
+        return f"{after}"
+    return f"{after} ({(after - before) / before * 100:+.1f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(DEFAULT_ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--distinct-topics", type=int, default=0,
+                        help="topics cycled through (0 = every request unique, no cache hits)")
+    parser.add_argument("--hedge", action="store_true", help="enable hedged Gemini requests")
+    for service, latency, jitter in (("db", 15, 10), ("llm", 800, 400), ("paypal", 150, 50)):
+        parser.add_argument(f"--{service}-latency", type=float, default=latency, help="ms")
+        parser.add_argument(f"--{service}-jitter", type=float, default=jitter, help="ms, exponential tail")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0)
+    parser.add_argument("--out", help="result file (default bench/results/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    endpoints = asyncio.run(run(args))
+
+    commit = _git_commit()
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = args.out or os.path.join(BACKEND, "bench", "results", f"load-{commit or 'unknown'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+            },
+            "endpoints": endpoints,
+        }, f, indent=2)
+    print(f"\nSaved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for parsing.py against the old find('[') / rfind(']')
+extractor, over a corpus of well-formed and malformed Gemini replies.
+
+    cd backend && python bench/parse_bench.py [--iterations 2000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import extract_objects, parse_items, ParseError, HookItem  # noqa: E402
+
+
+def _hooks(n=10):
+    return [
+        {
+            "hook": f"Stop scrolling if you still think {n - i} hours of sleep is \"enough\"",
+            "caption": "Your brain disagrees. Here's what the research says \U0001F9E0 #sleep #health",
+            "strategy_leak": "Curiosity Gap: challenges a common belief and promises the answer {soon}.",
+        }
+        for i in range(n)
+    ]
+
+
+_ARRAY = json.dumps(_hooks(), indent=2, ensure_ascii=False)
+
+# Shapes seen from gemini-flash: clean arrays, fenced arrays, chatty
+# preambles/epilogues, trailing commas, max-token truncation, lone objects.
+CORPUS = {
+    "clean": _ARRAY,
+    "fenced": f"```json\n{_ARRAY}\n```",
+    "fenced_no_lang": f"```\n{_ARRAY}\n```",
+    "preamble": f"Here are 10 hooks [optimized for Reels]:\n\n{_ARRAY}",
+    "epilogue_brackets": f"{_ARRAY}\n\nLet me know if you want [more] variations!",
+    "trailing_commas": _ARRAY.replace('."\n  }', '.",\n  }').replace("}\n]", "},\n]"),
+    "truncated": _ARRAY[: int(len(_ARRAY) * 0.7)],
+    "single_object": json.dumps(_hooks(1)[0]),
+    "wrapped": json.dumps({"hooks": _hooks()}),
+}
+
+
+def legacy_extract(text):
+    """The extractor generate_all used before parsing.py."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    start_idx = text.find("[")
+    end_idx = text.rfind("]")
+    if start_idx != -1 and end_idx != -1:
+        data = json.loads(text[start_idx:end_idx + 1])
+        return data if isinstance(data, list) else [data]
+    start_obj = text.find("{")
+    end_obj = text.rfind("}")
+    if start_obj != -1 and end_obj != -1:
+        return [json.loads(text[start_obj:end_obj + 1])]
+    raise ValueError("not JSON")
+
+
+def new_extract(text):
+    objects = extract_objects(text)
+    if not objects:
+        raise ParseError("no records")
+    return objects
+
+
+def new_parse(text):
+    """Extraction plus schema validation (what the endpoints run)."""
+    return parse_items(text, HookItem)
+
+
+def bench(fn, text, iterations):
+    try:
+        result = fn(text)
+        records = len(result)
+    except (ValueError, ParseError):
+        return None, 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    return (time.perf_counter() - start) / iterations * 1e6, records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    columns = [("legacy", legacy_extract), ("extract", new_extract), ("validated", new_parse)]
+    print(f"{'case':<20}" + "".join(f"{name + ' us':>14}{'recs':>6}" for name, _ in columns))
+    for case, text in CORPUS.items():
+        row = f"{case:<20}"
+        for _, fn in columns:
+            us, records = bench(fn, text, args.iterations)
+            row += (f"{us:>14.1f}" if us is not None else f"{'FAIL':>14}") + f"{records:>6}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
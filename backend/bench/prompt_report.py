@@ -0,0 +1,183 @@
+"""
+Before/after report for prompts.py: prompt size, estimated input and
+output tokens, render and parse time for the old f-string prompts with
+free-form JSON replies against the compiled templates with JSON mode.
+
+    cd backend && python bench/prompt_report.py [--iterations 5000]
+    python bench/prompt_report.py --live --runs 5   # real Gemini (GEMINI_API_KEY)
+
+--live also asks Gemini for exact token counts (count_tokens and
+usage_metadata) and times the real calls, old prompt vs new.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import estimate_tokens  # noqa: E402
+from parsing import parse_items, HookItem, CaptionItem  # noqa: E402
+from prompts import HOOKS_PROMPT, CAPTIONS_PROMPT, build_hooks_prompt, build_captions_prompt  # noqa: E402
+
+HOOK_ARGS = dict(
+    topic="Morning routines for busy founders", tone="Bold", goal="Grow followers",
+    platform="TikTok", psychology="Curiosity Gap",
+    examples_text="Example 1: Stop doing (insert action) if you want (insert result)\n"
+                  "Example 2: Nobody talks about this (insert topic) mistake\n"
+                  "Example 3: I tried (insert thing) for 30 days and here's what happened\n",
+)
+CAPTION_ARGS = dict(topic="Morning routines for busy founders", platform="Instagram", tone="Friendly")
+
+
+# The prompts as they were before prompts.py, verbatim
+def legacy_hooks_prompt(topic, tone, goal, platform, psychology, examples_text):
+    return f"""
+    Act as a World-Class Viral Content Creator. 
+    Your goal is to generate 10 unique, high-performing video hooks for {platform}.
+    Topic: {topic}
+    Tone: {tone}
+    Strategy: {psychology}
+    Target Goal: {goal}
+
+    {examples_text}
+
+    REQUIREMENTS:
+    1. "hook": A punchy, scroll-stopping opening line (under 15 words).
+    2. "caption": A short, engaging caption for the post.
+    3. "strategy_leak": A 1-sentence explanation of why this hook works based on {psychology}.
+
+    Strict JSON format:
+    [
+      {{
+        "hook": "...",
+        "caption": "...",
+        "strategy_leak": "..."
+      }}
+    ]
+    
+    CRITICAL: Provide 10 distinct variations. DO NOT return empty strings.
+    """
+
+
+def legacy_captions_prompt(topic, platform, tone):
+    return f"""
+    Act as a professional social media manager.
+    Generate 5 engaging captions for {platform} about: {topic}.
+    Tone: {tone}.
+
+    OUTPUT REQUIREMENTS:
+    - Format for {platform} (use line breaks/emojis).
+    - Include 3-5 relevant hashtags.
+    - Return ONLY a valid JSON array.
+    - NO Markdown blocks. NO intro text.
+
+    JSON FORMAT:
+    [
+        {{
+            "id": "1",
+            "text": "Caption text...",
+            "hashtags": ["tag1", "tag2"]
+        }}
+    ]
+    """
+
+
+def _sample_items(kind):
+    if kind == "hooks":
+        return [
+            {
+                "hook": f"Stop scrolling if your mornings still start at {5 + i % 3}am",
+                "caption": "Your calendar isn't the problem. Your first hour is. ☕ #founders #productivity",
+                "strategy_leak": "Curiosity Gap: challenges a habit and withholds the fix.",
+            }
+            for i in range(10)
+        ]
+    return [
+        {"id": str(i + 1), "text": "5am isn't magic.\nWhat you do with it is ✨", "hashtags": ["founders", "morningroutine", "productivity"]}
+        for i in range(5)
+    ]
+
+
+def sample_replies(kind):
+    """Typical free-form reply (fenced, pretty-printed) vs a JSON mode reply."""
+    items = _sample_items(kind)
+    free_form = f"```json\n{json.dumps(items, indent=2, ensure_ascii=False)}\n```"
+    json_mode = json.dumps(items, ensure_ascii=False)
+    return free_form, json_mode
+
+
+def per_call_us(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def offline_report(iterations):
+    cases = [
+        ("hooks", legacy_hooks_prompt, build_hooks_prompt, HOOK_ARGS, HookItem),
+        ("captions", legacy_captions_prompt, build_captions_prompt, CAPTION_ARGS, CaptionItem),
+    ]
+    print(f"{'prompt':<10}{'':<8}{'chars':>8}{'tok in':>8}{'render us':>11}{'tok out':>9}{'parse us':>10}")
+    for name, old_build, new_build, kwargs, item in cases:
+        free_form, json_mode = sample_replies(name)
+        rows = (
+            ("before", old_build, free_form),
+            ("after", new_build, json_mode),
+        )
+        for label, build, reply in rows:
+            prompt = build(**kwargs)
+            render_us = per_call_us(lambda: build(**kwargs), iterations)
+            parse_us = per_call_us(lambda: parse_items(reply, item), iterations)
+            print(f"{name:<10}{label:<8}{len(prompt):>8}{estimate_tokens(prompt):>8}{render_us:>11.2f}"
+                  f"{estimate_tokens(reply):>9}{parse_us:>10.1f}")
+    print("\nTokens are estimates (~4 chars/token); run with --live for Gemini's own counts.")
+
+
+def live_report(runs):
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-flash-latest"))
+    cases = [
+        ("hooks", legacy_hooks_prompt(**HOOK_ARGS), build_hooks_prompt(**HOOK_ARGS), HOOKS_PROMPT, HookItem),
+        ("captions", legacy_captions_prompt(**CAPTION_ARGS), build_captions_prompt(**CAPTION_ARGS), CAPTIONS_PROMPT, CaptionItem),
+    ]
+    print(f"{'prompt':<10}{'':<8}{'tok in':>8}{'tok out':>9}{'p50 s':>8}{'max s':>8}{'parsed':>8}")
+    for name, old_prompt, new_prompt, template, item in cases:
+        for label, prompt, config in (("before", old_prompt, None), ("after", new_prompt, template.generation_config)):
+            tokens_in = model.count_tokens(prompt).total_tokens
+            latencies, tokens_out, parsed = [], [], 0
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = model.generate_content(prompt, generation_config=config)
+                latencies.append(time.perf_counter() - start)
+                tokens_out.append(result.usage_metadata.candidates_token_count)
+                try:
+                    parse_items(result.text, item)
+                    parsed += 1
+                except ValueError:
+                    pass
+            print(f"{name:<10}{label:<8}{tokens_in:>8}{statistics.median(tokens_out):>9.0f}"
+                  f"{statistics.median(latencies):>8.2f}{max(latencies):>8.2f}{parsed:>5}/{runs}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--live", action="store_true", help="call Gemini for exact tokens and latency")
+    parser.add_argument("--runs", type=int, default=5, help="Gemini calls per prompt with --live")
+    args = parser.parse_args()
+
+    offline_report(args.iterations)
+    if args.live:
+        print()
+        live_report(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Serialization time and bytes on the wire for the response layer
+(responses.py), on a dashboard page and template search pages.
+
+    cd backend && python bench/response_bench.py [--iterations 2000]
+
+Columns: FastAPI's default path (jsonable_encoder + json.dumps), the
+orjson default response class (still behind jsonable_encoder), orjson
+rendering directly (what the dashboard/search endpoints use), and the
+body size as identity, gzip, brotli and a 304.
+"""
+import os
+import sys
+import gzip
+import time
+import random
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from upload import read_rows, _clean  # noqa: E402
+from search import SearchIndex  # noqa: E402
+from responses import FastJSONResponse, dumps, make_etag, brotli, GZIP_LEVEL, BROTLI_QUALITY  # noqa: E402
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hook.csv")
+
+
+def dashboard_page(rows, size=20, seed=3):
+    """Shaped like fetch_dashboard(): stats + `size` generations of 10 hooks."""
+    rng = random.Random(seed)
+    now = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    history = []
+    for i in range(size):
+        hooks = [
+            {
+                "hook": rng.choice(rows)["hook_text"],
+                "caption": "Your calendar isn't the problem. Your first hour is. ☕ #founders #productivity",
+                "strategy_leak": "Curiosity Gap: challenges a habit and withholds the fix.",
+            }
+            for _ in range(10)
+        ]
+        history.append({
+            "id": 1000 - i,
+            "type": "hooks",
+            "created_at": (now - datetime.timedelta(hours=i)).isoformat(),
+            "params": {"topic": "Morning routines", "tone": "bold", "niche": "Fitness & Health",
+                       "goal": "Get Followers", "platform": "TikTok", "psychology": "Curiosity Gap"},
+            "result": hooks,
+        })
+    return {"stats": {"plan": "free", "credits": 2, "total_generated": 87}, "history": history,
+            "next_cursor": "MjAyNi0wMS0wMVQwMDowMDowMHw5ODA"}
+
+
+def per_call_us(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--csv", default=CSV_PATH)
+    args = parser.parse_args()
+
+    rows = [row for row in map(_clean, read_rows(args.csv)) if row]
+    index = SearchIndex()
+    index.build(rows)
+    payloads = (
+        ("dashboard (20)", dashboard_page(rows)),
+        ("search (20)", index.search("you", limit=20)),
+        ("search (100)", index.search(None, limit=100)),
+    )
+    stdlib, fast = JSONResponse(None), FastJSONResponse(None)
+
+    print(f"{'payload':<16}{'default us':>11}{'orjson cls':>11}{'orjson us':>10}"
+          f"{'identity B':>12}{'gzip B':>9}{'br B':>8}{'304 B':>7}")
+    for name, content in payloads:
+        default_us = per_call_us(lambda: stdlib.render(jsonable_encoder(content)), args.iterations)
+        class_us = per_call_us(lambda: fast.render(jsonable_encoder(content)), args.iterations)
+        direct_us = per_call_us(lambda: dumps(content), args.iterations)
+        body = dumps(content)
+        gzip_bytes = len(gzip.compress(body, compresslevel=GZIP_LEVEL))
+        br_bytes = len(brotli.compress(body, quality=BROTLI_QUALITY)) if brotli is not None else None
+        print(f"{name:<16}{default_us:>11.1f}{class_us:>11.1f}{direct_us:>10.1f}{len(body):>12}{gzip_bytes:>9}"
+              f"{br_bytes if br_bytes is not None else '-':>8}{0:>7}")
+
+    etag_us = per_call_us(lambda: make_etag(f"{index.digest}?q=you&limit=20".encode()), args.iterations)
+    print(f"\nsearch revalidation (ETag from the index digest + query, then 304): {etag_us:.1f} us")
+    if brotli is None:
+        print("brotli not installed (pip install brotli); clients get gzip")
+
+
+if __name__ == "__main__":
+    main()
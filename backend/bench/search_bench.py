@@ -0,0 +1,104 @@
+"""
+Latency benchmark for the template search index (search.py) at library
+sizes well beyond hook.csv: the CSV rows are replicated with unique
+hook_ids and a few synthetic words each, so the vocabulary grows too.
+
+    cd backend && python bench/search_bench.py [--sizes 1000,10000,100000] [--queries 2000]
+
+Reports build time and p50/p99/max per query shape (text, prefix,
+facet filters, deep cursor pages), warm (query memoized, the common
+case for a fixed library) and cold (memo cleared before every query).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload import read_rows, _clean  # noqa: E402
+from search import SearchIndex  # noqa: E402
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hook.csv")
+
+QUERIES = {
+    "browse": lambda rng: dict(),
+    "text": lambda rng: dict(q=rng.choice(("how to", "stop doing", "nobody talks about", "money", "secret"))),
+    "prefix": lambda rng: dict(q=rng.choice(("s", "th", "mon", "how t", "fit"))),
+    "facets": lambda rng: dict(filters={
+        "niche": [rng.choice(("General/Universal", "Health/Fitness", "Finance/Money"))],
+        "tone": [rng.choice(("Direct/Informative", "Personal/Narrative"))],
+        "length": ["40-80", "80-120"],
+    }),
+    "text+facets": lambda rng: dict(q="you", filters={"category": ["EDUCATIONAL", "AUTHORITY"], "audience": ["Broad/General"]}),
+}
+
+
+def synthetic_rows(base, size, seed=7):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(max(1000, size // 5))]
+    rows = []
+    for i in range(size):
+        row = dict(base[i % len(base)])
+        row["hook_id"] = f"HOOK_{i:07d}"
+        row["hook_text"] = f"{row['hook_text']} {' '.join(rng.sample(vocabulary, 3))}"
+        rows.append(row)
+    return rows
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], samples[-1]
+
+
+def bench(index, queries, cold, seed=11):
+    rng = random.Random(seed)
+    print(f"{'query':<14}{'p50 us':>9}{'p99 us':>9}{'max us':>9}{'avg hits':>10}   ({'cold' if cold else 'warm'})")
+    for name, make in QUERIES.items():
+        latencies, hits = [], []
+        for _ in range(queries):
+            kwargs = make(rng)
+            if cold:
+                index._queries.clear()
+            start = time.perf_counter()
+            result = index.search(**kwargs)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            hits.append(result["total"])
+        p50, p99, worst = percentiles(latencies)
+        print(f"{name:<14}{p50:>9.0f}{p99:>9.0f}{worst:>9.0f}{statistics.mean(hits):>10.0f}")
+
+    # Walk a few pages deep with the cursor
+    latencies, cursor = [], None
+    for _ in range(min(queries, 200)):
+        start = time.perf_counter()
+        result = index.search(cursor=cursor, limit=50)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    p50, p99, worst = percentiles(latencies)
+    print(f"{'cursor pages':<14}{p50:>9.0f}{p99:>9.0f}{worst:>9.0f}{len(latencies):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated template counts")
+    parser.add_argument("--queries", type=int, default=2000, help="queries per shape")
+    parser.add_argument("--csv", default=CSV_PATH)
+    args = parser.parse_args()
+
+    base = [row for row in map(_clean, read_rows(args.csv)) if row]
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = synthetic_rows(base, size)
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.build(rows)
+        print(f"\n{size} templates: built in {(time.perf_counter() - start) * 1000:.0f} ms, {index.stats()['terms']} terms")
+        for cold in (False, True):
+            bench(index, args.queries, cold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import random
+import hashlib
+from collections import OrderedDict
+
+from concurrency import SQLiteConnections, run_blocking
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  GENERATION CACHE
+#  Identical (normalized) parameter sets reuse a previous Gemini result
+#  instead of spending another model call. A per-worker LRU sits in
+#  front of an optional shared backend so gunicorn workers share hits.
+# -------------------------------------------------------------------
+
+log = get_logger("cache")
+
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "1024"))
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "3600"))
+# "" (memory only) or "sqlite"
+GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "").lower()
+GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "/tmp/hookflow_cache.sqlite3")
+
+
+def _normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def make_key(kind, **params):
+    """Stable cache key: kind + sorted, lower-cased, whitespace-collapsed params."""
+    normalized = {name: _normalize(value) for name, value in sorted(params.items())}
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"{kind}:{digest}"
+
+
+class MemoryBackend:
+    """Bounded LRU with per-entry expiry. Not thread safe; event loop only."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.time() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteBackend:
+    """
+    Shared cache in a local SQLite file, usable by every worker on the host.
+    Stands in for a Redis-style store; same get/set/clear surface.
+    """
+
+    def __init__(self, path, maxsize, ttl):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._conn = SQLiteConnections(path)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS generation_cache_lru ON generation_cache (last_used)")
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value FROM generation_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE generation_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO generation_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + (ttl or self.ttl), now),
+        )
+        conn.execute("DELETE FROM generation_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM generation_cache WHERE key IN ("
+            " SELECT key FROM generation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM generation_cache")
+
+
+class GenerationCache:
+    def __init__(self, maxsize=GENERATION_CACHE_SIZE, ttl=GENERATION_CACHE_TTL, shared=None):
+        self.local = MemoryBackend(maxsize, ttl)
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get(self, key):
+        """Return a re-shuffled copy of the cached list, or None on a miss."""
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = await run_blocking(self.shared.get, key)
+            except Exception as e:
+                log.warning("Shared cache read failed (ignoring)", extra={"error": str(e)})
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(key, value)
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Same items, fresh order, so repeat requests don't look identical
+        return random.sample(value, len(value))
+
+    async def set(self, key, value):
+        if not value or not isinstance(value, list):
+            return
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await run_blocking(self.shared.set, key, value)
+            except Exception as e:
+                log.warning("Shared cache write failed (ignoring)", extra={"error": str(e)})
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.local),
+            "backend": "sqlite" if isinstance(self.shared, SQLiteBackend) else "memory",
+        }
+
+
+def _build_shared_backend():
+    if GENERATION_CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(GENERATION_CACHE_PATH, GENERATION_CACHE_SIZE * 4, GENERATION_CACHE_TTL)
+    return None
+
+
+generation_cache = GenerationCache(shared=_build_shared_backend())
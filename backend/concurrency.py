@@ -0,0 +1,72 @@
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from metrics import SUPABASE_SECONDS, span, supabase_op
+
+# -------------------------------------------------------------------
+#  ASYNC I/O LAYER
+#  supabase-py is synchronous, so every `.execute()` runs on a bounded
+#  thread pool instead of the event loop. Gemini calls use the SDK's
+#  native `generate_content_async` and are capped per worker by
+#  `llm_slots`. The local SQLite stores (cache, rate limits, jobs,
+#  pubsub) are used from that pool too, each thread with its own
+#  connection (`SQLiteConnections`).
+# -------------------------------------------------------------------
+
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="hookflow-io")
+# Held for the whole of every Gemini call (see llm.LLMClient)
+llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the shared I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+async def run_db(query):
+    """Execute a supabase query builder without blocking the event loop."""
+    op = supabase_op(query)
+    outcome = "error"
+    start = time.perf_counter()
+    with span("supabase", op=op):
+        try:
+            result = await run_blocking(query.execute)
+            outcome = "ok"
+            return result
+        finally:
+            SUPABASE_SECONDS.observe(time.perf_counter() - start, op=op, outcome=outcome)
+
+
+class SQLiteConnections:
+    """
+    Calling it returns this thread's connection to `path`, opened on
+    first use: WAL, autocommit, 5s busy timeout.
+    """
+
+    def __init__(self, path, row_factory=None):
+        self.path = path
+        self.row_factory = row_factory
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            self._local.conn = conn
+        return conn
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+from concurrency import run_db
+from logs import get_logger
+from profiles import user_profiles
+
+# -------------------------------------------------------------------
+#  CREDITS
+#  Thin wrapper around the consume_credits / sync_credits Postgres
+#  functions (see setup_users_table.sql). One RPC per request replaces
+#  the old select -> reset -> compare -> update sequence, and paid
+#  plans skip even that while their profile is cached (profiles.py).
+# -------------------------------------------------------------------
+
+log = get_logger("credits")
+
+FREE_DAILY_CREDITS = 3
+
+
+def known_plan(user_id):
+    """Last plan seen for this user in this worker ("free" if never seen)."""
+    return user_profiles.plan(user_id)
+
+
+@dataclass
+class CreditBalance:
+    allowed: bool
+    plan: str
+    credits: int
+
+    @property
+    def is_free(self):
+        return self.plan.lower() == "free"
+
+
+async def _to_balance(res, user_id):
+    row = res.data[0] if res.data else None
+    if not row:
+        return CreditBalance(True, "free", FREE_DAILY_CREDITS)
+    balance = CreditBalance(bool(row["allowed"]), row.get("user_plan") or "free", row.get("balance") or 0)
+    if user_profiles.update(user_id, balance.plan, balance.credits):
+        # Free users' credits are always read from the DB, so only a plan
+        # change needs to reach the other workers
+        await user_profiles.invalidate(user_id, balance.plan)
+    return balance
+
+
+async def consume_credits(supabase, user_id, email="", amount=1):
+    """
+    Atomically apply the daily reset, check the limit and spend `amount`
+    credits. Returns the resulting balance; `allowed` is False when the
+    user can't afford it (nothing is deducted in that case).
+    """
+    profile = user_profiles.get(user_id)
+    if profile is not None and not profile.is_free:
+        return CreditBalance(True, profile.plan, profile.credits)
+    try:
+        res = await run_db(supabase.rpc("consume_credits", {
+            "p_user_id": user_id,
+            "p_email": email,
+            "p_amount": amount,
+        }))
+    except Exception as e:
+        # Do not block generation if DB has transient issues, but log it.
+        log.error("Credit check failed (DB issue)", extra={"user_id": user_id, "error": str(e)})
+        return CreditBalance(True, "free", FREE_DAILY_CREDITS)
+    return await _to_balance(res, user_id)
+
+
+async def refund_credits(supabase, user_id, amount=1):
+    """Give back credits for generations that failed after being charged."""
+    try:
+        res = await run_db(supabase.rpc("refund_credits", {"p_user_id": user_id, "p_amount": amount}))
+    except Exception as e:
+        log.error("Credit refund failed (DB issue)", extra={"user_id": user_id, "amount": amount, "error": str(e)})
+        return None
+    return await _to_balance(res, user_id)
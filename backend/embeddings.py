@@ -0,0 +1,269 @@
+"""
+Offline build of the hook template embedding index.
+
+    python embeddings.py              # from Supabase hook_templates
+    python embeddings.py hook.csv     # from a CSV/XLSX export (see upload.py)
+
+The server mmaps the result on startup and only re-embeds templates
+whose text changed when the template index refreshes.
+"""
+import os
+import re
+import glob
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import argparse
+
+import numpy as np
+
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  EMBEDDING INDEX
+#  Each template is embedded from hook_text, niche_categories,
+#  target_audience and hook_structure with the hashing trick (word
+#  unigrams + bigrams into EMBEDDING_DIM signed buckets, L2-normalized),
+#  so building it needs no model download or API calls. The matrix
+#  lives in a .npy file that is memory-mapped read-only, stored bucket-
+#  major (EMBEDDING_DIM x templates): a query only touches the few
+#  dozen buckets its words hash to, so it reads those rows and not the
+#  whole index (~1.5 ms per query at 100k templates, ~0.1 ms at 1k).
+#  Columns line up with TemplateIndex.templates, so metadata filters
+#  are plain row ids.
+#  A JSON manifest names the matrix file (one per content version), so
+#  replacing the manifest swaps matrix and metadata in one step and
+#  workers writing at the same time never share a file.
+# -------------------------------------------------------------------
+
+log = get_logger("embeddings")
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+# Manifest path; matrices are written next to it as <name>-<version>.npy
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "/tmp/hookflow_embeddings.json")
+# Superseded matrices are deleted once this old (a worker may still be mid-swap)
+STALE_MATRIX_SECONDS = 300
+
+DOCUMENT_FIELDS = ("hook_text", "niche_categories", "target_audience", "hook_structure")
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from how i if in insert is it its me my of on or so that the this "
+    "to was what when why with you your x".split()
+)
+
+
+def _tokens(text):
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def embed(texts, dim=EMBEDDING_DIM):
+    """(len(texts), dim) float32 matrix of unit-length hashed vectors."""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = {}
+        for token in _tokens(text or ""):
+            # crc32 rather than hash(): it has to be stable across processes
+            h = zlib.crc32(token.encode())
+            bucket = h % dim
+            counts[bucket] = counts.get(bucket, 0.0) + (1.0 if (h // dim) & 1 else -1.0)
+        for bucket, count in counts.items():
+            # Sublinear tf so a repeated word doesn't drown out the rest
+            matrix[i, bucket] = np.sign(count) * (1.0 + np.log(abs(count))) if count else 0.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def document_text(row):
+    return " ".join(str(row.get(field) or "") for field in DOCUMENT_FIELDS)
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class EmbeddingIndex:
+    def __init__(self, path=EMBEDDINGS_PATH, dim=EMBEDDING_DIM):
+        self.path = path
+        self._base = os.path.splitext(path)[0]
+        self.dim = dim
+        # (dim, templates): one row per hash bucket, see search()
+        self.matrix = None
+        self.ids = []
+        self.digests = []
+        self.last_embedded = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _read(self):
+        """(matrix, ids, digests) of the index written by a previous build, or None."""
+        try:
+            with open(self.path) as f:
+                meta = json.load(f)
+            matrix = np.load(os.path.join(os.path.dirname(self.path), meta["matrix"]), mmap_mode="r")
+            ids, digests = meta["ids"], meta["digests"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if meta.get("dim") != self.dim or matrix.shape != (self.dim, len(ids)):
+            log.warning("Embedding index doesn't match EMBEDDING_DIM; it will be rebuilt", extra={"path": self.path})
+            return None
+        return matrix, ids, digests
+
+    def load(self):
+        """Memory-map the index written by a previous build. False if there is none (or it doesn't fit)."""
+        state = self._read()
+        if state is None:
+            return False
+        self.matrix, self.ids, self.digests = state
+        return True
+
+    def prepare(self, rows):
+        """
+        The index row-aligned with `rows`, embedding only templates that
+        are new or whose text changed, written to disk but not yet in use
+        (pass it to `apply`). Reads nothing searches write, so it can run
+        on a worker thread while the event loop keeps searching.
+        """
+        matrix, old_ids, old_digests = self.matrix, self.ids, self.digests
+        if matrix is None:
+            matrix, old_ids, old_digests = self._read() or (None, [], [])
+
+        ids = [str(row.get("hook_id") or i) for i, row in enumerate(rows)]
+        texts = [document_text(row) for row in rows]
+        digests = [_digest(text) for text in texts]
+        if matrix is not None and ids == old_ids and digests == old_digests:
+            return matrix, ids, digests, 0
+
+        previous = {(hook_id, digest): i for i, (hook_id, digest) in enumerate(zip(old_ids, old_digests))}
+        kept, kept_from, stale = [], [], []
+        for i, key in enumerate(zip(ids, digests)):
+            old = previous.get(key)
+            if old is None:
+                stale.append(i)
+            else:
+                kept.append(i)
+                kept_from.append(old)
+        new = np.empty((self.dim, len(rows)), dtype=np.float32)
+        if kept:
+            new[:, kept] = matrix[:, kept_from]
+        if stale:
+            new[:, stale] = embed([texts[i] for i in stale], self.dim).T
+        return self._write(new, ids, digests), ids, digests, len(stale)
+
+    def apply(self, state):
+        """Switch searches to a state from `prepare` (one step on the event loop)."""
+        self.matrix, self.ids, self.digests, self.last_embedded = state
+
+    def sync(self, rows):
+        """`prepare` + `apply`. Returns how many templates were embedded."""
+        state = self.prepare(rows)
+        self.apply(state)
+        return state[3]
+
+    def _write(self, matrix, ids, digests):
+        """
+        Write the matrix under a name derived from its content, then swap the
+        manifest that points at it (one atomic rename), and return the
+        mmap'd copy. Temp files are per process, so workers syncing at the
+        same time can't interleave writes.
+        """
+        version = _digest(f"{self.dim}|" + "|".join(f"{i}:{d}" for i, d in zip(ids, digests)))
+        matrix_path = f"{self._base}-{version}.npy"
+        suffix = f".{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(matrix_path + suffix, "wb") as f:
+                np.save(f, matrix)
+            os.replace(matrix_path + suffix, matrix_path)
+            with open(self.path + suffix, "w") as f:
+                json.dump({"dim": self.dim, "matrix": os.path.basename(matrix_path),
+                           "ids": ids, "digests": digests}, f)
+            os.replace(self.path + suffix, self.path)
+        except OSError as e:
+            # Read-only deploys still work, just from the in-memory matrix
+            log.warning("Could not write embedding index", extra={"path": self.path, "error": str(e)})
+            return matrix
+        self._remove_stale(matrix_path)
+        return np.load(matrix_path, mmap_mode="r")
+
+    def _remove_stale(self, current):
+        cutoff = time.time() - STALE_MATRIX_SECONDS
+        for path in glob.glob(glob.escape(self._base) + "-*.npy"):
+            try:
+                if path != current and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def search(self, queries, k=3, allowed=None):
+        """
+        Top-k (row, score) pairs per query text by cosine similarity, best
+        first. `allowed` is an optional list with one collection of row
+        ids (or None for no filter) per query.
+        """
+        # Read once: apply() may swap it from under us between statements
+        matrix = self.matrix
+        if matrix is None or not matrix.shape[1] or not queries:
+            return [[] for _ in queries]
+        vectors = embed(queries, self.dim)
+        # A query hashes into a few dozen buckets; only their rows of the
+        # bucket-major matrix are read, not the whole index
+        buckets = np.flatnonzero(vectors.any(axis=0))
+        scores = vectors[:, buckets] @ matrix[buckets]
+        results = []
+        for i, row_scores in enumerate(scores):
+            rows = None
+            if allowed is not None and allowed[i] is not None:
+                rows = np.fromiter(allowed[i], dtype=np.intp)
+                row_scores = row_scores[rows]
+            top = min(k, len(row_scores))
+            if top <= 0:
+                results.append([])
+                continue
+            best = np.argpartition(-row_scores, top - 1)[:top]
+            best = best[np.argsort(-row_scores[best])]
+            picked = best if rows is None else rows[best]
+            results.append([(int(r), float(score)) for r, score in zip(picked, row_scores[best])])
+        return results
+
+    def stats(self):
+        return {"rows": len(self.ids), "dim": self.dim, "last_embedded": self.last_embedded, "path": self.path}
+
+
+embedding_index = EmbeddingIndex()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the hook template embedding index")
+    parser.add_argument("source", nargs="?", help="CSV or XLSX file (default: Supabase hook_templates)")
+    parser.add_argument("--encoding", default="latin1", help="CSV encoding")
+    args = parser.parse_args()
+
+    # Through the modules, not this __main__ copy, so we see what templates.py synced
+    from templates import template_index
+    from embeddings import embedding_index as index
+
+    if args.source:
+        from upload import read_rows, _clean
+
+        rows = [row for row in map(_clean, read_rows(args.source, args.encoding)) if row]
+        template_index.build(rows)
+    else:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        asyncio.run(template_index.load(supabase))
+
+    stats = index.stats()
+    print(f"{stats['rows']} templates indexed ({stats['last_embedded']} embedded) -> {stats['path']}")
+
+
+if __name__ == "__main__":
+    main()
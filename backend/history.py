@@ -0,0 +1,153 @@
+import os
+import json
+import base64
+import asyncio
+
+from concurrency import run_db
+from logs import get_logger
+from state import resolve
+
+# -------------------------------------------------------------------
+#  GENERATION HISTORY
+#  Endpoints hand finished generations to HistoryWriter.record(), which
+#  only enqueues. A background task drains the queue and writes rows
+#  to `generations` in multi-row inserts, so recording adds no latency
+#  to the response. A rejected batch is retried row by row so one bad
+#  row only loses itself. Dashboard reads use keyset (cursor) pagination.
+# -------------------------------------------------------------------
+
+log = get_logger("history")
+
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_MS = int(os.getenv("HISTORY_FLUSH_MS", "500"))
+
+
+def encode_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Opaque cursor -> (created_at, id). Raises ValueError on junk input."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class HistoryWriter:
+    def __init__(self, batch_size=HISTORY_BATCH_SIZE, flush_ms=HISTORY_FLUSH_MS, maxsize=HISTORY_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        self._supabase = None
+        # Rows taken off the queue but not yet written
+        self._batch = []
+        self.dropped = 0
+
+    def record(self, user_id, kind, params, items):
+        """Queue one generation for storage. Never blocks or raises."""
+        if not user_id or not items:
+            return
+        row = {"user_id": user_id, "kind": kind, "params": params, "items": items}
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("History queue full, dropped generation", extra={"user_id": user_id})
+
+    def start(self, supabase):
+        self._supabase = supabase
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        batch, self._batch = self._batch, []
+        await self._flush(batch)
+        while not self._queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            # Collect until the batch is full or the flush interval passes
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            # Waits out warm-up instead of dropping the batch on ClientNotReady
+            supabase = await resolve(self._supabase)
+        except Exception as e:
+            log.error("History write failed", extra={"rows_dropped": len(batch), "error": str(e)})
+            return
+        try:
+            await run_db(supabase.table("generations").insert(batch))
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                log.error("History write failed", extra={"rows_dropped": 1, "error": str(e)})
+                return
+            log.warning("History batch insert failed, retrying row by row",
+                        extra={"rows": len(batch), "error": str(e)})
+        # One bad row (e.g. a user deleted since it was queued fails the
+        # foreign key) rejects the whole insert; keep the rest
+        dropped = 0
+        for row in batch:
+            try:
+                await run_db(supabase.table("generations").insert(row))
+            except Exception as e:
+                dropped += 1
+                log.error("History write failed", extra={"user_id": row["user_id"], "error": str(e)})
+        if dropped:
+            log.error("History rows dropped", extra={"rows_dropped": dropped, "rows": len(batch)})
+
+
+async def fetch_dashboard(supabase, user_id, cursor=None, limit=20):
+    """Stats + one history page in a single RPC (see get_dashboard in SQL)."""
+    params = {"p_user_id": user_id, "p_limit": limit}
+    if cursor:
+        params["p_before_created_at"], params["p_before_id"] = decode_cursor(cursor)
+    res = await run_db(supabase.rpc("get_dashboard", params))
+    data = res.data or {}
+
+    history = data.get("history") or []
+    next_cursor = None
+    if len(history) == limit:
+        last = history[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {
+        "stats": {
+            "plan": data.get("plan", "free"),
+            "credits": data.get("credits", 0),
+            "total_generated": data.get("total_generated", 0),
+        },
+        "history": history,
+        "next_cursor": next_cursor,
+    }
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,353 @@
+import os
+import re
+import random
+import datetime
+import functools
+
+from logs import get_logger
+from metrics import registry
+from templates import template_index
+
+# -------------------------------------------------------------------
+#  INSTANT HOOKS (no LLM)
+#  Ranks hook_templates against the request (psychology trigger, niche,
+#  tone, content format) and fills their placeholders - "(insert
+#  result)", "X", "#" - from the topic and goal with local rules.
+#  Each placeholder kind has one kind of filler (a noun phrase, a
+#  base-form verb phrase, a number...) and a template is only used when
+#  every slot sits where its filler reads right (SLOT_BEFORE and
+#  friends); the rest are skipped rather than served half-grammatical.
+#  Used for the preview endpoint, as the fallback when Gemini is out of
+#  quota or times out, and (INSTANT_FREE_TIER=1) for free-plan traffic.
+#  The frontend's vocabulary ("FOMO", "Fitness & Health", "bold") is
+#  mapped onto the template columns' ("Fear of Loss", "Health/Fitness",
+#  "Expert/Authoritative") below.
+# -------------------------------------------------------------------
+
+log = get_logger("instant")
+
+INSTANT_FALLBACK = os.getenv("INSTANT_FALLBACK", "1").lower() in ("1", "true", "yes")
+INSTANT_FREE_TIER = os.getenv("INSTANT_FREE_TIER", "").lower() in ("1", "true", "yes")
+INSTANT_HOOK_COUNT = 10
+
+INSTANT_HOOKS = registry.counter(
+    "hookflow_instant_hooks_total", "Hook sets served by the local template engine", ("reason",)
+)
+
+# request value -> substrings of the template column (matched like ILIKE)
+PSYCHOLOGY_TERMS = {
+    "curiosity gap": ("curiosity",),
+    "loss aversion": ("fear of loss",),
+    "pattern interrupt": ("belief challenge", "conspiracy"),
+    "authority": ("authority",),
+    "relatability": ("relatability", "identity"),
+    "negative bias": ("warning", "fear of loss"),
+    "us vs them": ("identity", "comparison"),
+    "fomo": ("fear of loss", "exclusivity", "quick win"),
+}
+NICHE_TERMS = {
+    "fitness & health": ("health", "fitness"),
+    "business & finance": ("business", "finance"),
+    "tech & ai": ("product", "skills"),
+    "personal development": ("personal", "life advice"),
+    "lifestyle & travel": ("lifestyle",),
+    "marketing & sales": ("business", "product"),
+    "education": ("education", "skills"),
+    "comedy & entertainment": ("entertainment",),
+}
+TONE_TERMS = {
+    "bold": ("authoritative", "corrective"),
+    "calm": ("reflective", "personal"),
+    "controversial": ("myth-busting", "corrective"),
+    "storytelling": ("narrative", "personal"),
+    "witty": ("curious", "comparison"),
+    "educational": ("informative", "instructional", "educational"),
+}
+# Per goal: result and action are base-form verb phrases ("how to
+# (insert result)"), outcome is a noun phrase ("got (insert result)"),
+# pain is a gerund/noun phrase ("stop (insert pain point)"). None of
+# them say "your", so they read right after any subject.
+GOAL_PHRASES = {
+    "get followers": ("grow to 10k followers", "post every day", "10k followers",
+                      "posting to zero views", "Follow for more."),
+    "drive engagement": ("get comments on every post", "reply to every comment", "comments on every post",
+                         "posting to silence", "Tell me yours in the comments."),
+    "sell product": ("make the first 100 sales", "sell online", "the first 100 sales", "making zero sales",
+                     "Link in bio."),
+    "generate leads": ("fill a calendar with leads", "book sales calls", "a calendar full of leads",
+                       "chasing cold leads", "Comment \"INFO\" and I'll send it over."),
+    "build community": ("build a community that shows up", "go live every week", "a community that shows up",
+                        "talking to no one", "Tag someone who needs this."),
+    "increase watch time": ("keep people watching to the end", "cut the slow intro", "viewers who stay to the end",
+                            "losing viewers after 2 seconds", "Watch till the end."),
+}
+TONE_ADJECTIVES = {
+    "bold": "unstoppable", "calm": "calm", "controversial": "unpopular",
+    "storytelling": "honest", "witty": "clever", "educational": "simple",
+}
+NICHE_TITLES = {
+    "fitness & health": "fitness coach", "business & finance": "business owner", "tech & ai": "software engineer",
+    "personal development": "life coach", "lifestyle & travel": "travel creator", "marketing & sales": "marketer",
+    "education": "teacher", "comedy & entertainment": "comedian",
+}
+
+# Placeholder kind -> what it is filled with. Templates with any other
+# kind (or a slot in a position its filler can't take) are never used.
+SLOT_KINDS = {
+    **dict.fromkeys(("noun", "item", "thing", "x", "y", "item/thing", "object/item", "skill"), "topic"),
+    **dict.fromkeys(("niche", "industry", "industry/niche", "niche/industry", "skill/niche"), "niche"),
+    **dict.fromkeys(("business",), "business"),
+    **dict.fromkeys(("target audience", "audience"), "audience"),
+    **dict.fromkeys(("action", "verb", "common action"), "action"),
+    **dict.fromkeys(("result", "dream result", "dream results", "results", "big result"), "result"),
+    **dict.fromkeys(("after state", "after", "achievement", "accomplishment", "dream outcome"), "outcome"),
+    **dict.fromkeys(("pain point", "bad result", "negative result", "problem", "before state", "before",
+                     "current state", "condition", "bad habit"), "pain"),
+    **dict.fromkeys(("title", "job title", "occupation", "profession", "job"), "title"),
+    **dict.fromkeys(("person", "name", "first name"), "person"),
+    **dict.fromkeys(("adjective", "trait", "description"), "adjective"),
+    **dict.fromkeys(("#", "number"), "number"),
+    **dict.fromkeys(("$", "price", "dollar amount"), "money"),
+    **dict.fromkeys(("time frame", "period of time", "journey", "weeks"), "time frame"),
+    **dict.fromkeys(("year", "current year"), "year"),
+    **dict.fromkeys(("age",), "age"),
+    **dict.fromkeys(("age group", "age range", "age group or range"), "age group"),
+    **dict.fromkeys(("location", "place"), "location"),
+    **dict.fromkeys(("time",), "clock"),
+}
+# X and Y before one of these are counts ("X days"), not the topic
+COUNTED_WORDS = frozenset((
+    "days", "weeks", "months", "years", "year", "hours", "minutes", "steps", "pieces", "simple", "easy",
+    "ways", "things", "tips", "reasons", "mistakes", "signs", "habits", "people", "times",
+))
+# A slot only reads right after one of these words ("^": start of the
+# text) when listed here, and never after one in SLOT_NOT_BEFORE or
+# before one in SLOT_NOT_AFTER.
+_VERB_BEFORE = frozenset((
+    "to", "can", "can't", "cannot", "could", "will", "won't", "would", "should", "must", "don't", "didn't",
+    "never", "you'll", "i'll", "we'll",
+))
+_OUTCOME_BEFORE = frozenset(("get", "got", "getting", "achieve", "achieved", "reach", "reached", "hit", "for", "with"))
+SLOT_BEFORE = {
+    "action": _VERB_BEFORE,
+    "result": _VERB_BEFORE | _OUTCOME_BEFORE,
+    "outcome": _OUTCOME_BEFORE | {"to", "into", "of", "^"},
+    "pain": frozenset(("from", "with", "without", "about", "of", "stop", "prevent", "solve", "fix", "avoid",
+                       "quit", "like", "by", "^")),
+    "title": frozenset(("a", "an", "the", "my", "your", "every", "this", "elite", "better", "best", "favorite")),
+    "person": frozenset(("my", "your", "the", "a", "and", "to", "with", "told", "tell", "asked", "^")),
+    "adjective": frozenset(("is", "are", "be", "been", "was", "were", "feel", "feels", "look", "looks", "so",
+                            "really", "more", "most", "very", "too", "something", "this", "just", "vs", "^")),
+    "location": frozenset(("in", "from", "to", "of", "near", "the", "my", "your", "^")),
+    "age group": frozenset(("in", "of", "^")),
+    "clock": frozenset(("before", "at", "until", "after", "by")),
+}
+# The topic is uncountable as often as not: no article, no plural
+# determiner, and it's never the subject of a verb slot
+_NOUN_NOT_BEFORE = frozenset(("a", "an", "you", "i", "we", "they", "many", "these", "those", "few", "several", "both"))
+SLOT_NOT_BEFORE = {
+    "topic": _NOUN_NOT_BEFORE,
+    "niche": _NOUN_NOT_BEFORE | {"my", "your", "own"},
+    "audience": _NOUN_NOT_BEFORE,
+    "age": frozenset(("a", "an")),
+}
+# Verb slots take no object (the phrases are complete), "# of things"
+# needs a plural the topic can't give
+_OBJECT_WORDS = frozenset(("a", "an", "the", "this", "that", "these", "those", "your", "my", "their", "it", "them"))
+SLOT_NOT_AFTER = {
+    "action": _OBJECT_WORDS,
+    "result": _OBJECT_WORDS,
+    "number": frozenset(("of",)),
+    "topic": frozenset(("are", "were")),
+    "adjective": frozenset(("than", "then")),
+}
+# A plural topic ("budgeting apps") can't go where the template expects one thing
+SINGULAR_BEFORE = frozenset(("this", "that", "every", "each", "one", "another"))
+SINGULAR_AFTER = frozenset(("is", "was", "looks", "lasts", "has", "does", "it"))
+# "a (insert adjective) person": an adjective after "a"/"an" needs a noun after it
+_ADJECTIVE_NOUNS = frozenset(("person", "guy", "girl", "man", "woman", "household", "one", "day"))
+
+# How much each matching column counts towards a template's rank
+WEIGHTS = {"psychology": 3.0, "niche": 2.0, "tone": 1.5, "format": 1.0}
+GENERIC_NICHE_WEIGHT = 1.0
+FILLABLE_BONUS = 0.5
+
+_PLACEHOLDER = re.compile(r"\(insert ([^)]*)\)|(?<![\w#])#(?![\w#])|\b[XY]\b", re.IGNORECASE)
+_WORD = re.compile(r"[\w'$]+")
+# Filled values are wrapped in these while articles are fixed up, so
+# the template's own "a"/"an" are left alone
+_OPEN, _CLOSE = "\x00", "\x01"
+# "your (insert location)" -> "your my city" -> "my city"
+_DOUBLE_DETERMINER = re.compile(r"\b(?:a|an|the|your|my) (?=\x00(?:a|an|the|your|my) )", re.IGNORECASE)
+_ARTICLE = re.compile(r"\b([Aa])n? (?=\x00(.))")
+
+
+def _terms(mapping, value):
+    value = " ".join(str(value or "").lower().split())
+    return mapping.get(value, (value,) if value else ())
+
+
+@functools.lru_cache(maxsize=4096)
+def _slots(text):
+    """
+    (filler, needs a singular) for each placeholder of `text`, in order,
+    or None if any of them has no filler that reads right there.
+    """
+    # "guy/girl", "(option #1)": choices left for a human to make
+    if re.search(r"[()/]", _PLACEHOLDER.sub("", text)):
+        return None
+    slots = []
+    previous_end = None
+    for match in _PLACEHOLDER.finditer(text):
+        kind = (match.group(1) or match.group(0)).strip().lower()
+        slot = SLOT_KINDS.get(kind)
+        following = _WORD.findall(text[match.end():])[:1]
+        after = following[0].lower() if following else "$"
+        if kind in ("x", "y") and after in COUNTED_WORDS:
+            slot = "number"
+        gap = None if previous_end is None else text[previous_end:match.start()].strip().lower()
+        # Two slots in a row ("(insert action) (insert noun)") never read right
+        if slot is None or gap == "":
+            return None
+        previous_end = match.end()
+        preceding = _WORD.findall(text[:match.start()])[-1:]
+        before = preceding[0].lower() if preceding else "^"
+        # "got (insert result)", "from (insert before) to (insert result)": a noun phrase
+        if slot == "result" and (before in _OUTCOME_BEFORE or (gap == "to" and slots[-1][0] == "pain")):
+            slot = "outcome"
+        # The same phrase twice ("this weight loss and this weight loss") reads as a glitch
+        if slot in (s for s, _ in slots):
+            return None
+        allowed = SLOT_BEFORE.get(slot)
+        if slot == "adjective" and before in ("a", "an") and after in _ADJECTIVE_NOUNS:
+            allowed = None
+        if (
+            (allowed is not None and before not in allowed)
+            or before in SLOT_NOT_BEFORE.get(slot, ())
+            or after in SLOT_NOT_AFTER.get(slot, ())
+        ):
+            return None
+        singular = (
+            before in SINGULAR_BEFORE or after in SINGULAR_AFTER
+            or bool({"a", "an"} & {w.lower() for w in _WORD.findall(text[:match.start()])[-3:]})
+        )
+        slots.append((slot, singular))
+    return tuple(slots)
+
+
+def _plural(phrase):
+    """'budgeting apps' -> True, 'weight loss' -> False (good enough for topics)."""
+    words = phrase.lower().split()
+    return bool(words) and words[-1].endswith("s") and not words[-1].endswith(("ss", "us", "is"))
+
+
+def _tag(text):
+    return "#" + re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+class InstantEngine:
+    def __init__(self, index=template_index):
+        self.index = index
+
+    def _matching(self, column, terms):
+        ids = set()
+        for term in terms:
+            ids |= self.index.lookup(column, term) or set()
+        return ids
+
+    def rank(self, psychology, niche, tone, content_format=None, rng=None):
+        """Template row ids, best match first (ties shuffled by `rng`)."""
+        matches = {
+            "psychology": self._matching("psychology_triggers", _terms(PSYCHOLOGY_TERMS, psychology)),
+            "niche": self._matching("niche_categories", _terms(NICHE_TERMS, niche)),
+            "tone": self._matching("primary_tone", _terms(TONE_TERMS, tone)),
+            "format": self._matching("content_format", _terms({}, content_format)),
+        }
+        generic = self._matching("niche_categories", ("general",))
+        tiebreak = rng.random if rng is not None else float
+        scored = []
+        for i, row in enumerate(self.index.templates):
+            score = sum(WEIGHTS[name] for name, ids in matches.items() if i in ids)
+            if i not in matches["niche"] and i in generic:
+                score += GENERIC_NICHE_WEIGHT
+            if row.get("uses_variables") in (True, "Yes", "yes"):
+                score += FILLABLE_BONUS
+            scored.append((-score, tiebreak(), i))
+        scored.sort()
+        return [i for _, _, i in scored]
+
+    def fill(self, text, topic, goal, niche, tone, rng):
+        """
+        The template with its placeholders replaced by request-specific
+        phrases, or None if one of them has no filler that fits its slot.
+        """
+        slots = _slots(text)
+        if slots is None:
+            return None
+        if _plural(topic) and any(slot == "topic" and singular for slot, singular in slots):
+            return None
+        goal_key = " ".join(goal.lower().split())
+        result, action, outcome, pain, _ = GOAL_PHRASES.get(
+            goal_key, ("get real results", "show up every day", "real results", "getting nowhere", "")
+        )
+        niche_key = " ".join(niche.lower().split())
+        fillers = {
+            "topic": lambda: topic,
+            "niche": lambda: niche_key or topic,
+            "business": lambda: f"{topic} business",
+            "audience": lambda: f"{topic} beginners",
+            "action": lambda: action,
+            "result": lambda: result,
+            "outcome": lambda: outcome,
+            "pain": lambda: pain,
+            "title": lambda: NICHE_TITLES.get(niche_key, "creator"),
+            "person": lambda: "my best friend",
+            "adjective": lambda: TONE_ADJECTIVES.get(tone.lower(), "confident"),
+            "number": lambda: str(rng.choice((3, 5, 7))),
+            "money": lambda: rng.choice(("$500", "$1,000", "$10,000")),
+            "time frame": lambda: rng.choice(("30 days", "90 days", "6 months")),
+            "year": lambda: str(datetime.date.today().year),
+            "age": lambda: str(rng.choice((22, 25, 30))),
+            "age group": lambda: "your 20s",
+            "location": lambda: "my city",
+            "clock": lambda: rng.choice(("5am", "9pm")),
+        }
+        values = iter(slots)
+        filled = _PLACEHOLDER.sub(lambda match: _OPEN + fillers[next(values)[0]]() + _CLOSE, text)
+        filled = _DOUBLE_DETERMINER.sub("", filled)
+        filled = _ARTICLE.sub(lambda m: m.group(1) + ("n " if m.group(2) in "aeiouAEIOU" else " "), filled)
+        filled = filled.replace(_OPEN, "").replace(_CLOSE, "")
+        return filled[:1].upper() + filled[1:]
+
+    def generate(self, topic, tone, niche, goal, platform, psychology, content_format=None, k=INSTANT_HOOK_COUNT):
+        """Up to `k` filled hooks shaped like the LLM's (plus "source": "instant")."""
+        topic = " ".join(str(topic).split())
+        # Same request, same hooks: previews stay stable and cacheable
+        rng = random.Random(f"{topic}|{tone}|{niche}|{goal}|{psychology}".lower())
+        ranked = self.rank(psychology, niche, tone, content_format, rng)
+
+        cta = GOAL_PHRASES.get(" ".join(goal.lower().split()), (None,) * 4 + ("",))[4]
+        tags = (_tag(topic), _tag(niche.split("&")[0]), _tag(platform))
+        hashtags = " ".join(dict.fromkeys(tag for tag in tags if len(tag) > 1))
+        hooks, seen = [], set()
+        for i in ranked:
+            row = self.index.templates[i]
+            hook = self.fill(row["hook_text"], topic, goal, niche, tone, rng)
+            if hook is None or hook.lower() in seen:
+                continue
+            seen.add(hook.lower())
+            trigger = (str(row.get("psychology_triggers") or psychology).split(",")[0]).strip()
+            structure = str(row.get("hook_structure") or "proven").split(",")[0].strip().lower()
+            category = str(row.get("category") or "viral").lower()
+            hooks.append({
+                "hook": hook,
+                "caption": f"{cta} {hashtags}".strip(),
+                "strategy_leak": f"{trigger}: a {structure} template that has worked for {category} content.",
+                "source": "instant",
+            })
+            if len(hooks) == k:
+                break
+        return hooks
+
+
+instant_engine = InstantEngine()
@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import sqlite3
+from urllib.parse import urlparse
+
+import httpx
+
+from concurrency import SQLiteConnections, run_blocking
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  BACKGROUND JOBS
+#  POST /api/hooks/jobs answers immediately with a job id; a pool of
+#  workers in each process drains a durable SQLite queue (shared by all
+#  workers on the host) and stores the result for polling, long-poll,
+#  SSE or a callback POST. Jobs are leased while running, so a crashed
+#  worker's job is picked up again once its lease expires.
+# -------------------------------------------------------------------
+
+log = get_logger("jobs")
+
+JOBS_PATH = os.getenv("JOBS_PATH", "/tmp/hookflow_jobs.sqlite3")
+JOBS_MAX_DEPTH = int(os.getenv("JOBS_MAX_DEPTH", "1000"))
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETRY_BASE_SECONDS = float(os.getenv("JOBS_RETRY_BASE_SECONDS", "5"))
+# Must outlast one generation (see LLM_DEADLINE_SECONDS)
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "120"))
+JOBS_RETENTION_SECONDS = float(os.getenv("JOBS_RETENTION_SECONDS", "86400"))
+# Idle workers re-check the queue this often (jobs from other processes)
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+# Hosts allowed as callback_url targets; empty disables callbacks
+JOB_CALLBACK_HOSTS = {h.strip().lower() for h in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if h.strip()}
+
+FINISHED = ("done", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def callback_allowed(url):
+    parsed = urlparse(url or "")
+    return parsed.scheme == "https" and (parsed.hostname or "").lower() in JOB_CALLBACK_HOSTS
+
+
+class JobStore:
+    """jobs table in a local SQLite file. Every method is blocking."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = SQLiteConnections(path, row_factory=sqlite3.Row)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, user_id TEXT NOT NULL, kind TEXT NOT NULL,"
+            " params TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT, error TEXT, callback_url TEXT, charged INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL,"
+            " run_after REAL NOT NULL, lease_until REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)")
+
+    def _transaction(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def enqueue(self, job_id, user_id, kind, params, callback_url, charged, max_depth):
+        now = time.time()
+
+        def insert(conn):
+            (depth,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if depth >= max_depth:
+                raise QueueFull(f"{depth} jobs queued")
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, kind, params, status, callback_url, charged,"
+                " created_at, updated_at, run_after) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, user_id, kind, json.dumps(params), callback_url, int(charged), now, now, now),
+            )
+        self._transaction(insert)
+
+    def claim(self, lease_seconds):
+        """Lease the oldest runnable job (or one whose worker died). None if idle."""
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?)"
+                " OR (status = 'running' AND lease_until < ?) ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ?"
+                " WHERE id = ?",
+                (now + lease_seconds, now, row["id"]),
+            )
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+        row = self._transaction(take)
+        return _to_job(row) if row is not None else None
+
+    def finish(self, job_id, status, result=None, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+
+    def retry(self, job_id, delay, error):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_until = NULL, updated_at = ?"
+            " WHERE id = ?",
+            (error, now + delay, now, job_id),
+        )
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_job(row) if row is not None else None
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def purge(self, older_than):
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (older_than,)
+        )
+
+
+def _to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def public_view(job):
+    """What the job endpoints return (no internals like leases)."""
+    view = {"job_id": job["id"], "status": job["status"], "attempts": job["attempts"]}
+    if job["status"] == "done":
+        view["result"] = job["result"]
+    elif job["error"]:
+        view["error"] = job["error"]
+    return view
+
+
+class JobQueue:
+    def __init__(self, store, concurrency=JOBS_CONCURRENCY, max_depth=JOBS_MAX_DEPTH,
+                 max_attempts=JOBS_MAX_ATTEMPTS, retry_base=JOBS_RETRY_BASE_SECONDS):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        # kind -> (handler(job) -> result, on_failed(job) or None)
+        self._handlers = {}
+        self._workers = []
+        self._wake = asyncio.Event()
+        # job id -> Event set on the next status change (long-poll/SSE)
+        self._changes = {}
+        self._http = None
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def register(self, kind, handler, on_failed=None):
+        self._handlers[kind] = (handler, on_failed)
+
+    async def submit(self, user_id, kind, params, callback_url=None, charged=False):
+        """
+        Queue a job and return its id. Raises QueueFull past max_depth.
+        `charged` marks jobs that spent a credit (refunded if they fail).
+        """
+        job_id = uuid.uuid4().hex
+        await run_blocking(
+            self.store.enqueue, job_id, user_id, kind, params, callback_url, charged, self.max_depth
+        )
+        self._wake.set()
+        return job_id
+
+    async def get(self, job_id):
+        return await run_blocking(self.store.get, job_id)
+
+    async def wait_for_change(self, job_id, status, timeout):
+        """
+        Return the job once its status differs from `status` (or it is
+        finished), or as it stands after `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] != status or job["status"] in FINISHED or remaining <= 0:
+                return job
+            event = self._changes.setdefault(job_id, asyncio.Event())
+            try:
+                # Local workers signal the event; jobs run by another
+                # process are caught by re-reading the store
+                await asyncio.wait_for(event.wait(), min(remaining, JOBS_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    async def wait_until_finished(self, job_id, timeout):
+        """Long-poll: the job once done/failed, or as it stands after `timeout`."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        job = await self.get(job_id)
+        while job is not None and job["status"] not in FINISHED:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            job = await self.wait_for_change(job_id, job["status"], remaining)
+        return job
+
+    def _notify(self, job_id):
+        event = self._changes.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._purge_forever()))
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _work(self):
+        while True:
+            try:
+                job = await run_blocking(self.store.claim, JOBS_LEASE_SECONDS)
+            except Exception as e:
+                log.error("Job claim failed", extra={"error": str(e)})
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), JOBS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._notify(job["id"])
+            await self._run(job)
+
+    async def _run(self, job):
+        handler, on_failed = self._handlers.get(job["kind"], (None, None))
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job['kind']!r}")
+            result = await handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job leased; it's retried after the lease expires
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            if handler is not None and job["attempts"] < self.max_attempts:
+                delay = self.retry_base * 2 ** (job["attempts"] - 1) * (0.5 + random.random())
+                if not await self._record(job, self.store.retry, job["id"], delay, error):
+                    return
+                self.retried += 1
+                log.warning("Job failed, retrying", extra={"job_id": job["id"], "attempt": job["attempts"], "error": error})
+                self._notify(job["id"])
+                return
+            if not await self._record(job, self.store.finish, job["id"], "failed", error=error):
+                return
+            self.failed += 1
+            log.error("Job failed", extra={"job_id": job["id"], "attempts": job["attempts"], "error": error})
+            job = dict(job, status="failed", error=error)
+            if on_failed is not None:
+                try:
+                    await on_failed(job)
+                except Exception as hook_error:
+                    log.error("Job failure hook failed", extra={"job_id": job["id"], "error": str(hook_error)})
+        else:
+            if not await self._record(job, self.store.finish, job["id"], "done", result=result):
+                return
+            self.completed += 1
+            job = dict(job, status="done", result=result, error=None)
+
+        self._notify(job["id"])
+        if job.get("callback_url"):
+            await self._deliver(job)
+
+    async def _record(self, job, fn, *args, **kwargs):
+        """
+        Write a job's outcome to the store. If that fails it's logged and
+        False returned: the job keeps its lease and is claimed again once
+        it expires, and the worker lives on to take the next one.
+        """
+        try:
+            await run_blocking(fn, *args, **kwargs)
+            return True
+        except Exception as e:
+            log.error("Job store update failed", extra={"job_id": job["id"], "error": str(e)})
+            return False
+
+    async def _deliver(self, job):
+        """Best-effort POST of the finished job to its callback_url."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+        for attempt in range(2):
+            try:
+                response = await self._http.post(job["callback_url"], json=public_view(job))
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError as e:
+                log.warning("Job callback failed", extra={"job_id": job["id"], "error": str(e)})
+            await asyncio.sleep(1 + attempt)
+
+    async def _purge_forever(self):
+        while True:
+            try:
+                await run_blocking(self.store.purge, time.time() - JOBS_RETENTION_SECONDS)
+            except Exception as e:
+                log.warning("Job purge failed", extra={"error": str(e)})
+            await asyncio.sleep(3600)
+
+    async def stats(self):
+        return {
+            "by_status": await run_blocking(self.store.counts),
+            "workers": self.concurrency,
+            "max_depth": self.max_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+job_queue = JobQueue(JobStore(JOBS_PATH))
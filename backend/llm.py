@@ -0,0 +1,262 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+
+from concurrency import llm_slots
+from metrics import GEMINI_SECONDS, QUOTA_ERRORS, record_tokens, span
+
+# -------------------------------------------------------------------
+#  LLM CLIENT
+#  Wraps genai.GenerativeModel (or anything with the same
+#  generate_content_async signature, e.g. a fake in tests) with:
+#    - a per-attempt timeout and an overall deadline (for streams: to
+#      open, between chunks, and for the whole stream)
+#    - jittered exponential retries on retryable errors
+#    - an optional hedged second request after the observed p95
+#    - a fallback model chain
+# -------------------------------------------------------------------
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-flash-latest")
+# Comma separated, tried in order after GEMINI_MODEL gives up
+GEMINI_FALLBACK_MODELS = [m.strip() for m in os.getenv("GEMINI_FALLBACK_MODELS", "").split(",") if m.strip()]
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "25"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "45"))
+# Longest gap between two chunks of a stream before it counts as stalled
+LLM_CHUNK_TIMEOUT_SECONDS = float(os.getenv("LLM_CHUNK_TIMEOUT_SECONDS", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+# Don't hedge before this many samples, or sooner than this delay
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+
+
+class LLMError(Exception):
+    """Raised once every attempt on every model has failed."""
+
+    def __init__(self, message, quota=False, timeout=False):
+        super().__init__(message)
+        self.quota = quota
+        self.timeout = timeout
+
+
+def _status_code(exc):
+    code = getattr(exc, "code", None)
+    # google.api_core exceptions expose the HTTP status as .code
+    return code if isinstance(code, int) else None
+
+
+def is_quota_error(exc):
+    return _status_code(exc) == 429 or "quota" in str(exc).lower() or type(exc).__name__ == "ResourceExhausted"
+
+
+def is_retryable(exc):
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if _status_code(exc) in RETRYABLE_CODES:
+        return True
+    return type(exc).__name__ in ("ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError")
+
+
+def _model_name(model):
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def _observe(name, started, error):
+    """Record a failed attempt by kind."""
+    if isinstance(error, asyncio.TimeoutError):
+        outcome = "timeout"
+    elif is_quota_error(error):
+        outcome = "quota"
+        QUOTA_ERRORS.inc(model=name)
+    else:
+        outcome = "error"
+    GEMINI_SECONDS.observe(time.monotonic() - started, model=name, outcome=outcome)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, q):
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class LLMClient:
+    def __init__(self, models, timeout=LLM_TIMEOUT_SECONDS, deadline=LLM_DEADLINE_SECONDS,
+                 max_retries=LLM_MAX_RETRIES, hedge=LLM_HEDGE, chunk_timeout=LLM_CHUNK_TIMEOUT_SECONDS):
+        self.models = list(models)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.chunk_timeout = chunk_timeout
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        return cls([genai.GenerativeModel(name) for name in [GEMINI_MODEL] + GEMINI_FALLBACK_MODELS])
+
+    def _backoff(self, attempt):
+        return min(8.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+    async def generate(self, prompt, **kwargs):
+        """Return the first successful response, walking retries then fallbacks."""
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline
+        last_error = None
+
+        async with llm_slots:
+            for index, model in enumerate(self.models):
+                if give_up_at <= loop.time():
+                    break
+                # Counted once per model we actually move on to
+                if index:
+                    self.fallbacks += 1
+                for attempt in range(self.max_retries + 1):
+                    remaining = give_up_at - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        return await self._call(model, prompt, min(self.timeout, remaining), kwargs)
+                    except Exception as e:
+                        last_error = e
+                        if not is_retryable(e) or attempt == self.max_retries:
+                            break
+                        self.retries += 1
+                        await asyncio.sleep(min(self._backoff(attempt), max(0.0, give_up_at - loop.time())))
+
+        raise LLMError(
+            f"LLM failed: {last_error!r}" if last_error else "LLM deadline exceeded",
+            quota=last_error is not None and is_quota_error(last_error),
+            timeout=last_error is None or isinstance(last_error, asyncio.TimeoutError),
+        )
+
+    async def _call(self, model, prompt, timeout, kwargs):
+        started = time.monotonic()
+        attempt = lambda: asyncio.wait_for(model.generate_content_async(prompt, **kwargs), timeout)
+        name = _model_name(model)
+
+        hedge_after = self.latency.percentile(0.95) if self.hedge else None
+        with span("gemini", model=name):
+            try:
+                if hedge_after is None:
+                    result = await attempt()
+                else:
+                    result = await self._hedged(attempt, max(hedge_after, HEDGE_MIN_DELAY_SECONDS))
+            except Exception as e:
+                _observe(name, started, e)
+                raise
+
+        elapsed = time.monotonic() - started
+        self.latency.add(elapsed)
+        GEMINI_SECONDS.observe(elapsed, model=name, outcome="ok")
+        record_tokens(prompt, result)
+        return result
+
+    async def _hedged(self, attempt, delay):
+        """Start a second identical request if the first is slower than `delay`."""
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        pending = {primary, asyncio.ensure_future(attempt())}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt, **kwargs):
+        """
+        Yield text chunks. Fallbacks only apply until the stream opens;
+        once chunks have been sent a failure is final. A stream that goes
+        quiet for `chunk_timeout`, or runs past the deadline, raises
+        LLMError(timeout=True) and gives its llm_slots permit back.
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline
+        async with llm_slots:
+            response = None
+            last_error = None
+            for index, model in enumerate(self.models):
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    break
+                if index:
+                    self.fallbacks += 1
+                started = time.monotonic()
+                try:
+                    response = await asyncio.wait_for(
+                        model.generate_content_async(prompt, stream=True, **kwargs), min(self.timeout, remaining)
+                    )
+                    break
+                except Exception as e:
+                    _observe(_model_name(model), started, e)
+                    last_error = e
+            if response is None:
+                raise LLMError(
+                    f"LLM failed: {last_error!r}" if last_error else "LLM deadline exceeded",
+                    quota=last_error is not None and is_quota_error(last_error),
+                    timeout=last_error is None or isinstance(last_error, asyncio.TimeoutError),
+                )
+
+            chars_out = 0
+            chunks = response.__aiter__()
+            while True:
+                wait = min(self.chunk_timeout, give_up_at - loop.time())
+                try:
+                    if wait <= 0:
+                        raise asyncio.TimeoutError()
+                    chunk = await asyncio.wait_for(chunks.__anext__(), wait)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError as e:
+                    _observe(_model_name(model), started, e)
+                    raise LLMError("LLM stream stalled", timeout=True) from e
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety/finish metadata)
+                    continue
+                if text:
+                    chars_out += len(text)
+                    yield text
+
+            # Whole stream, first byte to last chunk
+            GEMINI_SECONDS.observe(time.monotonic() - started, model=_model_name(model), outcome="ok")
+            record_tokens(prompt, chars_out=chars_out)
+
+    def stats(self):
+        return {
+            "p50_seconds": self.latency.percentile(0.5),
+            "p95_seconds": self.latency.percentile(0.95),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "fallbacks": self.fallbacks,
+        }
@@ -1,23 +1,108 @@
 import os
 import random
+import asyncio
 import json
 import hmac
 import hashlib
 from fastapi import FastAPI, Query, HTTPException, Depends, Security, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client
-import google.generativeai as genai
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # 1. Load variables and Initialize App
 load_dotenv()
-app = FastAPI()
+
+from logs import setup_logging, shutdown_logging, get_logger
+setup_logging()
+log = get_logger("main")
+
+import concurrency
+from concurrency import run_db
+from llm import LLMError
+import state
+from state import readiness, client_status, ClientNotReady
+from templates import template_index
+from embeddings import embedding_index
+from search import search_index, InvalidCursor, DEFAULT_LIMIT as SEARCH_DEFAULT_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT
+from cache import generation_cache, make_key
+from singleflight import generation_flights
+from credits import consume_credits, refund_credits
+from profiles import user_profiles
+from pubsub import pubsub
+from ratelimit import rate_limiter, rate_limited
+from history import history_writer, fetch_dashboard
+from streaming import sse, SSE_HEADERS
+from parsing import ObjectScanner, HookItem, CaptionItem, parse_items, validate_items
+from instant import instant_engine, INSTANT_HOOKS, INSTANT_FALLBACK, INSTANT_FREE_TIER
+from prompts import HOOKS_PROMPT, CAPTIONS_PROMPT, template_for, build_hooks_prompt, build_captions_prompt
+from paypal import paypal_client, PayPalError
+from webhooks import verify_event, user_row, seen_webhooks, user_sync, WebhookRejected, WEBHOOK_EVENTS
+from jobs import job_queue, public_view, callback_allowed, QueueFull
+from responses import FastJSONResponse, CompressionMiddleware, make_etag, not_modified, json_response, conditional_json
+from metrics import registry, stage, MetricsMiddleware, CREDIT_DENIALS, PARSE_FAILURES
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here blocks startup: clients and the template index warm up
+    # in the background and /ready turns 200 once they're done
+    async def load_templates():
+        delay = 1
+        while True:
+            try:
+                count = await template_index.load(supabase)
+                log.info("Template index loaded", extra={"templates": count, "embedded": embedding_index.last_embedded})
+                return
+            except Exception as e:
+                log.warning("Template index load failed (retrying)", extra={"error": str(e), "retry_in": delay})
+                await asyncio.sleep(delay)
+                delay = min(60, delay * 2)
+
+    pubsub.start()
+    history_writer.start(supabase)
+    job_queue.start()
+    user_sync.start(supabase)
+    background = [
+        asyncio.create_task(state.warm(supabase, then=load_templates)),
+        asyncio.create_task(state.warm(llm)),
+        asyncio.create_task(state.preload_imports()),
+        asyncio.create_task(template_index.refresh_forever(supabase)),
+    ]
+    if verify_token.jwks is not None:
+        background.append(asyncio.create_task(verify_token.jwks.refresh_forever()))
+    yield
+    for task in background:
+        task.cancel()
+    await job_queue.stop()
+    await user_sync.stop()
+    await history_writer.stop()
+    await pubsub.stop()
+    await paypal_client.aclose()
+    concurrency.shutdown()
+    shutdown_logging()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(MetricsMiddleware)
+# gzip/brotli above COMPRESS_MIN_BYTES (see responses.py); SSE is never compressed
+app.add_middleware(CompressionMiddleware)
 
 @app.get("/")
 async def root():
+    """Liveness: answers as soon as the worker is up, touches nothing."""
     return {"status": "HookFlow API is Live", "version": "1.0.0"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until clients, the template/embedding indexes and caches are warm."""
+    is_ready, report = readiness.report()
+    return JSONResponse(status_code=200 if is_ready else 503, content=report)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (latency histograms and error counters)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # 2. Enable CORS (Restricted for Production)
 # We strip whitespace and trailing slashes for robustness
 allowed_origins = [o.strip().rstrip("/") for o in os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000").split(",")]
@@ -29,15 +114,160 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 3. Initialize Clients
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-# Using gemini-flash-latest as it is compatible with the provided API key
-model = genai.GenerativeModel('gemini-flash-latest')
+# 3. Clients (created on first use or by the warm-up, see state.py)
+supabase = state.supabase
+llm = state.llm
 
-from auth import VerifyToken
+from auth import verify_token
 from fastapi import Depends
 
+def embeddings_status():
+    if template_index.embeddings is not None:
+        return True
+    # Examples fall back to random picks, so this never blocks readiness
+    return "unavailable (random examples)" if template_index.loaded_at else "pending"
+
+def shared_cache_status():
+    if generation_cache.shared is not None:
+        generation_cache.shared.get("readiness-probe")
+    return True
+
+readiness.add("supabase", lambda: client_status(supabase))
+readiness.add("gemini", lambda: client_status(llm))
+readiness.add("templates", lambda: template_index.loaded_at > 0)
+readiness.add("embeddings", embeddings_status, required=False)
+readiness.add("generation_cache", shared_cache_status)
+if verify_token.jwks is not None:
+    readiness.add("jwks", lambda: verify_token.jwks.loaded)
+
+# Add safety settings to avoid blocked responses
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+def pick_examples_text(topic, psychology, niche, tone):
+    """
+    Few-shot examples from the in-memory template index (no DB round trip):
+    templates with the requested trigger, ranked by similarity to the
+    topic, niche and tone.
+    """
+    with stage("template_lookup"):
+        examples = template_index.similar(f"{topic} {niche} {tone} {psychology}", 3, psychology=psychology)
+    if not examples:
+        return "Standard viral hooks structure."
+    return "".join(f"Example {i+1}: {item['hook_text']}\n" for i, item in enumerate(examples))
+
+def parse_response(result, item, schema):
+    """
+    Pull the records out of Gemini's reply (fences/prose/truncation tolerated).
+    A blocked or empty reply raises ValueError from .text; that's a parse
+    failure too.
+    """
+    try:
+        with stage("parse"):
+            return parse_items(result.text, item)
+    except ValueError as parse_error:
+        PARSE_FAILURES.inc(schema=schema)
+        log.warning("JSON parse error", extra={"error": str(parse_error)})
+        raise HTTPException(status_code=500, detail="Failed to parse AI response")
+
+def llm_error_detail(error):
+    """(status, message) shown to the user once every Gemini attempt has failed."""
+    if isinstance(error, ClientNotReady):
+        return error.status_code, error.detail
+    if getattr(error, "quota", False):
+        return 429, "AI Service Quota Exceeded. Please try again in a minute."
+    if getattr(error, "timeout", False):
+        return 504, "AI Generation timed out. Please try again."
+    return 500, "AI Generation failed"
+
+async def refund_if_free(balance, user_id):
+    """Give back the credit for a generation that produced nothing."""
+    # Pro plans aren't charged per generation
+    if balance.is_free:
+        await refund_credits(supabase, user_id)
+
+def instant_hooks(reason, topic, tone, niche, goal, platform, psychology, content_format=None):
+    """Hooks from the local template engine (instant.py): no Gemini call, no cache."""
+    with stage("instant"):
+        hooks = instant_engine.generate(topic, tone, niche, goal, platform, psychology, content_format)
+    INSTANT_HOOKS.inc(reason=reason)
+    return hooks
+
+async def generate_hooks(topic, tone, niche, goal, platform, psychology, instant=False):
+    """
+    Cache -> examples -> prompt -> Gemini -> parse for one parameter set.
+    Shared by the single and batch endpoints; credits are handled by the caller.
+    instant=True serves the local template engine instead (free tier).
+    """
+    if instant:
+        hooks = instant_hooks("free_tier", topic, tone, niche, goal, platform, psychology)
+        if hooks:
+            return hooks
+
+    # 1. SERVE FROM CACHE (same normalized inputs -> no Gemini call)
+    cache_key = make_key("hooks", topic=topic, tone=tone, niche=niche, goal=goal, platform=platform, psychology=psychology)
+    cached = await generation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Identical requests already in flight share that Gemini call
+    return await generation_flights.do(
+        cache_key, lambda: _generate_hooks_uncached(cache_key, topic, tone, niche, goal, platform, psychology)
+    )
+
+async def _generate_hooks_uncached(cache_key, topic, tone, niche, goal, platform, psychology):
+    # 2. PICK 3 EXAMPLES (in-memory index, no DB round trip)
+    examples_text = pick_examples_text(topic, psychology, niche, tone)
+
+    # 3. THE ADVANCED PROMPT
+    with stage("prompt_build"):
+        prompt = build_hooks_prompt(topic, tone, goal, platform, psychology, examples_text)
+
+    # 4. GENERATE (FREE)
+    try:
+        result = await llm.generate(prompt, safety_settings=SAFETY_SETTINGS, generation_config=HOOKS_PROMPT.generation_config)
+    except LLMError as gemini_error:
+        log.error("Gemini error", extra={"error": str(gemini_error)})
+        # Out of quota / too slow: serve template hooks rather than an error.
+        # Not cached, so the next request tries Gemini again.
+        if INSTANT_FALLBACK and (gemini_error.quota or gemini_error.timeout):
+            hooks = instant_hooks("quota" if gemini_error.quota else "timeout", topic, tone, niche, goal, platform, psychology)
+            if hooks:
+                return hooks
+        status, detail = llm_error_detail(gemini_error)
+        raise HTTPException(status_code=status, detail=detail)
+    
+    # 5. Robust JSON extraction
+    data = parse_response(result, HookItem, "hooks")
+
+    await generation_cache.set(cache_key, data)
+    return data
+
+def use_instant(balance):
+    """INSTANT_FREE_TIER=1 serves free plans from the template engine (still 3/day)."""
+    return INSTANT_FREE_TIER and balance.is_free
+
+@app.get("/api/hooks/preview")
+async def preview_hooks(
+    topic: str,
+    tone: str,
+    niche: str,
+    goal: str,
+    platform: str,
+    psychology: str,
+    content_format: str | None = None,
+    auth_result = Depends(rate_limited)
+):
+    """
+    Instant preview from the hook templates (no Gemini call): free,
+    not saved to history, returns in a few milliseconds.
+    """
+    return instant_hooks("preview", topic, tone, niche, goal, platform, psychology, content_format)
+
 @app.get("/api/hooks/generate")
 async def generate_all(
     topic: str, 
@@ -46,282 +276,332 @@ async def generate_all(
     goal: str, 
     platform: str, 
     psychology: str,
-    auth_result = Depends(VerifyToken())
+    auth_result = Depends(rate_limited)
 ):
     try:
-        # 0. SYNC USER & CHECK CREDITS
-        try:
-            user_id = auth_result.get("sub")
-            email = auth_result.get("email") or auth_result.get("primary_email_address") or "" 
-            
-            # 1. Fetch user
-            user_res = supabase.table("users").select("*").eq("user_id", user_id).execute()
-            
-            from datetime import datetime, date
-            current_credits = 3
-            plan = "free"
-
-            if user_res.data:
-                user = user_res.data[0]
-                current_credits = user.get("credits", 0)
-                plan = user.get("plan", "free")
-                last_reset_str = user.get("last_reset_date")
-                today_str = date.today().isoformat()
-
-                # --- DAILY RESET LOGIC ---
-                if plan.lower() == "free" and last_reset_str != today_str:
-                    # Reset to 3 credits for the new day
-                    current_credits = 3
-                    try:
-                        supabase.table("users").update({
-                            "credits": 3,
-                            "last_reset_date": today_str
-                        }).eq("user_id", user_id).execute()
-                        print(f"Daily reset performed for user {user_id}")
-                    except Exception as e:
-                        print(f"Daily reset failed (DB issue): {e}")
-
-            else:
-                # Sync user if missing
-                try:
-                    today_str = date.today().isoformat()
-                    supabase.table("users").upsert({
-                        "user_id": user_id, 
-                        "email": email,
-                        "plan": "free",
-                        "credits": 3,
-                        "last_reset_date": today_str
-                    }, on_conflict="user_id").execute()
-                except Exception as e:
-                    print(f"Initial user sync failed (DB issue): {e}")
-                current_credits = 3
-                plan = "free"
-            
-            # 2. Check limits
-            if plan.lower() == "free" and current_credits <= 0:
-                raise HTTPException(status_code=402, detail="Daily limit reached (3/3). Upgrade to Pro for unlimited generation.")
-
-            # 3. Deduct credit (if Free)
-            if plan.lower() == "free":
-                new_credits = current_credits - 1
-                try:
-                    supabase.table("users").update({"credits": new_credits}).eq("user_id", user_id).execute()
-                    print(f"Deducted credit for user {user_id}. Remaining: {new_credits}")
-                except Exception as e:
-                    print(f"Credit deduction failed (DB issue): {e}")
-        except HTTPException:
-            raise
-        except Exception as sync_e:
-            print(f"User Sync Logic Error: {sync_e}")
-            # Do not block generation if DB has transient issues, but log it.
-            pass
-
+        # 0. CHECK & SPEND CREDIT (single atomic RPC)
+        user_id = auth_result.get("sub")
+        email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
+        balance = await consume_credits(supabase, user_id, email)
+        if not balance.allowed:
+            CREDIT_DENIALS.inc(endpoint="hooks")
+            raise HTTPException(status_code=402, detail="Daily limit reached (3/3). Upgrade to Pro for unlimited generation.")
 
-        # 4. FETCH 3 EXAMPLES (Optional - graceful fallback)
         try:
-            response = supabase.table("hook_templates") \
-                .select("hook_text, hook_structure") \
-                .ilike("psychology_triggers", f"%{psychology}%") \
-                .limit(3) \
-                .execute()
-
-            examples_text = ""
-            if response.data:
-                for i, item in enumerate(response.data):
-                    examples_text += f"Example {i+1}: {item['hook_text']}\n"
-            else:
-                examples_text = "Standard viral hooks structure."
+            hooks = await generate_hooks(topic, tone, niche, goal, platform, psychology, instant=use_instant(balance))
         except Exception:
-            print("Template fetch failed (ignoring)")
-            examples_text = "Standard viral hooks structure."
-
-        # 5. THE ADVANCED PROMPT
-        prompt = f"""
-        Act as a World-Class Viral Content Creator. 
-        Your goal is to generate 10 unique, high-performing video hooks for {platform}.
-        Topic: {topic}
-        Tone: {tone}
-        Strategy: {psychology}
-        Target Goal: {goal}
-
-        {examples_text}
-
-        REQUIREMENTS:
-        1. "hook": A punchy, scroll-stopping opening line (under 15 words).
-        2. "caption": A short, engaging caption for the post.
-        3. "strategy_leak": A 1-sentence explanation of why this hook works based on {psychology}.
-
-        Strict JSON format:
-        [
-          {{
-            "hook": "...",
-            "caption": "...",
-            "strategy_leak": "..."
-          }}
-        ]
-        
-        CRITICAL: Provide 10 distinct variations. DO NOT return empty strings.
-        """
-
-        # 6. GENERATE (FREE)
-        try:
-            # Add safety settings to avoid blocked responses
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-            result = model.generate_content(prompt, safety_settings=safety_settings)
-            
-        except Exception as gemini_error:
-            if "quota" in str(gemini_error).lower():
-                raise HTTPException(status_code=429, detail="AI Service Quota Exceeded. Please try again in a minute.")
-            print(f"Gemini Error: {gemini_error}")
-            raise HTTPException(status_code=500, detail="AI Generation failed")
-        
-        # Robust JSON extraction
-        try:
-            text = result.text.strip()
-            # Remove Markdown code blocks if present
-            if text.startswith("```"):
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
-            
-            start_idx = text.find('[')
-            end_idx = text.rfind(']')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = text[start_idx:end_idx+1]
-                data = json.loads(json_str)
-                # If it's a list, return it
-                if isinstance(data, list):
-                    return data
-                # If it's a dict, wrap it
-                return [data]
-            else:
-                 # Check if it's a single object without brackets
-                 start_obj = text.find('{')
-                 end_obj = text.rfind('}')
-                 if start_obj != -1 and end_obj != -1:
-                     json_str = text[start_obj:end_obj+1]
-                     data = json.loads(json_str)
-                     return [data]
-                 
-                 print(f"AI Output (Not JSON): {text}")
-                 raise HTTPException(status_code=500, detail="AI response was not valid JSON")
-                 
-        except Exception as parse_error:
-            print(f"JSON Parse Error: {parse_error}")
-            raise HTTPException(status_code=500, detail="Failed to parse AI response")
+            # Nothing was generated, so the credit goes back
+            await refund_if_free(balance, user_id)
+            raise
+        history_writer.record(user_id, "hooks", {
+            "topic": topic, "tone": tone, "niche": niche, "goal": goal, "platform": platform, "psychology": psychology
+        }, hooks)
+        return hooks
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Endpoint Error: {e}")
+        log.exception("Endpoint error")
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------------------------------------------------
+#  BATCH GENERATION (agency use: many topics, one request)
+# -------------------------------------------------------------------
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+class HookParams(BaseModel):
+    topic: str
+    tone: str
+    niche: str
+    goal: str
+    platform: str
+    psychology: str
+
+class HookBatchRequest(BaseModel):
+    items: list[HookParams]
+
+@app.post("/api/hooks/generate/batch")
+async def generate_batch(
+    batch: HookBatchRequest,
+    auth_result = Depends(verify_token)
+):
+    """
+    Generate hooks for many parameter sets at once. Credits are charged
+    in one RPC up front and refunded for any item that fails; Gemini
+    calls fan out in parallel under BATCH_CONCURRENCY.
+    """
+    count = len(batch.items)
+    if not count:
+        raise HTTPException(status_code=400, detail="No items to generate")
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (max {BATCH_MAX_ITEMS})")
+
+    user_id = auth_result.get("sub")
+    await rate_limiter.enforce(user_id, cost=count)
+
+    email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
+    balance = await consume_credits(supabase, user_id, email, amount=count)
+    if not balance.allowed:
+        CREDIT_DENIALS.inc(endpoint="hooks_batch")
+        raise HTTPException(status_code=402, detail=f"Not enough credits for {count} generations ({balance.credits} left). Upgrade to Pro for unlimited generation.")
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_one(index, params):
+        async with slots:
+            try:
+                hooks = await generate_hooks(**params.model_dump(), instant=use_instant(balance))
+                history_writer.record(user_id, "hooks", params.model_dump(), hooks)
+                return {"index": index, "topic": params.topic, "status": "ok", "hooks": hooks}
+            except HTTPException as e:
+                return {"index": index, "topic": params.topic, "status": "error", "error": e.detail}
+            except Exception as e:
+                log.exception("Batch item failed", extra={"index": index})
+                return {"index": index, "topic": params.topic, "status": "error", "error": "AI Generation failed"}
+
+    results = await asyncio.gather(*(run_one(i, p) for i, p in enumerate(batch.items)))
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    if failed and balance.is_free:
+        await refund_credits(supabase, user_id, failed)
+
+    return {"results": results, "succeeded": count - failed, "failed": failed}
+
+# -------------------------------------------------------------------
+#  BACKGROUND JOBS (no HTTP connection held open during generation)
+#  POST returns a job id right away; fetch the result with
+#  GET /api/hooks/jobs/{id}?wait=N (long-poll) or the /events SSE stream.
+# -------------------------------------------------------------------
+
+JOB_MAX_WAIT_SECONDS = 30
+
+class HookJobRequest(HookParams):
+    callback_url: str | None = None
+
+async def run_hook_job(job):
+    hooks = await generate_hooks(**job["params"])
+    history_writer.record(job["user_id"], "hooks", job["params"], hooks)
+    return hooks
+
+async def refund_hook_job(job):
+    if job["charged"]:
+        await refund_credits(supabase, job["user_id"])
+
+job_queue.register("hooks", run_hook_job, on_failed=refund_hook_job)
+
+@app.post("/api/hooks/jobs", status_code=202)
+async def create_hook_job(
+    body: HookJobRequest,
+    auth_result = Depends(rate_limited)
+):
+    if body.callback_url and not callback_allowed(body.callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host is not allowed")
+
+    user_id = auth_result.get("sub")
+    email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
+    balance = await consume_credits(supabase, user_id, email)
+    if not balance.allowed:
+        CREDIT_DENIALS.inc(endpoint="hooks_job")
+        raise HTTPException(status_code=402, detail="Daily limit reached (3/3). Upgrade to Pro for unlimited generation.")
+
+    params = body.model_dump(exclude={"callback_url"})
+    try:
+        job_id = await job_queue.submit(user_id, "hooks", params, body.callback_url, charged=balance.is_free)
+    except QueueFull:
+        await refund_if_free(balance, user_id)
+        raise HTTPException(status_code=503, detail="Generation queue is full. Please try again shortly.", headers={"Retry-After": "10"})
+
+    return {"job_id": job_id, "status": "queued", "poll": f"/api/hooks/jobs/{job_id}"}
+
+async def _owned_job(job_id, user_id):
+    job = await job_queue.get(job_id)
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/hooks/jobs/{job_id}")
+async def get_hook_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=JOB_MAX_WAIT_SECONDS),
+    auth_result = Depends(verify_token)
+):
+    """Job status and, once done, its hooks. `wait` long-polls up to that many seconds."""
+    job = await _owned_job(job_id, auth_result.get("sub"))
+    if wait:
+        job = await job_queue.wait_until_finished(job_id, wait)
+        # Purged while we waited
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+    return public_view(job)
+
+@app.get("/api/hooks/jobs/{job_id}/events")
+async def hook_job_events(
+    job_id: str,
+    auth_result = Depends(verify_token)
+):
+    """SSE: a "status" event per change, then "done" (with hooks) or "error"."""
+    job = await _owned_job(job_id, auth_result.get("sub"))
+
+    async def events(job):
+        while True:
+            if job is None:
+                # Purged while we waited
+                yield sse("error", {"detail": "Job not found"})
+                return
+            view = public_view(job)
+            if job["status"] == "done":
+                yield sse("done", view)
+                return
+            if job["status"] == "failed":
+                yield sse("error", {"detail": job["error"] or "AI Generation failed"})
+                return
+            yield sse("status", view)
+            job = await job_queue.wait_for_change(job_id, job["status"], JOB_MAX_WAIT_SECONDS)
+
+    return StreamingResponse(events(job), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# -------------------------------------------------------------------
+#  TEMPLATE SEARCH (in-memory index, see search.py)
+#  /api/templates/search?q=how+to&niche=Health/Fitness&length=40-80
+#  Repeat a facet param to OR values; pass next_cursor back as cursor.
+#  Results only change when the indexed rows do, so the ETag is a digest
+#  of those rows + the query and a revalidation costs no search at all.
+# -------------------------------------------------------------------
+
+SEARCH_CACHE_CONTROL = f"private, max-age={int(os.getenv('SEARCH_MAX_AGE_SECONDS', '60'))}"
+
+@app.get("/api/templates/search")
+async def search_templates(
+    request: Request,
+    q: str | None = None,
+    category: list[str] | None = Query(None),
+    tone: list[str] | None = Query(None),
+    niche: list[str] | None = Query(None),
+    structure: list[str] | None = Query(None),
+    audience: list[str] | None = Query(None),
+    length: list[str] | None = Query(None),
+    cursor: str | None = None,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    auth_result = Depends(verify_token)
+):
+    etag = make_etag(f"{search_index.digest}?{request.url.query}".encode())
+    cached = not_modified(request, etag, SEARCH_CACHE_CONTROL)
+    if cached is not None:
+        return cached
+
+    filters = {"category": category, "tone": tone, "niche": niche, "structure": structure, "audience": audience, "length": length}
+    try:
+        with stage("template_search"):
+            result = search_index.search(q, filters, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(result, etag, SEARCH_CACHE_CONTROL)
+
+# -------------------------------------------------------------------
+#  ADMIN
+# -------------------------------------------------------------------
+
+def require_admin(request: Request):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    supplied = request.headers.get("x-admin-token", "")
+    if not admin_token or not hmac.compare_digest(supplied, admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.post("/api/admin/templates/refresh", dependencies=[Depends(require_admin)])
+async def refresh_templates():
+    """
+    Reload hook_templates into the in-memory index right away
+    (e.g. after running upload.py) instead of waiting for the TTL.
+    """
+    try:
+        count = await template_index.load(supabase)
+    except Exception as e:
+        log.error("Template refresh failed", extra={"error": str(e)})
+        raise HTTPException(status_code=502, detail="Template refresh failed")
+    return {"status": "ok", "templates": count, "embeddings": embedding_index.stats(), "search": search_index.stats()}
+
+@app.get("/api/admin/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Generation cache hit/miss counters (how many Gemini calls were saved)."""
+    return generation_cache.stats()
+
+@app.get("/api/admin/users/cache/stats", dependencies=[Depends(require_admin)])
+async def user_cache_stats():
+    """Profile cache hit rate (paid-plan requests that skipped the credits RPC) and invalidations."""
+    return user_profiles.stats()
+
+@app.get("/api/admin/ratelimit/stats", dependencies=[Depends(require_admin)])
+async def ratelimit_stats():
+    """How many generation requests were turned away, per bucket type."""
+    return rate_limiter.stats()
+
+@app.get("/api/admin/jobs/stats", dependencies=[Depends(require_admin)])
+async def jobs_stats():
+    """Background job queue depth by status and worker outcomes."""
+    return await job_queue.stats()
+
+@app.get("/api/admin/webhooks/stats", dependencies=[Depends(require_admin)])
+async def webhooks_stats():
+    """Pending/flushed Clerk user syncs and how many events were coalesced."""
+    return user_sync.stats()
+
+@app.get("/api/admin/singleflight/stats", dependencies=[Depends(require_admin)])
+async def singleflight_stats():
+    """Gemini calls collapsed by request coalescing, with per-key waiter counts."""
+    return generation_flights.stats()
+
+@app.get("/api/admin/llm/stats", dependencies=[Depends(require_admin)])
+async def llm_stats():
+    """Gemini latency percentiles and how often retries, hedges and fallbacks fired."""
+    return llm.stats()
+
 # -------------------------------------------------------------------
 #  WEBHOOKS (Sync Clerk Users to Supabase)
 # -------------------------------------------------------------------
 
-import hmac
-import hashlib
-from svix.webhooks import Webhook, WebhookVerificationError
 from fastapi import Request
 
 @app.post("/api/webhooks/clerk")
 async def clerk_webhook(request: Request):
     """
     Listen to Clerk events (user.created, user.updated) and sync to Supabase.
+    Verified events are acked immediately; the users upsert is batched.
     """
-    # 1. Get Headers
+    # 1. Verify (headers + signature)
     headers = request.headers
-    svix_id = headers.get("svix-id")
-    svix_timestamp = headers.get("svix-timestamp")
-    svix_signature = headers.get("svix-signature")
-
-    if not svix_id or not svix_timestamp or not svix_signature:
-        return {"message": "Missing svix headers"}, 400
-
-    # 2. Get Body
     payload = await request.body()
-    secret = os.getenv("CLERK_WEBHOOK_SECRET")
-
-    # 3. Verify Signature
     try:
-        wh = Webhook(secret)
-        # Webhook.verify raises an exception if verification fails
-        evt = wh.verify(payload, headers)
-    except WebhookVerificationError:
-        return {"message": "Invalid signature"}, 400
-    except Exception as e:
-         return {"message": f"Verification failed: {str(e)}"}, 400
-
-    # 4. Handle Event
-    event_type = evt.get("type")
-    data = evt.get("data")
+        evt = verify_event(payload, headers, os.getenv("CLERK_WEBHOOK_SECRET"))
+    except WebhookRejected as e:
+        WEBHOOK_EVENTS.inc(outcome="rejected")
+        return JSONResponse(status_code=e.status_code, content={"message": str(e)})
 
-    print(f"WEBHOOK RECEIVED: {event_type}")
-
-    if event_type in ["user.created", "user.updated"]:
-        # Extract user info
-        user_id = data.get("id")
-        email_addresses = data.get("email_addresses", [])
-        primary_email_id = data.get("primary_email_address_id")
-        
-        # Find primary email
-        email = ""
-        for e in email_addresses:
-            if e.get("id") == primary_email_id:
-                email = e.get("email_address")
-                break
-        
-        # Fallback if primary id search fails but list exists
-        if not email and email_addresses:
-            email = email_addresses[0].get("email_address")
+    # 2. Drop redeliveries of an event we already accepted
+    svix_id = headers.get("svix-id")
+    if not seen_webhooks.add(svix_id):
+        WEBHOOK_EVENTS.inc(outcome="duplicate")
+        return {"status": "ok", "duplicate": True}
 
-        # Sync to Supabase
-        try:
-            user_data = {
-                "user_id": user_id,
-                "email": email,
-                # For new users, we can set defaults. For updates, we might want to be careful not to overwrite plan if not in payload
-                # But typically Clerk webhook sends full user object. 
-                # To be safe for updates, we might want to ONLY upsert id/email and ignore plan/credits unless we track them in Clerk metadata.
-                # For simplicity here, we stick to ID/Email and default plan if missing (but upsert handles existing rows gracefully if we don't pass all cols?)
-                # Upsert replaces the row if we provide all data. If we just want to update email, we should be careful.
-                # Actually Supabase upsert will update the columns provided.
-                # Let's ensure we don't reset 'plan' or 'credits' to null/default on 'user.updated' if we don't want to.
-                # Ideally, we verify if user exists first or use a more specific update.
-                # For this MVP, let's assume we just want to ensure ID/Email are in sync.
-                "email": email
-            }
-            # Only set defaults on insert (trickier with simple upsert). 
-            # Let's just do a basic upsert for ID/Email. 
-            # NOTE: If rows exist, this updates email. It WON'T touch plan/credits if we don't pass them, 
-            # PROVIDED we use the right query. 
-            # supabase-py's upsert: data dict. 
-            
-            # Better strategy: 
-            # 1. Try to get user
-            # 2. If exists, update email.
-            # 3. If not, insert with defaults.
-            
-            # Simplified for MVP: Just upsert ID and Email. 
-            # If it's a new user, Supabase might complain if 'plan' is required but has default? (It has default 'free').
-            
-            res = supabase.table("users").upsert({
-                "user_id": user_id, 
-                "email": email
-            }, on_conflict="user_id").execute()
-            
-            print(f"Synced user {user_id} to Supabase")
-            
-        except Exception as db_e:
-            print(f"Failed to sync user to DB: {db_e}")
+    # 3. Queue the sync
+    event_type = evt.get("type")
+    log.info("Webhook received", extra={"event_type": event_type})
+    try:
+        data = evt.get("data") or {}
+        if event_type in ["user.created", "user.updated"]:
+            # Only id/email: plan and credits are never touched by Clerk events
+            user_sync.record(user_row(data))
+        if (event_type or "").startswith("user.") and data.get("id"):
+            await user_profiles.invalidate(data["id"])
+    except Exception as e:
+        # Not accepted after all: forget the id so svix's retry isn't dropped as a duplicate
+        seen_webhooks.discard(svix_id)
+        WEBHOOK_EVENTS.inc(outcome="failed")
+        log.error("Webhook processing failed", extra={"event_type": event_type, "error": str(e)})
+        return JSONResponse(status_code=500, content={"message": "Webhook processing failed"})
 
+    WEBHOOK_EVENTS.inc(outcome="accepted")
     return {"status": "ok"}
 
 
@@ -329,203 +609,216 @@ async def clerk_webhook(request: Request):
 #  DASHBOARD ENDPOINT
 # -------------------------------------------------------------------
 
+# Always revalidated (credits change), but an unchanged poll is an empty 304
+DASHBOARD_CACHE_CONTROL = "private, no-cache"
+
 @app.get("/api/user/dashboard")
-async def get_dashboard_data(auth_result = Depends(VerifyToken())):
+async def get_dashboard_data(
+    request: Request,
+    cursor: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    auth_result = Depends(verify_token)
+):
     """
-    Fetch user stats and simple history.
+    Fetch user stats and one page of generation history.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
     """
     try:
         user_id = auth_result.get("sub")
-        
-        # 1. Fetch User Stats (Plan, Credits)
-        user_res = supabase.table("users").select("*").eq("user_id", user_id).execute()
-        
-        if not user_res.data:
-            # User might not exist yet if webhook failed or simple laziness. 
-            # Create a basic record on the fly ?
-            # Or return defaults.
-            user_info = {
-                "plan": "free",
-                "credits": 3, # Default free credits
-                "user_id": user_id
-            }
-            # Optional: auto-create user here too just in case
-            try:
-                supabase.table("users").insert({"user_id": user_id, "email": "", "plan": "free"}).execute()
-            except:
-                pass
-        else:
-            user_info = user_res.data[0]
-            # --- SYNC CREDITS ON DASHBOARD LOAD ---
-            try:
-                from datetime import date
-                today_str = date.today().isoformat()
-                if user_info.get("plan") == "free" and (user_info.get("last_reset_date") != today_str or user_info.get("credits", 0) > 3):
-                    # Force reset if new day OR if they have legacy 5 credits
-                    supabase.table("users").update({
-                        "credits": 3,
-                        "last_reset_date": today_str
-                    }).eq("user_id", user_id).execute()
-                    user_info["credits"] = 3
-            except Exception as reset_err:
-                print(f"Credit sync skipped (Column likely missing): {reset_err}")
-
-        # 2. Fetch History (Optional - for now just return empty or mock)
-        # We haven't set up a 'history' table yet. 
-        # let's mock it or return empty list.
-        history = []
-        
-        return {
-            "stats": {
-                "plan": user_info.get("plan", "free"),
-                "credits": user_info.get("credits", 0)
-            },
-            "history": history
-        }
+        # Stats (with daily reset) + history page in one query
+        dashboard = await fetch_dashboard(supabase, user_id, cursor=cursor, limit=limit)
+        user_profiles.update(user_id, dashboard["stats"]["plan"], dashboard["stats"]["credits"])
+        return conditional_json(request, dashboard, DASHBOARD_CACHE_CONTROL)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Dashboard Error: {e}")
+        log.exception("Dashboard error")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Note: Do not put 'app.run' here. Use the command below.
 
+async def _generate_captions_uncached(cache_key, topic, platform, tone):
+    # PROMPT
+    with stage("prompt_build"):
+        prompt = build_captions_prompt(topic, platform, tone)
+
+    # GENERATE (FREE)
+    try:
+        result = await llm.generate(prompt, safety_settings=SAFETY_SETTINGS, generation_config=CAPTIONS_PROMPT.generation_config)
+    except LLMError as gemini_error:
+        log.error("Captions Gemini error", extra={"error": str(gemini_error)})
+        status, detail = llm_error_detail(gemini_error)
+        raise HTTPException(status_code=status, detail=detail)
+
+    # Robust JSON extraction
+    data = parse_response(result, CaptionItem, "captions")
+
+    await generation_cache.set(cache_key, data)
+    return data
+
 @app.get("/api/captions/generate")
 async def generate_captions(
     topic: str,
     platform: str,
     tone: str,
-    auth_result = Depends(VerifyToken())
+    auth_result = Depends(rate_limited)
 ):
     try:
-        # SYNC USER & CHECK CREDITS
+        # CHECK & SPEND CREDIT (single atomic RPC)
         user_id = auth_result.get("sub")
         email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
-        
-        # 1. Fetch user logic
-        current_credits = 3
-        plan = "free"
-        
+        balance = await consume_credits(supabase, user_id, email)
+        if not balance.allowed:
+            CREDIT_DENIALS.inc(endpoint="captions")
+            raise HTTPException(status_code=402, detail="Insufficient credits. Please upgrade to Pro for unlimited access.")
+
+        # SERVE FROM CACHE
+        cache_key = make_key("captions", topic=topic, platform=platform, tone=tone)
+        history_params = {"topic": topic, "platform": platform, "tone": tone}
+        cached = await generation_cache.get(cache_key)
+        if cached is not None:
+            history_writer.record(user_id, "captions", history_params, cached)
+            return cached
+
         try:
-            user_res = supabase.table("users").select("plan, credits").eq("user_id", user_id).execute()
-            
-            if user_res.data:
-                user = user_res.data[0]
-                current_credits = user.get("credits", 0)
-                plan = user.get("plan", "free")
-            else:
-                supabase.table("users").upsert({
-                    "user_id": user_id, 
-                    "email": email,
-                    "plan": "free",
-                    "credits": 3
-                }, on_conflict="user_id").execute()
-            
-            # 2. Check limits
-            if plan.lower() == "free" and current_credits <= 0:
-                raise HTTPException(status_code=402, detail="Insufficient credits. Please upgrade to Pro for unlimited access.")
-
-            # 3. Deduct credit (if Free)
-            if plan.lower() == "free":
-                 new_credits = current_credits - 1
-                 supabase.table("users").update({"credits": new_credits}).eq("user_id", user_id).execute()
-        except HTTPException:
+            data = await generation_flights.do(
+                cache_key, lambda: _generate_captions_uncached(cache_key, topic, platform, tone)
+            )
+        except Exception:
+            await refund_if_free(balance, user_id)
             raise
-        except Exception as e:
-            print(f"Captions DB sync failed: {e}")
-            # Do not block generation
-            pass
-
-        # PROMPT
-        prompt = f"""
-        Act as a professional social media manager.
-        Generate 5 engaging captions for {platform} about: {topic}.
-        Tone: {tone}.
-
-        OUTPUT REQUIREMENTS:
-        - Format for {platform} (use line breaks/emojis).
-        - Include 3-5 relevant hashtags.
-        - Return ONLY a valid JSON array.
-        - NO Markdown blocks. NO intro text.
-
-        JSON FORMAT:
-        [
-            {{
-                "id": "1",
-                "text": "Caption text...",
-                "hashtags": ["tag1", "tag2"]
-            }}
-        ]
-        """
-
-        # 6. GENERATE (FREE)
-        try:
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-            result = model.generate_content(prompt, safety_settings=safety_settings)
-        except Exception as gemini_error:
-            # Check for quota
-            if "quota" in str(gemini_error).lower():
-                raise HTTPException(status_code=429, detail="AI Service Quota Exceeded. Please try again in a minute.")
-            print(f"Captions Gemini Error: {gemini_error}")
-            raise HTTPException(status_code=500, detail="AI Generation failed")
-
-        # Robust JSON extraction
-        try:
-            text = result.text.strip()
-            # Remove Markdown code blocks if present
-            if text.startswith("```"):
-                # Try to extract content between ```json and ``` or just ``` and ```
-                parts = text.split("```")
-                if len(parts) >= 3:
-                    text = parts[1] # middle part
-                    if text.startswith("json"):
-                        text = text[4:].strip()
-                else:
-                    text = parts[1]
-            
-            # Find the first '[' and last ']'
-            start_idx = text.find('[')
-            end_idx = text.rfind(']')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = text[start_idx:end_idx+1]
-                data = json.loads(json_str)
-                return data
-            else:
-                 # Try parsing as a single object if array not found
-                 start_obj = text.find('{')
-                 end_obj = text.rfind('}')
-                 if start_obj != -1 and end_obj != -1:
-                     obj_str = text[start_obj:end_obj+1]
-                     data = [json.loads(obj_str)]
-                     return data
-                 
-                 print(f"AI Output (Not JSON): {text}")
-                 raise HTTPException(status_code=500, detail="AI response was not valid JSON")
-                 
-        except Exception as parse_error:
-            print(f"JSON Parse Error: {parse_error}")
-            raise HTTPException(status_code=500, detail="Failed to parse AI response")
+        history_writer.record(user_id, "captions", history_params, data)
+        return data
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Captions Endpoint Error: {e}")
+        log.exception("Captions endpoint error")
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------------------------------------------------
+#  STREAMING (Server-Sent Events)
+#  Same credits, cache and prompts as the endpoints above, but each
+#  item is sent as soon as Gemini finishes writing it.
+#  Events: "item" (one hook/caption), "done" ({count}), "error" ({detail})
+#  A stream that ends in "error" having sent no items is refunded.
+# -------------------------------------------------------------------
+
+async def stream_items(prompt, cache_key, cached, schema, on_complete, on_failure, fallback=None):
+    if cached is not None:
+        for item in cached:
+            yield sse("item", item)
+        on_complete(cached)
+        yield sse("done", {"count": len(cached)})
+        return
+
+    items = []
+    scanner = ObjectScanner()
+    try:
+        async for chunk in llm.stream(prompt, safety_settings=SAFETY_SETTINGS, generation_config=template_for(schema).generation_config):
+            for item in validate_items(scanner.feed(chunk), schema):
+                items.append(item)
+                yield sse("item", item)
+    except Exception as gemini_error:
+        log.error("Streaming Gemini error", extra={"error": str(gemini_error)})
+        # Nothing sent yet: `fallback(error)` may stand in (instant hooks on quota/timeout)
+        substitute = fallback(gemini_error) if fallback is not None and not items else None
+        if substitute:
+            for item in substitute:
+                yield sse("item", item)
+            on_complete(substitute)
+            yield sse("done", {"count": len(substitute)})
+            return
+        if not items:
+            await on_failure()
+        _, detail = llm_error_detail(gemini_error)
+        yield sse("error", {"detail": detail})
+        return
+
+    if not items:
+        PARSE_FAILURES.inc(schema=schema.__name__)
+        await on_failure()
+        yield sse("error", {"detail": "Failed to parse AI response"})
+        return
+
+    await generation_cache.set(cache_key, items)
+    on_complete(items)
+    yield sse("done", {"count": len(items)})
+
+@app.get("/api/hooks/generate/stream")
+async def generate_all_stream(
+    topic: str,
+    tone: str,
+    niche: str,
+    goal: str,
+    platform: str,
+    psychology: str,
+    auth_result = Depends(rate_limited)
+):
+    # Credit errors are raised before the stream opens so clients still get a real 402
+    user_id = auth_result.get("sub")
+    email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
+    balance = await consume_credits(supabase, user_id, email)
+    if not balance.allowed:
+        CREDIT_DENIALS.inc(endpoint="hooks_stream")
+        raise HTTPException(status_code=402, detail="Daily limit reached (3/3). Upgrade to Pro for unlimited generation.")
+
+    cache_key = make_key("hooks", topic=topic, tone=tone, niche=niche, goal=goal, platform=platform, psychology=psychology)
+    cached = await generation_cache.get(cache_key)
+    if cached is None and use_instant(balance):
+        cached = instant_hooks("free_tier", topic, tone, niche, goal, platform, psychology) or None
+    prompt = None
+    if cached is None:
+        examples_text = pick_examples_text(topic, psychology, niche, tone)
+        with stage("prompt_build"):
+            prompt = build_hooks_prompt(topic, tone, goal, platform, psychology, examples_text)
+
+    history_params = {"topic": topic, "tone": tone, "niche": niche, "goal": goal, "platform": platform, "psychology": psychology}
+    on_complete = lambda items: history_writer.record(user_id, "hooks", history_params, items)
+    on_failure = lambda: refund_if_free(balance, user_id)
+
+    def fallback(error):
+        if INSTANT_FALLBACK and (getattr(error, "quota", False) or getattr(error, "timeout", False)):
+            return instant_hooks("quota" if error.quota else "timeout", topic, tone, niche, goal, platform, psychology)
+        return None
+
+    return StreamingResponse(stream_items(prompt, cache_key, cached, HookItem, on_complete, on_failure, fallback), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/captions/generate/stream")
+async def generate_captions_stream(
+    topic: str,
+    platform: str,
+    tone: str,
+    auth_result = Depends(rate_limited)
+):
+    user_id = auth_result.get("sub")
+    email = auth_result.get("email") or auth_result.get("primary_email_address") or ""
+    balance = await consume_credits(supabase, user_id, email)
+    if not balance.allowed:
+        CREDIT_DENIALS.inc(endpoint="captions_stream")
+        raise HTTPException(status_code=402, detail="Insufficient credits. Please upgrade to Pro for unlimited access.")
+
+    cache_key = make_key("captions", topic=topic, platform=platform, tone=tone)
+    cached = await generation_cache.get(cache_key)
+    prompt = None
+    if cached is None:
+        with stage("prompt_build"):
+            prompt = build_captions_prompt(topic, platform, tone)
+
+    history_params = {"topic": topic, "platform": platform, "tone": tone}
+    on_complete = lambda items: history_writer.record(user_id, "captions", history_params, items)
+    on_failure = lambda: refund_if_free(balance, user_id)
+    return StreamingResponse(stream_items(prompt, cache_key, cached, CaptionItem, on_complete, on_failure), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # -------------------------------------------------------------------
 #  PAYPAL VERIFICATION
 # -------------------------------------------------------------------
-import requests
 
 @app.post("/api/verify-payment")
 async def verify_payment(
     request: Request,
-    auth_result = Depends(VerifyToken())
+    auth_result = Depends(verify_token)
 ):
     try:
         body = await request.json()
@@ -536,45 +829,23 @@ async def verify_payment(
 
         user_id = auth_result.get("sub")
         
-        # 1. Get Access Token
-        client_id = os.getenv("PAYPAL_CLIENT_ID")
-        secret = os.getenv("PAYPAL_CLIENT_SECRET")
+        # 1. Verify Order (cached token, pooled connection, deduped by orderID)
+        await paypal_client.verify_order(order_id, user_id)
+
+        # 2. Upgrade User
+        await run_db(supabase.table("users").update({
+            "plan": "pro",
+            "credits": 999999
+        }).eq("user_id", user_id))
+        await user_profiles.invalidate(user_id, plan="pro")
         
-        # Sandbox or Live URL based on env (default sandbox)
-        paypal_base = "https://api-m.sandbox.paypal.com"
-        
-        auth_response = requests.post(
-            f"{paypal_base}/v1/oauth2/token",
-            auth=(client_id, secret),
-            data={"grant_type": "client_credentials"}
-        )
-        
-        if not auth_response.ok:
-            print(f"PayPal Auth Failed: {auth_response.text}")
-            raise HTTPException(status_code=500, detail="Payment verification failed (Auth)")
-            
-        access_token = auth_response.json().get("access_token")
-        
-        # 2. Verify Order
-        order_response = requests.get(
-            f"{paypal_base}/v2/checkout/orders/{order_id}",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        
-        order_data = order_response.json()
-        status = order_data.get("status")
-        
-        if status == "COMPLETED" or status == "APPROVED":
-             # 3. Upgrade User
-             supabase.table("users").update({
-                 "plan": "pro",
-                 "credits": 999999
-             }).eq("user_id", user_id).execute()
-             
-             return {"status": "success", "plan": "pro"}
-        else:
-            raise HTTPException(status_code=400, detail=f"Payment status: {status}")
+        return {"status": "success", "plan": "pro"}
 
+    except HTTPException:
+        raise
+    except PayPalError as e:
+        log.warning("Payment error", extra={"error": str(e), "status": e.status_code})
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
-        print(f"Payment Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.exception("Payment error")
+        raise HTTPException(status_code=500, detail=str(e))
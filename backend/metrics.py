@@ -0,0 +1,239 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager, nullcontext
+
+# -------------------------------------------------------------------
+#  METRICS & TRACING
+#  Small in-process registry of counters and histograms, rendered in
+#  the Prometheus text format at /metrics. Recording is a lock, a
+#  bisect and two additions, cheap enough for every request.
+#  With OTEL_TRACING=1 and opentelemetry installed, timed stages also
+#  open spans (exported by whatever SDK the deployment configures).
+# -------------------------------------------------------------------
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+_tracer = None
+if OTEL_TRACING:
+    try:
+        from opentelemetry import trace
+        _tracer = trace.get_tracer("hookflow")
+    except ImportError:
+        pass
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += n
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_SECONDS = registry.histogram(
+    "hookflow_http_request_seconds", "Request latency by route", ("method", "route", "status")
+)
+STAGE_SECONDS = registry.histogram(
+    "hookflow_stage_seconds", "Hot-path stage latency (auth_verify, template_lookup, prompt_build, parse)", ("stage",)
+)
+SUPABASE_SECONDS = registry.histogram(
+    "hookflow_supabase_seconds", "Supabase call latency by table/RPC", ("op", "outcome")
+)
+GEMINI_SECONDS = registry.histogram(
+    "hookflow_gemini_seconds", "Gemini call latency per attempt", ("model", "outcome")
+)
+GEMINI_TOKENS = registry.histogram(
+    "hookflow_gemini_tokens", "Tokens per Gemini call", ("direction",), buckets=TOKEN_BUCKETS
+)
+PROMPT_TOKENS = registry.histogram(
+    "hookflow_prompt_tokens_estimated", "Estimated input tokens per rendered prompt", ("template",), buckets=TOKEN_BUCKETS
+)
+CREDIT_DENIALS = registry.counter(
+    "hookflow_credit_denials_total", "Generations refused for lack of credits", ("endpoint",)
+)
+QUOTA_ERRORS = registry.counter(
+    "hookflow_gemini_quota_errors_total", "Gemini calls rejected for quota", ("model",)
+)
+PARSE_FAILURES = registry.counter(
+    "hookflow_parse_failures_total", "Gemini replies with no valid records", ("schema",)
+)
+
+
+def span(name, **attributes):
+    """OpenTelemetry span when tracing is on, otherwise a no-op context."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+@contextmanager
+def stage(name):
+    """Time one hot-path stage into STAGE_SECONDS (and a span)."""
+    with span(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def supabase_op(query):
+    """'rpc/consume_credits' or 'users GET' from a postgrest request builder."""
+    request = getattr(query, "request", None)
+    path = str(getattr(request, "path", ""))
+    if not path:
+        return type(query).__name__
+    name = path.split("/rest/v1/", 1)[-1]
+    if name.startswith("rpc/"):
+        return name
+    method = getattr(request, "http_method", "")
+    return f"{name} {getattr(method, 'value', method)}"
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (~4 chars/token) for when usage_metadata isn't available."""
+    return (len(text) + 3) // 4
+
+
+def record_tokens(prompt, response=None, chars_out=None):
+    """Token counts from usage_metadata, falling back to estimate_tokens."""
+    usage = getattr(response, "usage_metadata", None)
+    tokens_in = getattr(usage, "prompt_token_count", None)
+    tokens_out = getattr(usage, "candidates_token_count", None)
+    if tokens_in is None:
+        tokens_in = estimate_tokens(prompt)
+    if tokens_out is None:
+        if chars_out is None:
+            try:
+                chars_out = len(response.text)
+            except (ValueError, AttributeError):
+                chars_out = 0
+        tokens_out = (chars_out + 3) // 4
+    GEMINI_TOKENS.observe(tokens_in, direction="in")
+    GEMINI_TOKENS.observe(tokens_out, direction="out")
+
+
+class MetricsMiddleware:
+    """Pure ASGI so streaming responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
@@ -0,0 +1,183 @@
+import re
+import json
+from typing import Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, AliasChoices, TypeAdapter, ValidationError
+
+# -------------------------------------------------------------------
+#  LLM RESPONSE PARSING
+#  One parser for hooks and captions, batch and streaming alike.
+#  Fast path: decode the JSON array in place with raw_decode (no
+#  slicing, trailing prose ignored). Slow path: a single-pass scanner
+#  that pulls out every complete top-level {...} object, so fences,
+#  prose, trailing commas and truncated output still yield whatever
+#  finished records the model managed to write.
+# -------------------------------------------------------------------
+
+
+class ParseError(ValueError):
+    pass
+
+
+class HookItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    hook: str = Field(min_length=1, validation_alias=AliasChoices("hook", "text", "hook_text", "content"))
+    caption: str = ""
+    strategy_leak: str = Field("", validation_alias=AliasChoices("strategy_leak", "explanation", "strategy"))
+
+
+class CaptionItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    id: Optional[Union[str, int]] = None
+    text: str = Field(min_length=1, validation_alias=AliasChoices("text", "caption", "content"))
+    hashtags: list[str] = []
+
+
+_decoder = json.JSONDecoder()
+# Outside strings we only care about braces, brackets and quotes
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+# Inside strings only the closing quote and escapes matter
+_IN_STRING = re.compile(r'["\\]')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+# '[' positions tried with raw_decode before falling back to the scanner
+_FAST_PATH_ATTEMPTS = 3
+_list_adapters = {}
+
+
+def _unwrap(obj):
+    """{"hooks": [{...}, ...]} -> [{...}, ...]; a plain record -> [record]."""
+    if isinstance(obj, dict):
+        if len(obj) == 1:
+            (value,) = obj.values()
+            if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+                return value
+        return [obj]
+    return []
+
+
+class ObjectScanner:
+    """
+    Incremental scanner: feed() text chunks, get back each top-level JSON
+    object as soon as its closing brace arrives. Everything outside
+    objects (fences, '[', commas, prose) is skipped.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.dropped = 0
+
+    def feed(self, chunk):
+        completed = []
+        n = len(chunk)
+        i = 0
+        start = 0 if self._depth else None
+
+        if self._escape:
+            # Backslash was the last char of the previous chunk
+            self._escape = False
+            i = 1
+
+        while i < n:
+            if self._in_string:
+                m = _IN_STRING.search(chunk, i)
+                if m is None:
+                    break
+                i = m.end()
+                if m.group() == "\\":
+                    if i >= n:
+                        self._escape = True
+                        break
+                    i += 1
+                else:
+                    self._in_string = False
+                continue
+
+            m = _STRUCTURE.search(chunk, i)
+            if m is None:
+                break
+            ch = m.group()
+            i = m.end()
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._parts = []
+                    start = i - 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:i])
+                    self._emit("".join(self._parts), completed)
+                    self._parts = []
+                    start = None
+
+        if self._depth and start is not None:
+            self._parts.append(chunk[start:])
+        return completed
+
+    def _emit(self, text, completed):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            try:
+                obj = json.loads(_TRAILING_COMMA.sub(r"\1", text))
+            except ValueError:
+                self.dropped += 1
+                return
+        completed.extend(_unwrap(obj))
+
+
+def extract_objects(text):
+    """Every JSON object the model produced, in order."""
+    start = text.find("[")
+    attempts = 0
+    while start != -1 and attempts < _FAST_PATH_ATTEMPTS:
+        # Prose like "Here are [10] hooks:" can precede the real array
+        try:
+            data, _ = _decoder.raw_decode(text, start)
+            if isinstance(data, list) and data and all(isinstance(d, dict) for d in data):
+                return data
+        except ValueError:
+            pass
+        start = text.find("[", start + 1)
+        attempts += 1
+    return ObjectScanner().feed(text)
+
+
+def validate_items(objects, schema):
+    """Keep the records that match `schema`, normalized to its field names."""
+    adapter = _list_adapters.get(schema)
+    if adapter is None:
+        adapter = _list_adapters[schema] = TypeAdapter(list[schema])
+    try:
+        # Whole list in one pydantic-core call (the common, all-valid case)
+        return adapter.dump_python(adapter.validate_python(objects))
+    except ValidationError:
+        pass
+
+    items = []
+    for obj in objects:
+        try:
+            items.append(schema.model_validate(obj).model_dump())
+        except ValidationError:
+            continue
+    return items
+
+
+def parse_items(text, schema):
+    """Extract and validate records from a full model reply."""
+    items = validate_items(extract_objects(text or ""), schema)
+    if not items:
+        raise ParseError("AI response contained no valid records")
+    return items
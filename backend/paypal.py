@@ -0,0 +1,151 @@
+import os
+import time
+import random
+import asyncio
+from collections import OrderedDict
+
+import httpx
+
+from logs import get_logger
+from singleflight import SingleFlight
+
+# -------------------------------------------------------------------
+#  PAYPAL CLIENT
+#  One pooled async HTTP session per worker, an OAuth token reused
+#  until it expires, bounded timeouts/retries, and orderID dedupe so
+#  double-submits from the Pricing page never hit PayPal twice.
+#  Point PAYPAL_API_BASE at a local stub server for testing.
+# -------------------------------------------------------------------
+
+log = get_logger("paypal")
+
+# Sandbox or Live URL based on env (default sandbox)
+PAYPAL_API_BASE = os.getenv("PAYPAL_API_BASE", "https://api-m.sandbox.paypal.com")
+PAYPAL_TIMEOUT_SECONDS = float(os.getenv("PAYPAL_TIMEOUT_SECONDS", "10"))
+PAYPAL_MAX_RETRIES = int(os.getenv("PAYPAL_MAX_RETRIES", "2"))
+# Refresh the token this many seconds before PayPal says it expires
+TOKEN_EXPIRY_MARGIN = 60
+VERIFIED_ORDERS_MAX = 10000
+
+PAID_STATUSES = ("COMPLETED", "APPROVED")
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class PayPalError(Exception):
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PayPalClient:
+    def __init__(self, base_url=PAYPAL_API_BASE, client_id=None, secret=None,
+                 timeout=PAYPAL_TIMEOUT_SECONDS, max_retries=PAYPAL_MAX_RETRIES, transport=None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id or os.getenv("PAYPAL_CLIENT_ID")
+        self.secret = secret or os.getenv("PAYPAL_CLIENT_SECRET")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._transport = transport
+        self._http = None
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        # orderID -> user_id that redeemed it
+        self._verified = OrderedDict()
+        # Concurrent verifications of one orderID share a single lookup
+        self._lookups = SingleFlight()
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self._transport,
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _request(self, method, path, **kwargs):
+        """Send a request, retrying network errors and 429/5xx with jittered backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.http.request(method, path, **kwargs)
+                if response.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                    return response
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise PayPalError(f"PayPal unreachable: {e}", status_code=502)
+            await asyncio.sleep((0.25 * 2 ** attempt) * (0.5 + random.random()))
+
+    async def access_token(self):
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            response = await self._request(
+                "POST", "/v1/oauth2/token",
+                auth=(self.client_id or "", self.secret or ""),
+                data={"grant_type": "client_credentials"},
+            )
+            if response.status_code != 200:
+                log.error("PayPal auth failed", extra={"status": response.status_code, "body": response.text})
+                raise PayPalError("Payment verification failed (Auth)")
+            body = response.json()
+            self._token = body["access_token"]
+            expires_in = int(body.get("expires_in", 0))
+            self._token_expires_at = time.monotonic() + max(expires_in - TOKEN_EXPIRY_MARGIN, 0)
+            return self._token
+
+    async def get_order(self, order_id):
+        for attempt in range(2):
+            token = await self.access_token()
+            response = await self._request(
+                "GET", f"/v2/checkout/orders/{order_id}",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            if response.status_code == 401 and attempt == 0:
+                # Token revoked early; drop it and try once more
+                self._token = None
+                continue
+            if response.status_code == 404:
+                raise PayPalError("Order not found", status_code=400)
+            if response.status_code >= 400:
+                raise PayPalError(f"PayPal order lookup failed ({response.status_code})", status_code=502)
+            return response.json()
+
+    async def verify_order(self, order_id, user_id):
+        """
+        Return True once the order is paid. Repeat calls for an order this
+        user already redeemed return immediately; concurrent calls for the
+        same order share one PayPal lookup.
+        """
+        owner = self._verified.get(order_id)
+        if owner is not None:
+            if owner != user_id:
+                raise PayPalError("Order already redeemed", status_code=409)
+            return True
+
+        # The lookup runs as its own task, so a caller that disconnects
+        # doesn't cancel it for the others waiting on the same order
+        order = await self._lookups.do(order_id, lambda: self.get_order(order_id))
+        status = order.get("status")
+
+        if status not in PAID_STATUSES:
+            raise PayPalError(f"Payment status: {status}", status_code=400)
+
+        owner = self._verified.setdefault(order_id, user_id)
+        if owner != user_id:
+            raise PayPalError("Order already redeemed", status_code=409)
+        while len(self._verified) > VERIFIED_ORDERS_MAX:
+            self._verified.popitem(last=False)
+        return True
+
+
+paypal_client = PayPalClient()
@@ -0,0 +1,115 @@
+import os
+import time
+from dataclasses import dataclass
+from collections import OrderedDict
+
+from logs import get_logger
+from pubsub import pubsub
+
+# -------------------------------------------------------------------
+#  USER PROFILE CACHE
+#  plan + credits per user from the last credits RPC, dashboard read or
+#  payment. Fresh entries for paid plans let the generation path skip
+#  the credits RPC entirely (their balance is never checked); free
+#  users always go to the DB so the atomic decrement stays the source
+#  of truth. Writes elsewhere invalidate the entry on every worker
+#  through the pub/sub backend (pubsub.py).
+# -------------------------------------------------------------------
+
+log = get_logger("profiles")
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+INVALIDATION_CHANNEL = "user_profiles"
+
+
+@dataclass
+class Profile:
+    plan: str
+    credits: int
+    expires_at: float
+
+    @property
+    def is_free(self):
+        return self.plan == "free"
+
+
+class ProfileCache:
+    def __init__(self, ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE, bus=pubsub):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.bus = bus
+        self._profiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        bus.subscribe(INVALIDATION_CHANNEL, self._on_invalidate)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def get(self, user_id):
+        """Fresh cached profile, or None."""
+        profile = self._profiles.get(user_id)
+        if profile is None or profile.expires_at < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return profile
+
+    def plan(self, user_id):
+        """
+        Last plan seen for this user, even if the entry has expired
+        ("free" if never seen). Good enough for sizing rate limits.
+        """
+        profile = self._profiles.get(user_id)
+        return profile.plan if profile is not None else "free"
+
+    def update(self, user_id, plan, credits):
+        """Record a balance just read from or written to the DB. Returns True if the plan changed."""
+        plan = (plan or "free").lower()
+        previous = self._profiles.get(user_id)
+        self._store(user_id, Profile(plan, credits, time.monotonic() + self.ttl))
+        return previous is not None and previous.plan != plan
+
+    def _store(self, user_id, profile):
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.maxsize:
+            self._profiles.popitem(last=False)
+
+    async def invalidate(self, user_id, plan=None):
+        """
+        Drop `user_id` on every worker after a write that changes it. A
+        known new `plan` is kept (expired) so rate limits still size right.
+        """
+        message = {"user_id": user_id, "plan": plan}
+        try:
+            await self.bus.publish(INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            # Publishers always hear their own messages; other workers
+            # catch up when their entry's TTL runs out
+            self._on_invalidate(message)
+            log.warning("Profile invalidation publish failed", extra={"user_id": user_id, "error": str(e)})
+
+    def _on_invalidate(self, message):
+        user_id = message.get("user_id")
+        if user_id not in self._profiles and not message.get("plan"):
+            return
+        self.invalidations += 1
+        plan = message.get("plan") or self._profiles[user_id].plan
+        self._store(user_id, Profile(plan.lower(), 0, 0.0))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "size": len(self._profiles),
+            "pubsub": self.bus.stats(),
+        }
+
+
+user_profiles = ProfileCache()
@@ -0,0 +1,128 @@
+import os
+import textwrap
+from string import Formatter
+
+from metrics import PROMPT_TOKENS, estimate_tokens
+from parsing import HookItem, CaptionItem
+
+# -------------------------------------------------------------------
+#  PROMPT TEMPLATES
+#  Each template is compiled once at import: dedented, stripped of
+#  indentation and blank lines (all billed as input tokens), and split
+#  into literal/field segments so rendering is a single join. The
+#  output shape is sent as a Gemini response_schema (JSON mode)
+#  instead of a JSON example in the prompt, which keeps both the
+#  prompt and the reply shorter and makes the reply parse on the fast
+#  path. LLM_JSON_MODE=0 goes back to a one-line format hint.
+# -------------------------------------------------------------------
+
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1").lower() not in ("0", "false", "no")
+
+
+def _compact(text):
+    lines = (" ".join(line.split()) for line in textwrap.dedent(text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _array_of(properties, required):
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": properties,
+            "required": list(required),
+        },
+    }
+
+
+class PromptTemplate:
+    def __init__(self, name, text, item, response_schema, format_hint, json_mode=LLM_JSON_MODE):
+        self.name = name
+        self.item = item
+        self.response_schema = response_schema
+        self.json_mode = json_mode
+        if not json_mode:
+            text += "\n" + format_hint.replace("{", "{{").replace("}", "}}")
+        self.text = _compact(text)
+        self._segments = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(self.text)
+        ]
+        self.fields = {field for _, field in self._segments if field}
+
+    @property
+    def generation_config(self):
+        """Pass as generation_config= to the model call."""
+        if not self.json_mode:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": self.response_schema}
+
+    def render(self, **values):
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"{self.name} prompt is missing {sorted(missing)}")
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field:
+                parts.append(str(values[field]).strip())
+        prompt = "".join(parts)
+        PROMPT_TOKENS.observe(estimate_tokens(prompt), template=self.name)
+        return prompt
+
+
+HOOKS_PROMPT = PromptTemplate(
+    "hooks",
+    """
+    Act as a world-class viral content creator.
+    Write 10 unique, high-performing video hooks for {platform}.
+    Topic: {topic}
+    Tone: {tone}
+    Strategy: {psychology}
+    Goal: {goal}
+    {examples}
+    For each item:
+    hook: punchy, scroll-stopping opening line, under 15 words.
+    caption: short, engaging caption for the post.
+    strategy_leak: one sentence on why the hook works, based on {psychology}.
+    Give 10 distinct variations. No empty strings.
+    """,
+    item=HookItem,
+    response_schema=_array_of(
+        {"hook": {"type": "string"}, "caption": {"type": "string"}, "strategy_leak": {"type": "string"}},
+        ("hook", "caption", "strategy_leak"),
+    ),
+    format_hint='Return only a JSON array of {"hook","caption","strategy_leak"} objects.',
+)
+
+CAPTIONS_PROMPT = PromptTemplate(
+    "captions",
+    """
+    Act as a professional social media manager.
+    Write 5 engaging captions for {platform} about: {topic}
+    Tone: {tone}
+    Format each text for {platform} (line breaks, emojis) and give 3-5 relevant hashtags.
+    """,
+    item=CaptionItem,
+    response_schema=_array_of(
+        {"id": {"type": "string"}, "text": {"type": "string"}, "hashtags": {"type": "array", "items": {"type": "string"}}},
+        ("id", "text", "hashtags"),
+    ),
+    format_hint='Return only a JSON array of {"id","text","hashtags"} objects. No markdown, no intro text.',
+)
+
+_BY_ITEM = {template.item: template for template in (HOOKS_PROMPT, CAPTIONS_PROMPT)}
+
+
+def template_for(item):
+    """Template whose replies parse into `item` (HookItem / CaptionItem)."""
+    return _BY_ITEM[item]
+
+
+def build_hooks_prompt(topic, tone, goal, platform, psychology, examples_text):
+    return HOOKS_PROMPT.render(
+        topic=topic, tone=tone, goal=goal, platform=platform, psychology=psychology, examples=examples_text
+    )
+
+
+def build_captions_prompt(topic, platform, tone):
+    return CAPTIONS_PROMPT.render(topic=topic, platform=platform, tone=tone)
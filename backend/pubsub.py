@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import asyncio
+
+from concurrency import SQLiteConnections, run_blocking
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  PUB/SUB
+#  Small publish/subscribe surface for cross-worker notifications
+#  (cache invalidation). LocalPubSub fans out inside one process;
+#  SQLitePubSub stands in for Redis pub/sub so every gunicorn worker on
+#  the host hears a message. Anything with publish/subscribe/start/stop
+#  can replace them.
+# -------------------------------------------------------------------
+
+log = get_logger("pubsub")
+
+# "" (in-process only) or "sqlite"
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "").lower()
+PUBSUB_PATH = os.getenv("PUBSUB_PATH", "/tmp/hookflow_pubsub.sqlite3")
+PUBSUB_POLL_MS = int(os.getenv("PUBSUB_POLL_MS", "200"))
+PUBSUB_RETENTION_SECONDS = 300
+
+
+class LocalPubSub:
+    """Delivers to subscribers in this process only."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self.published = 0
+
+    def subscribe(self, channel, callback):
+        """`callback(message)` runs on the event loop for every message on `channel`."""
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def _deliver(self, channel, message):
+        for callback in self._subscribers.get(channel, ()):
+            try:
+                callback(message)
+            except Exception:
+                log.exception("Subscriber failed", extra={"channel": channel})
+
+    async def publish(self, channel, message):
+        self.published += 1
+        self._deliver(channel, message)
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self):
+        return {"backend": "local", "published": self.published}
+
+
+class SQLitePubSub(LocalPubSub):
+    """
+    Messages are appended to a shared SQLite table and every worker polls
+    for rows past the last id it saw. Delivery is at-least-once within
+    PUBSUB_RETENTION_SECONDS. The publishing worker gets its own message
+    right away rather than on the next poll.
+    """
+
+    def __init__(self, path=PUBSUB_PATH, poll_ms=PUBSUB_POLL_MS):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_ms / 1000
+        self._conn = SQLiteConnections(path)
+        self._task = None
+        self._last_id = 0
+        self._own = set()
+        self.received = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL,"
+            " message TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _insert(self, channel, message):
+        now = time.time()
+        conn = self._conn()
+        message_id = conn.execute(
+            "INSERT INTO messages (channel, message, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(message), now),
+        ).lastrowid
+        conn.execute("DELETE FROM messages WHERE created_at < ?", (now - PUBSUB_RETENTION_SECONDS,))
+        return message_id
+
+    def _fetch(self, after_id):
+        return self._conn().execute(
+            "SELECT id, channel, message FROM messages WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+
+    def _max_id(self):
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    async def publish(self, channel, message):
+        self.published += 1
+        message_id = await run_blocking(self._insert, channel, message)
+        if self._task is not None:
+            self._own.add(message_id)
+        self._deliver(channel, message)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        # Only messages published from now on; older ones predate our caches
+        self._last_id = await run_blocking(self._max_id)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await run_blocking(self._fetch, self._last_id)
+            except Exception as e:
+                log.warning("Pub/sub poll failed", extra={"error": str(e)})
+                continue
+            for message_id, channel, message in rows:
+                self._last_id = message_id
+                if message_id in self._own:
+                    self._own.discard(message_id)
+                    continue
+                self.received += 1
+                self._deliver(channel, json.loads(message))
+
+    def stats(self):
+        return {"backend": "sqlite", "published": self.published, "received": self.received}
+
+
+def _build_pubsub():
+    if PUBSUB_BACKEND == "sqlite":
+        return SQLitePubSub()
+    return LocalPubSub()
+
+
+pubsub = _build_pubsub()
@@ -0,0 +1,201 @@
+import os
+import math
+import time
+
+from fastapi import Depends, HTTPException
+
+from auth import verify_token
+from concurrency import SQLiteConnections, run_blocking
+from credits import known_plan
+
+# -------------------------------------------------------------------
+#  RATE LIMITING
+#  Token buckets checked before any DB or LLM work:
+#    - one bucket per user, sized by plan (free / pro)
+#    - one global bucket sized to our Gemini quota
+#  Buckets live in worker memory by default; RATE_LIMIT_BACKEND=sqlite
+#  shares them between the workers on a host. A request costs one token
+#  per generation, so a batch larger than the plan's bucket could never
+#  be afforded: it is turned away with 413 instead.
+# -------------------------------------------------------------------
+
+def _limit(name, default_burst, default_per_minute):
+    burst = float(os.getenv(f"RATE_{name}_BURST", default_burst))
+    per_minute = float(os.getenv(f"RATE_{name}_PER_MINUTE", default_per_minute))
+    return burst, per_minute / 60.0
+
+# plan -> (capacity, tokens refilled per second)
+PLAN_LIMITS = {
+    "free": _limit("FREE", 5, 10),
+    "pro": _limit("PRO", 20, 60),
+}
+GLOBAL_LIMIT = _limit("GLOBAL", 100, 1000)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "").lower()
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "/tmp/hookflow_ratelimit.sqlite3")
+# Buckets idle this long are full again and can be forgotten
+IDLE_EVICT_SECONDS = 3600
+
+
+def _refill(tokens, updated_at, now, capacity, rate):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBucketStore:
+    """key -> [tokens, updated_at]. Event loop only, so no locking needed."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._last_sweep = time.monotonic()
+
+    def take(self, key, capacity, rate, cost):
+        """Spend `cost` tokens. Returns 0 on success, else seconds until affordable."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, capacity, rate)
+        if tokens >= cost:
+            self._buckets[key] = [tokens - cost, now]
+            wait = 0.0
+        else:
+            self._buckets[key] = [tokens, now]
+            wait = (cost - tokens) / rate if rate > 0 else float("inf")
+        self._sweep(now)
+        return wait
+
+    def give_back(self, key, capacity, cost):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(capacity, bucket[0] + cost)
+
+    def _sweep(self, now):
+        if now - self._last_sweep < IDLE_EVICT_SECONDS:
+            return
+        self._last_sweep = now
+        stale = [k for k, (_, updated_at) in self._buckets.items() if now - updated_at > IDLE_EVICT_SECONDS]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    """Same interface, buckets in a SQLite file shared by all workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = SQLiteConnections(path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def take(self, key, capacity, rate, cost):
+        now = time.time()
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so read-refill-write is atomic
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate if rate > 0 else float("inf")
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def give_back(self, key, capacity, cost):
+        self._conn().execute(
+            "UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?", (capacity, cost, key)
+        )
+
+
+class RateLimiter:
+    def __init__(self, store, plan_limits=PLAN_LIMITS, global_limit=GLOBAL_LIMIT):
+        self.store = store
+        self.plan_limits = plan_limits
+        self.global_limit = global_limit
+        self.shared = isinstance(store, SQLiteBucketStore)
+        self.denied_user = 0
+        self.denied_global = 0
+
+    async def _call(self, fn, *args):
+        if self.shared:
+            return await run_blocking(fn, *args)
+        return fn(*args)
+
+    def _plan_limit(self, plan):
+        return self.plan_limits.get((plan or "free").lower(), self.plan_limits["free"])
+
+    def max_cost(self, plan="free"):
+        """Largest request (in tokens) the plan's bucket and the global bucket can ever cover."""
+        return int(min(self._plan_limit(plan)[0], self.global_limit[0]))
+
+    async def check(self, user_id, plan="free", cost=1):
+        """Returns 0 when allowed, otherwise the Retry-After in seconds (inf if it never fits)."""
+        capacity, rate = self._plan_limit(plan)
+        if cost > self.max_cost(plan):
+            self.denied_user += 1
+            return float("inf")
+        user_key = f"user:{user_id}"
+        wait = await self._call(self.store.take, user_key, capacity, rate, cost)
+        if wait:
+            self.denied_user += 1
+            return wait
+
+        global_capacity, global_rate = self.global_limit
+        wait = await self._call(self.store.take, "global", global_capacity, global_rate, cost)
+        if wait:
+            # The request isn't going through, so don't charge the user's bucket
+            await self._call(self.store.give_back, user_key, capacity, cost)
+            self.denied_global += 1
+        return wait
+
+    async def enforce(self, user_id, cost=1):
+        """
+        Raise 413 if `cost` is more than the plan's bucket holds, 429 with
+        Retry-After if the user or the global budget is exhausted.
+        """
+        plan = known_plan(user_id)
+        limit = self.max_cost(plan)
+        if cost > limit:
+            self.denied_user += 1
+            raise HTTPException(status_code=413, detail=f"Too many items for your plan (max {limit} per request)")
+        wait = await self.check(user_id, plan, cost)
+        if wait:
+            retry_after = max(1, math.ceil(wait)) if math.isfinite(wait) else 3600
+            raise HTTPException(
+                status_code=429,
+                detail="Too many generation requests. Please slow down.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    def stats(self):
+        return {
+            "denied_user": self.denied_user,
+            "denied_global": self.denied_global,
+            "backend": "sqlite" if self.shared else "memory",
+        }
+
+
+def _build_store():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBucketStore(RATE_LIMIT_PATH)
+    return MemoryBucketStore()
+
+
+rate_limiter = RateLimiter(_build_store())
+
+
+async def rate_limited(auth_result = Depends(verify_token)):
+    """
+    Drop-in replacement for Depends(verify_token) on generation routes:
+    authenticates, then spends one token from the user and global buckets.
+    """
+    await rate_limiter.enforce(auth_result.get("sub"))
+    return auth_result
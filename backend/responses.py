@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+from metrics import registry
+
+# -------------------------------------------------------------------
+#  RESPONSE LAYER
+#  JSON is rendered with orjson (stdlib json if it isn't installed),
+#  compressed with brotli when the client accepts it (gzip if the
+#  brotli package is missing from an install), gzip otherwise; bodies
+#  under COMPRESS_MIN_BYTES and streams (SSE) go out as they are.
+#  orjson only pays off where the endpoint calls `dumps` itself
+#  (dashboard, template search: ~90 us vs ~4 ms for a dashboard page).
+#  As the default response class it still sits behind FastAPI's
+#  jsonable_encoder, which is most of the cost, and saves ~5-10%
+#  (~3.7 vs ~4.2 ms); see bench/response_bench.py.
+#  Cacheable reads answer with an ETag and Cache-Control, and a
+#  matching If-None-Match gets an empty 304. The ETags are weak (W/):
+#  the identity, gzip and brotli bodies share one, which a strong
+#  validator must not do. Endpoints that can name their content up
+#  front (template search: digest of the indexed rows + query) check
+#  it before doing any work; the rest hash the rendered body.
+# -------------------------------------------------------------------
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 4-5 is the usual sweet spot for dynamic responses (11 is for static assets)
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+NOT_MODIFIED = registry.counter(
+    "hookflow_http_not_modified_total", "Conditional requests answered with 304", ("route",)
+)
+
+
+def dumps(content):
+    """JSON bytes for `content`; types orjson doesn't know go through jsonable_encoder."""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class: JSONResponse rendered by `dumps`. FastAPI has
+    already run the content through jsonable_encoder by the time it gets
+    here, so this only shaves the json.dumps part off.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+def make_etag(data):
+    return 'W/"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: W/ on either side is ignored
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(request, etag, cache_control):
+    """An empty 304 if the client's If-None-Match already has `etag`, else None."""
+    if not _etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    NOT_MODIFIED.inc(route=getattr(request.scope.get("route"), "path", "unmatched"))
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def json_response(content, etag=None, cache_control=None):
+    """200 with `content` rendered once, and the caching headers when given."""
+    body = dumps(content)
+    headers = {"ETag": etag or make_etag(body)}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def conditional_json(request, content, cache_control):
+    """`content` with an ETag of its bytes, or a 304 if the client already has them."""
+    body = dumps(content)
+    etag = make_etag(body)
+    cached = not_modified(request, etag, cache_control)
+    if cached is not None:
+        return cached
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI. Brotli for clients that accept it, Starlette's
+    GZipMiddleware for everyone else (and for all clients if the brotli
+    package isn't installed).
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if brotli is not None and "br" in Headers(scope=scope).get("accept-encoding", ""):
+            return await self.app(scope, receive, self._brotli_sender(send))
+        return await self.gzip(scope, receive, send)
+
+    def _brotli_sender(self, send):
+        # The start message is held back until the first body chunk shows
+        # whether this is a complete, compressible body or a stream
+        pending = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                pending.append(message)
+                return
+            if message["type"] == "http.response.body" and pending:
+                start = pending.pop()
+                headers = MutableHeaders(raw=start["headers"])
+                body = message.get("body", b"")
+                if (
+                    not message.get("more_body", False)
+                    and len(body) >= self.minimum_size
+                    and "content-encoding" not in headers
+                    and not headers.get("content-type", "").startswith("text/event-stream")
+                ):
+                    body = brotli.compress(body, quality=self.brotli_quality)
+                    headers["Content-Encoding"] = "br"
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": body}
+                await send(start)
+            await send(message)
+
+        return send_wrapper
@@ -0,0 +1,326 @@
+import re
+import base64
+import bisect
+import hashlib
+import binascii
+from collections import OrderedDict
+
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  TEMPLATE SEARCH
+#  Inverted index over hook_templates for the template browser:
+#  every word of hook_text and every facet value maps to a bitset (a
+#  Python int, bit i = row i), so a query is a handful of ANDs/ORs on
+#  ints and counting a facet is int.bit_count(). Rows are kept sorted
+#  by hook_id and the pagination cursor is the last hook_id returned,
+#  so cursors stay valid across index reloads. Built together with the
+#  template index (templates.py): `prepare` (seconds at 100k rows) runs
+#  on the I/O pool and `apply` swaps the result in on the event loop.
+#  No query ever reaches Supabase.
+# -------------------------------------------------------------------
+
+log = get_logger("search")
+
+# request param -> hook_templates column (comma-separated values)
+FACET_FIELDS = {
+    "category": "category",
+    "tone": "primary_tone",
+    "niche": "niche_categories",
+    "structure": "hook_structure",
+    "audience": "target_audience",
+}
+# (label, min, max) on hook_length in characters, max exclusive
+LENGTH_BUCKETS = (
+    ("0-40", 0, 40),
+    ("40-80", 40, 80),
+    ("80-120", 80, 120),
+    ("120+", 120, None),
+)
+RESULT_FIELDS = (
+    "hook_id", "hook_text", "category", "primary_tone", "psychology_triggers", "niche_categories",
+    "hook_structure", "target_audience", "content_format", "hook_length", "uses_variables",
+)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Facet values listed per field (most frequent first)
+MAX_FACET_VALUES = 50
+# Below this many matches, facets are tallied row by row instead of
+# with one AND per facet value
+ROW_TALLY_THRESHOLD = 200
+# Distinct prefixes / (query, filters) results remembered between rebuilds
+MAX_CACHED_PREFIXES = 4096
+MAX_CACHED_QUERIES = 1024
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NONZERO = re.compile(rb"[^\x00]")
+_BYTE_BITS = tuple(tuple(b for b in range(8) if n >> b & 1) for n in range(256))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _words(text):
+    return _WORD.findall(str(text or "").lower())
+
+
+def _values(raw):
+    """'Health/Fitness, Finance/Money' -> ['Health/Fitness', 'Finance/Money']"""
+    return [v.strip() for v in str(raw or "").split(",") if v.strip()]
+
+
+def _length_bucket(length):
+    try:
+        length = int(length)
+    except (TypeError, ValueError):
+        return None
+    for label, low, high in LENGTH_BUCKETS:
+        if length >= low and (high is None or length < high):
+            return label
+    return None
+
+
+def encode_cursor(hook_id):
+    return base64.urlsafe_b64encode(str(hook_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _iter_bits(bits):
+    """Set bit positions of `bits`, lowest first (lazy, skips zero bytes in C)."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for match in _NONZERO.finditer(data):
+        offset = match.start()
+        for b in _BYTE_BITS[data[offset]]:
+            yield offset * 8 + b
+
+
+def _bitset(positions, size):
+    """Int with the given bit positions set, built in one pass."""
+    data = bytearray((size + 7) // 8)
+    for i in positions:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, "little")
+
+
+def _digest(rows):
+    h = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        h.update(repr(tuple(row.get(field) for field in RESULT_FIELDS)).encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class SearchIndex:
+    def __init__(self):
+        self.rows = []
+        self.ids = []
+        self.all = 0
+        # Digest of the indexed rows: same content, same value, in every
+        # worker and across restarts (the search ETag is built from it)
+        self.digest = ""
+        self._postings = {}
+        self._vocabulary = []
+        self._prefixes = {}
+        self._queries = OrderedDict()
+        self.query_hits = 0
+        self.query_misses = 0
+        # facet -> {value key: bitset}, plus display labels and per-row keys
+        self._facets = {}
+        self._labels = {}
+        self._row_keys = {}
+        self._totals = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def build(self, templates):
+        """Rebuild from `templates` in the calling thread."""
+        self.apply(self.prepare(templates))
+
+    def prepare(self, templates):
+        """The index for `templates`, built without touching what searches read (see `apply`)."""
+        rows = sorted(
+            ({field: row.get(field) for field in RESULT_FIELDS} for row in templates if row.get("hook_text")),
+            key=lambda row: str(row.get("hook_id") or ""),
+        )
+        # Collect row ids first: OR-ing into a growing int per row is quadratic
+        postings = {}
+        facet_names = (*FACET_FIELDS, "length")
+        facets = {name: {} for name in facet_names}
+        labels = {name: {} for name in facet_names}
+        row_keys = {name: [] for name in facet_names}
+
+        for i, row in enumerate(rows):
+            for word in set(_words(row["hook_text"])):
+                postings.setdefault(word, []).append(i)
+            for name, column in FACET_FIELDS.items():
+                keys = []
+                for value in _values(row.get(column)):
+                    key = value.lower()
+                    facets[name].setdefault(key, []).append(i)
+                    labels[name].setdefault(key, value)
+                    keys.append(key)
+                row_keys[name].append(tuple(keys))
+            bucket = _length_bucket(row.get("hook_length") or len(row["hook_text"]))
+            if bucket is not None:
+                facets["length"].setdefault(bucket, []).append(i)
+                labels["length"][bucket] = bucket
+            row_keys["length"].append((bucket,) if bucket else ())
+
+        size = len(rows)
+        postings = {word: _bitset(ids, size) for word, ids in postings.items()}
+        facets = {name: {key: _bitset(ids, size) for key, ids in values.items()} for name, values in facets.items()}
+
+        totals = {name: {key: bits.bit_count() for key, bits in values.items()} for name, values in facets.items()}
+        log.info("Search index built", extra={"templates": len(rows), "terms": len(postings)})
+        ids = [str(row.get("hook_id") or "") for row in rows]
+        return rows, ids, postings, sorted(postings), facets, labels, row_keys, totals, _digest(rows)
+
+    def apply(self, prepared):
+        """Switch searches to an index from `prepare`. Call it from the event loop."""
+        rows, ids, postings, vocabulary, facets, labels, row_keys, totals, digest = prepared
+        # Swap everything at once so readers never see a half-built index
+        self.rows = rows
+        self.ids = ids
+        self.all = (1 << len(rows)) - 1
+        self._postings, self._vocabulary, self._prefixes = postings, vocabulary, {}
+        self._queries = OrderedDict()
+        self._facets, self._labels, self._row_keys = facets, labels, row_keys
+        self._totals = totals
+        self.digest = digest
+
+    def _match_text(self, query):
+        """Rows containing every word of `query`; the last word also matches as a prefix."""
+        words = _words(query)
+        if not words:
+            return self.all
+        bits = self.all
+        for word in words[:-1]:
+            bits &= self._postings.get(word, 0)
+            if not bits:
+                return 0
+        return bits & self._prefix(words[-1])
+
+    def _prefix(self, prefix):
+        bits = self._prefixes.get(prefix)
+        if bits is None:
+            bits = 0
+            for term in self._vocabulary[bisect.bisect_left(self._vocabulary, prefix):]:
+                if not term.startswith(prefix):
+                    break
+                bits |= self._postings[term]
+            if len(self._prefixes) >= MAX_CACHED_PREFIXES:
+                self._prefixes.clear()
+            self._prefixes[prefix] = bits
+        return bits
+
+    def _match_facet(self, name, selected):
+        """OR of the selected values of one facet (None if nothing selected)."""
+        if not selected:
+            return None
+        buckets = self._facets[name]
+        bits = 0
+        for value in selected:
+            bits |= buckets.get(value.strip().lower(), 0)
+        return bits
+
+    def _counts(self, name, bits):
+        if bits == self.all:
+            counts = self._totals[name]
+        elif bits.bit_count() <= ROW_TALLY_THRESHOLD:
+            keys = self._row_keys[name]
+            counts = {}
+            for i in _iter_bits(bits):
+                for key in keys[i]:
+                    counts[key] = counts.get(key, 0) + 1
+        else:
+            counts = {key: (bits & value_bits).bit_count() for key, value_bits in self._facets[name].items()}
+        if name == "length":
+            order = [label for label, _, _ in LENGTH_BUCKETS]
+            ranked = sorted(counts, key=order.index)
+        else:
+            ranked = sorted(counts, key=lambda key: (-counts[key], key))[:MAX_FACET_VALUES]
+        return [{"value": self._labels[name][key], "count": counts[key]} for key in ranked if counts[key]]
+
+    def _query(self, q, filters):
+        """(matching bits, facet counts) for a query, memoized until the next build."""
+        key = (
+            " ".join(_words(q)),
+            tuple(sorted(
+                (name, tuple(sorted({v.strip().lower() for v in values})))
+                for name, values in filters.items() if values and name in self._facets
+            )),
+        )
+        cached = self._queries.get(key)
+        if cached is not None:
+            self._queries.move_to_end(key)
+            self.query_hits += 1
+            return cached
+        self.query_misses += 1
+
+        text_bits = self._match_text(q)
+        selected = {name: self._match_facet(name, filters.get(name)) for name in self._facets}
+        bits = text_bits
+        for facet_bits in selected.values():
+            if facet_bits is not None:
+                bits &= facet_bits
+
+        facets = {}
+        for name in self._facets:
+            if selected[name] is None:
+                facets[name] = self._counts(name, bits)
+                continue
+            others = text_bits
+            for other, facet_bits in selected.items():
+                if other != name and facet_bits is not None:
+                    others &= facet_bits
+            facets[name] = self._counts(name, others)
+
+        self._queries[key] = (bits, facets)
+        if len(self._queries) > MAX_CACHED_QUERIES:
+            self._queries.popitem(last=False)
+        return bits, facets
+
+    def search(self, q=None, filters=None, cursor=None, limit=DEFAULT_LIMIT):
+        """
+        Templates matching `q` and `filters` ({facet: [values]}), with
+        counts for every facet value. Values of one facet are OR'd,
+        facets are AND'd; each facet's counts ignore its own selection
+        so the UI can show what selecting another value would give.
+        """
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        bits, facets = self._query(q, filters or {})
+
+        start = bisect.bisect_right(self.ids, decode_cursor(cursor)) if cursor else 0
+        positions, more = [], False
+        for i in _iter_bits(bits >> start):
+            if len(positions) == limit:
+                more = True
+                break
+            positions.append(start + i)
+        return {
+            "items": [self.rows[i] for i in positions],
+            "total": bits.bit_count(),
+            "facets": facets,
+            "next_cursor": encode_cursor(self.ids[positions[-1]]) if more else None,
+        }
+
+    def stats(self):
+        return {
+            "templates": len(self.rows),
+            "terms": len(self._postings),
+            "facet_values": {name: len(values) for name, values in self._facets.items()},
+            "cached_queries": len(self._queries),
+            "query_hits": self.query_hits,
+            "query_misses": self.query_misses,
+        }
+
+
+search_index = SearchIndex()
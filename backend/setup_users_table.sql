@@ -28,3 +28,186 @@ create policy "Users can insert their own profile."
 create policy "Users can update own profile."
   on users for update
   using ( true );
+
+-- -------------------------------------------------------------------
+-- CREDITS (called via supabase.rpc from backend/credits.py)
+-- Daily reset, limit check and decrement happen in one statement on a
+-- locked row, so parallel requests from the same user can't overspend.
+-- -------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION consume_credits(p_user_id TEXT, p_email TEXT DEFAULT '', p_amount INTEGER DEFAULT 1)
+RETURNS TABLE (allowed BOOLEAN, user_plan TEXT, balance INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  today TEXT := timezone('utc'::text, now())::date::text;
+BEGIN
+  INSERT INTO users (user_id, email, plan, credits, last_reset_date)
+  VALUES (p_user_id, p_email, 'free', 3, today)
+  ON CONFLICT (user_id) DO NOTHING;
+
+  RETURN QUERY
+  UPDATE users u
+  SET credits = CASE
+        WHEN lower(u.plan) <> 'free' THEN u.credits
+        WHEN u.last_reset_date IS DISTINCT FROM today THEN 3 - p_amount
+        ELSE u.credits - p_amount
+      END,
+      last_reset_date = CASE WHEN lower(u.plan) = 'free' THEN today ELSE u.last_reset_date END
+  WHERE u.user_id = p_user_id
+    AND (
+      lower(u.plan) <> 'free'
+      OR (CASE WHEN u.last_reset_date IS DISTINCT FROM today THEN 3 ELSE u.credits END) >= p_amount
+    )
+  RETURNING true, u.plan, u.credits;
+
+  IF NOT FOUND THEN
+    RETURN QUERY SELECT false, u.plan, u.credits FROM users u WHERE u.user_id = p_user_id;
+  END IF;
+END;
+$$;
+
+-- Read the balance for the dashboard, applying the daily reset (and
+-- clamping legacy balances above 3) without spending anything.
+CREATE OR REPLACE FUNCTION sync_credits(p_user_id TEXT, p_email TEXT DEFAULT '')
+RETURNS TABLE (allowed BOOLEAN, user_plan TEXT, balance INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  today TEXT := timezone('utc'::text, now())::date::text;
+BEGIN
+  INSERT INTO users (user_id, email, plan, credits, last_reset_date)
+  VALUES (p_user_id, p_email, 'free', 3, today)
+  ON CONFLICT (user_id) DO NOTHING;
+
+  RETURN QUERY
+  UPDATE users u
+  SET credits = CASE
+        WHEN lower(u.plan) <> 'free' THEN u.credits
+        WHEN u.last_reset_date IS DISTINCT FROM today OR u.credits > 3 THEN 3
+        ELSE u.credits
+      END,
+      last_reset_date = CASE WHEN lower(u.plan) = 'free' THEN today ELSE u.last_reset_date END
+  WHERE u.user_id = p_user_id
+  RETURNING (lower(u.plan) <> 'free' OR u.credits > 0), u.plan, u.credits;
+END;
+$$;
+
+-- Give credits back when a charged generation fails. Never refunds past
+-- the daily allowance, and is a no-op for paid plans.
+CREATE OR REPLACE FUNCTION refund_credits(p_user_id TEXT, p_amount INTEGER DEFAULT 1)
+RETURNS TABLE (allowed BOOLEAN, user_plan TEXT, balance INTEGER)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  UPDATE users u
+  SET credits = CASE
+        WHEN lower(u.plan) <> 'free' THEN u.credits
+        ELSE LEAST(u.credits + p_amount, 3)
+      END
+  WHERE u.user_id = p_user_id
+  RETURNING true, u.plan, u.credits;
+END;
+$$;
+
+-- -------------------------------------------------------------------
+-- GENERATION HISTORY (written in batches by backend/history.py)
+-- -------------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS generations (
+  id BIGSERIAL PRIMARY KEY,
+  user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  kind TEXT NOT NULL, -- 'hooks' or 'captions'
+  params JSONB NOT NULL DEFAULT '{}'::jsonb,
+  items JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT timezone('utc'::text, now())
+);
+
+-- Serves the dashboard's keyset pagination: WHERE user_id = ? AND (created_at, id) < (?, ?)
+CREATE INDEX IF NOT EXISTS generations_user_created_idx
+  ON generations (user_id, created_at DESC, id DESC);
+
+ALTER TABLE generations ENABLE ROW LEVEL SECURITY;
+
+-- History holds every user's prompts and outputs, so only the backend's
+-- service role may touch it; anon/authenticated clients get nothing.
+-- (The service role bypasses RLS anyway; these make that explicit.)
+DROP POLICY IF EXISTS "Generations are viewable by the backend." ON generations;
+create policy "Generations are viewable by the backend."
+  on generations for select
+  to service_role
+  using ( true );
+
+DROP POLICY IF EXISTS "Generations can be inserted by the backend." ON generations;
+create policy "Generations can be inserted by the backend."
+  on generations for insert
+  to service_role
+  with check ( true );
+
+-- Running total kept on users so the dashboard never has to count(*)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS total_generated INTEGER DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_total_generated()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE users SET total_generated = COALESCE(total_generated, 0) + 1 WHERE user_id = NEW.user_id;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS generations_bump_total ON generations;
+CREATE TRIGGER generations_bump_total
+  AFTER INSERT ON generations
+  FOR EACH ROW EXECUTE FUNCTION bump_total_generated();
+
+-- Stats (with the daily reset applied) and one page of history in one call.
+-- Pass the created_at/id of the last row you have to get the next page.
+CREATE OR REPLACE FUNCTION get_dashboard(
+  p_user_id TEXT,
+  p_limit INTEGER DEFAULT 20,
+  p_before_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+  p_before_id BIGINT DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  stats RECORD;
+  page JSON;
+BEGIN
+  SELECT * INTO stats FROM sync_credits(p_user_id);
+
+  SELECT COALESCE(json_agg(g ORDER BY g.created_at DESC, g.id DESC), '[]'::json) INTO page
+  FROM (
+    SELECT id, kind, params, items, created_at
+    FROM generations
+    WHERE user_id = p_user_id
+      AND (p_before_created_at IS NULL OR (created_at, id) < (p_before_created_at, p_before_id))
+    ORDER BY created_at DESC, id DESC
+    LIMIT p_limit
+  ) g;
+
+  RETURN json_build_object(
+    'plan', stats.user_plan,
+    'credits', stats.balance,
+    'total_generated', (SELECT COALESCE(total_generated, 0) FROM users WHERE user_id = p_user_id),
+    'history', page
+  );
+END;
+$$;
+
+-- -------------------------------------------------------------------
+-- HOOK TEMPLATES (upserted on hook_id by backend/upload.py)
+-- -------------------------------------------------------------------
+
+-- Earlier insert-only imports may have left duplicates; keep the first copy
+DELETE FROM hook_templates a
+USING hook_templates b
+WHERE a.hook_id = b.hook_id
+  AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS hook_templates_hook_id_key
+  ON hook_templates (hook_id);
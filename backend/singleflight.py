@@ -0,0 +1,55 @@
+import asyncio
+from collections import Counter
+
+# -------------------------------------------------------------------
+#  SINGLE-FLIGHT
+#  Concurrent callers with the same key share one execution: the first
+#  caller starts the work, everyone else awaits its result. Used to
+#  collapse identical in-flight Gemini calls when a topic trends.
+# -------------------------------------------------------------------
+
+
+class SingleFlight:
+    def __init__(self):
+        self._tasks = {}
+        # key -> callers currently waiting on someone else's call
+        self._waiters = Counter()
+        self.executed = 0
+        self.collapsed = 0
+        self.max_waiters = 0
+
+    async def do(self, key, fn):
+        """Run `fn()` once per key at a time and hand every caller its result."""
+        task = self._tasks.get(key)
+        if task is None:
+            # A task (not a bare await) so the call survives if the first
+            # caller disconnects while others are still waiting on it
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+            self._tasks[key] = task
+            self.executed += 1
+        else:
+            self._waiters[key] += 1
+            self.collapsed += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._tasks.pop(key, None)
+        self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    def stats(self):
+        calls = self.executed + self.collapsed
+        return {
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / calls, 4) if calls else 0.0,
+            "max_waiters": self.max_waiters,
+            "in_flight": {key: self._waiters.get(key, 0) for key in self._tasks},
+        }
+
+
+generation_flights = SingleFlight()
@@ -0,0 +1,184 @@
+import os
+import time
+import asyncio
+import importlib
+import threading
+
+from fastapi import HTTPException
+
+from concurrency import run_blocking
+from logs import get_logger
+
+# -------------------------------------------------------------------
+#  APPLICATION STATE
+#  Shared clients are created on first use instead of at import, so a
+#  worker starts serving liveness checks without loading the Gemini /
+#  Supabase SDKs and a missing env var fails the requests that need
+#  the client (and /ready) instead of crashing the worker. The lifespan
+#  warms everything in the background; /ready reports when it's done.
+#  Clients are only ever built on a worker thread: touching one from
+#  the event loop before it's ready raises ClientNotReady (a 503 with
+#  Retry-After) and starts a build in the background, instead of
+#  importing the SDK or waiting on the build lock on the loop.
+# -------------------------------------------------------------------
+
+log = get_logger("state")
+
+# Imported in the background during warm-up so the first request that
+# needs them doesn't pay for it
+WARM_IMPORTS = ("svix.webhooks",)
+
+
+class ClientNotReady(HTTPException):
+    def __init__(self, name):
+        super().__init__(status_code=503, detail=f"Service is starting ({name} not ready). Please try again shortly.",
+                         headers={"Retry-After": "5"})
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class Lazy:
+    """
+    Proxy that builds its object on first attribute access (thread safe)
+    and forwards to it afterwards. A failed build is retried next time.
+    On the event loop an unbuilt client raises ClientNotReady and is
+    built in the background rather than blocking the loop.
+    """
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._building = None
+
+    def get(self):
+        value = self._value
+        if value is not None:
+            return value
+        if _on_event_loop():
+            if self._building is None:
+                self._building = asyncio.ensure_future(self._build_in_background())
+            raise ClientNotReady(self._name)
+        with self._lock:
+            if self._value is None:
+                started = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self._error = e
+                    raise
+                self._error = None
+                log.info("Client created", extra={"client": self._name, "ms": round((time.perf_counter() - started) * 1000, 1)})
+            return self._value
+
+    async def _build_in_background(self):
+        try:
+            await run_blocking(self.get)
+        except Exception as e:
+            log.error("Client build failed", extra={"client": self._name, "error": str(e)})
+        finally:
+            self._building = None
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    @property
+    def ready(self):
+        return self._value is not None
+
+    def status(self):
+        if self._value is not None:
+            return "ok"
+        return f"error: {self._error}" if self._error else "pending"
+
+
+def _create_supabase():
+    from supabase import create_client
+
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL / SUPABASE_KEY not set")
+    return create_client(url, key)
+
+
+def _create_llm():
+    # GEMINI_MODEL (default gemini-flash-latest) plus any GEMINI_FALLBACK_MODELS,
+    # with timeouts, retries and optional hedging (see llm.py)
+    from llm import LLMClient
+
+    if not os.getenv("GEMINI_API_KEY"):
+        raise RuntimeError("GEMINI_API_KEY not set")
+    return LLMClient.from_env()
+
+
+async def resolve(client):
+    """The object behind `client`, built (or waited for) off the event loop."""
+    return await run_blocking(client.get) if isinstance(client, Lazy) else client
+
+
+def client_status(client):
+    """Readiness check for a client that may be a Lazy (or a stand-in set by tests)."""
+    return client.status() if isinstance(client, Lazy) else "ok"
+
+
+class Readiness:
+    """
+    Named checks for /ready. A check returns True/"ok" when warm, or a
+    short status string. Optional checks are reported but don't hold
+    readiness back (e.g. a degraded feature with a fallback).
+    """
+
+    def __init__(self):
+        self._checks = {}
+        self.started_at = time.monotonic()
+
+    def add(self, name, check, required=True):
+        self._checks[name] = (check, required)
+
+    def report(self):
+        checks = {}
+        ready = True
+        for name, (check, required) in self._checks.items():
+            try:
+                result = check()
+            except Exception as e:
+                result = f"error: {e}"
+            status = "ok" if result is True else (result or "pending")
+            checks[name] = status
+            if required and status != "ok":
+                ready = False
+        return ready, {"ready": ready, "uptime_seconds": round(time.monotonic() - self.started_at, 1), "checks": checks}
+
+
+async def warm(*clients, then=None):
+    """
+    Background warm-up: build each Lazy client off the event loop, then
+    run `then()` (e.g. loading the template index with that client).
+    """
+    for client in clients:
+        if not isinstance(client, Lazy):
+            continue
+        try:
+            await run_blocking(client.get)
+        except Exception as e:
+            log.error("Client warm-up failed", extra={"client": client._name, "error": str(e)})
+    if then is not None:
+        await then()
+
+
+async def preload_imports():
+    for module in WARM_IMPORTS:
+        await run_blocking(importlib.import_module, module)
+
+
+supabase = Lazy("supabase", _create_supabase)
+llm = Lazy("gemini", _create_llm)
+readiness = Readiness()
@@ -0,0 +1,19 @@
+import json
+
+# -------------------------------------------------------------------
+#  STREAMING HELPERS
+#  SSE framing for the /stream endpoints. The incremental JSON object
+#  scanner lives in parsing.py (ObjectScanner).
+# -------------------------------------------------------------------
+
+
+def sse(event, data):
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
@@ -0,0 +1,182 @@
+import os
+import time
+import random
+import asyncio
+
+from concurrency import run_blocking, run_db
+from embeddings import embedding_index
+from logs import get_logger
+from search import search_index
+
+# -------------------------------------------------------------------
+#  HOOK TEMPLATE INDEX
+#  hook_templates is small and almost static, so we keep the whole
+#  table in memory and index it by the columns the prompt builder
+#  filters on. Lookups never touch Supabase on the request path.
+#  `similar` ranks the filtered rows against the request with the
+#  embedding index (embeddings.py), which is kept row-aligned here.
+#  The template browser's search index (search.py) is rebuilt with it.
+#  Rebuilds are prepared on the I/O pool (hashing and embedding 100k
+#  rows takes seconds) and swapped in on the event loop in one step.
+# -------------------------------------------------------------------
+
+log = get_logger("templates")
+
+TEMPLATES_TTL_SECONDS = int(os.getenv("TEMPLATES_TTL_SECONDS", "900"))
+PAGE_SIZE = 1000
+
+# request filter name -> hook_templates column
+INDEX_FIELDS = {
+    "psychology": "psychology_triggers",
+    "niche": "niche_categories",
+    "tone": "primary_tone",
+    "structure": "hook_structure",
+    "format": "content_format",
+}
+
+
+def _split_values(raw):
+    """'Curiosity Gap, Education/Value' -> ['curiosity gap', 'education/value']"""
+    if not raw:
+        return []
+    return [v.strip().lower() for v in str(raw).split(",") if v.strip()]
+
+
+class TemplateIndex:
+    def __init__(self, ttl=TEMPLATES_TTL_SECONDS):
+        self.ttl = ttl
+        self.templates = []
+        self.loaded_at = 0.0
+        self._by_field = {column: {} for column in INDEX_FIELDS.values()}
+        self._resolved = {}
+        self.embeddings = None
+
+    def __len__(self):
+        return len(self.templates)
+
+    @property
+    def is_stale(self):
+        return time.monotonic() - self.loaded_at > self.ttl
+
+    async def load(self, supabase):
+        """Pull every row of hook_templates and rebuild the index."""
+        rows = []
+        start = 0
+        while True:
+            res = await run_db(
+                supabase.table("hook_templates")
+                .select("*")
+                .range(start, start + PAGE_SIZE - 1)
+            )
+            rows.extend(res.data or [])
+            if not res.data or len(res.data) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+        self._apply(await run_blocking(self._prepare, rows))
+        return len(rows)
+
+    def build(self, rows):
+        """Rebuild from `rows` in the calling thread (offline builds, benchmarks)."""
+        self._apply(self._prepare(rows))
+
+    def _prepare(self, rows):
+        """The slow part of a rebuild. Touches nothing readers use, so it can run on any thread."""
+        by_field = {column: {} for column in INDEX_FIELDS.values()}
+        templates = [row for row in rows if row.get("hook_text")]
+        for i, row in enumerate(templates):
+            for column, buckets in by_field.items():
+                for value in _split_values(row.get(column)):
+                    buckets.setdefault(value, []).append(i)
+        try:
+            embeddings = embedding_index.prepare(templates)
+        except Exception as e:
+            log.warning("Embedding index sync failed (falling back to random examples)", extra={"error": str(e)})
+            embeddings = None
+        return templates, by_field, embeddings, search_index.prepare(templates)
+
+    def _apply(self, prepared):
+        # Swap everything at once so readers never see a half-built index
+        templates, by_field, embeddings, search = prepared
+        if embeddings is not None:
+            embedding_index.apply(embeddings)
+        self.embeddings = embedding_index if embeddings is not None else None
+        search_index.apply(search)
+        self.templates, self._by_field, self._resolved = templates, by_field, {}
+        self.loaded_at = time.monotonic()
+
+    def lookup(self, column, term):
+        """Row ids whose `column` contains `term` (same semantics as ILIKE %term%)."""
+        term = (term or "").strip().lower()
+        if not term:
+            return None
+        cache_key = (column, term)
+        ids = self._resolved.get(cache_key)
+        if ids is None:
+            buckets = self._by_field[column]
+            if term in buckets:
+                ids = frozenset(buckets[term])
+            else:
+                ids = frozenset(i for value, rows in buckets.items() if term in value for i in rows)
+            self._resolved[cache_key] = ids
+        return ids
+
+    def candidates(self, **filters):
+        """
+        Row ids matching the filters, or None if no filter applies.
+        Filters are applied in order and any filter that would leave no
+        candidates is skipped, so a rare niche never empties the result.
+        """
+        candidates = None
+        for name, column in INDEX_FIELDS.items():
+            ids = self.lookup(column, filters.get(name))
+            if ids is None:
+                continue
+            narrowed = ids if candidates is None else candidates & ids
+            if narrowed:
+                candidates = narrowed
+        return candidates
+
+    def sample(self, k=3, **filters):
+        """Return up to `k` random templates matching the filters."""
+        candidates = self.candidates(**filters)
+        if not candidates:
+            return []
+        picked = random.sample(tuple(candidates), min(k, len(candidates)))
+        return [self.templates[i] for i in picked]
+
+    def similar(self, query, k=3, **filters):
+        """
+        The `k` templates matching the filters that are closest to `query`
+        (topic, niche, tone...). Topped up with random matches when the
+        query shares no words with enough of them.
+        """
+        return self.similar_many([(query, filters)], k)[0]
+
+    def similar_many(self, requests, k=3):
+        """`similar` for a list of (query, filters) pairs in one matrix product."""
+        if self.embeddings is None or len(self.embeddings) != len(self.templates):
+            return [self.sample(k, **filters) for _, filters in requests]
+        allowed = [self.candidates(**filters) for _, filters in requests]
+        ranked = self.embeddings.search([query for query, _ in requests], k, allowed)
+        results = []
+        for (_, filters), hits in zip(requests, ranked):
+            picked = [self.templates[row] for row, score in hits if score > 0]
+            if len(picked) < k:
+                seen = {id(t) for t in picked}
+                extra = [t for t in self.sample(k, **filters) if id(t) not in seen]
+                picked.extend(extra[: k - len(picked)])
+            results.append(picked)
+        return results
+
+    async def refresh_forever(self, supabase):
+        """Background task: reload the index every `ttl` seconds."""
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                count = await self.load(supabase)
+                log.info("Template index refreshed", extra={"templates": count})
+            except Exception as e:
+                log.warning("Template index refresh failed (keeping previous)", extra={"error": str(e)})
+
+
+template_index = TemplateIndex()
@@ -0,0 +1,55 @@
+import os
+
+from embeddings import EmbeddingIndex
+
+ROWS = [
+    {"hook_id": "HOOK_001", "hook_text": "Stop doing (insert action)"},
+    {"hook_id": "HOOK_002", "hook_text": "How to (insert result) in 30 days"},
+]
+
+
+def test_save_and_reload(tmp_path):
+    path = str(tmp_path / "emb.json")
+    index = EmbeddingIndex(path, dim=64)
+    assert index.sync(ROWS) == 2
+
+    reloaded = EmbeddingIndex(path, dim=64)
+    assert reloaded.load()
+    assert reloaded.ids == ["HOOK_001", "HOOK_002"]
+    assert reloaded.sync(ROWS) == 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_new_content_gets_a_new_matrix_file(tmp_path):
+    path = str(tmp_path / "emb.json")
+    index = EmbeddingIndex(path, dim=64)
+    index.sync(ROWS)
+    index.sync(ROWS + [{"hook_id": "HOOK_003", "hook_text": "Nobody talks about this"}])
+
+    matrices = sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy"))
+    # The superseded one is kept until it's old enough that no worker can be mid-swap
+    assert len(matrices) == 2
+    reloaded = EmbeddingIndex(path, dim=64)
+    assert reloaded.load() and len(reloaded.ids) == 3
+
+
+def test_search_ranks_and_filters(tmp_path):
+    index = EmbeddingIndex(str(tmp_path / "emb.json"), dim=256)
+    index.sync(ROWS + [{"hook_id": "HOOK_003", "hook_text": "Nobody talks about budgeting apps"}])
+    assert index.matrix.shape == (256, 3)
+
+    best, = index.search(["best budgeting apps"], k=1)
+    assert best[0][0] == 2
+    # Outside the allowed rows it can't be returned, however well it scores
+    filtered, = index.search(["best budgeting apps"], k=3, allowed=[{0, 1}])
+    assert {row for row, _ in filtered} == {0, 1}
+    assert index.search(["anything"], k=3, allowed=[set()]) == [[]]
+
+
+def test_prepare_leaves_the_live_index_alone_until_applied(tmp_path):
+    index = EmbeddingIndex(str(tmp_path / "emb.json"), dim=64)
+    index.sync(ROWS)
+    state = index.prepare(ROWS + [{"hook_id": "HOOK_003", "hook_text": "Nobody talks about this"}])
+    assert len(index) == 2 and index.matrix.shape == (64, 2)
+    index.apply(state)
+    assert len(index) == 3 and index.last_embedded == 1
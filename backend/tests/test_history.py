@@ -0,0 +1,52 @@
+import asyncio
+
+from history import HistoryWriter
+
+
+class _Insert:
+    def __init__(self, db, rows):
+        self.db = db
+        self.rows = rows if isinstance(rows, list) else [rows]
+
+    def execute(self):
+        self.db.inserts += 1
+        if any(row["user_id"] not in self.db.users for row in self.rows):
+            raise Exception('insert or update on table "generations" violates foreign key constraint')
+        self.db.generations.extend(self.rows)
+
+
+class ForeignKeyDB:
+    """Just enough of a supabase client for `generations` inserts, with the users FK."""
+
+    def __init__(self, users):
+        self.users = set(users)
+        self.generations = []
+        self.inserts = 0
+
+    def table(self, name):
+        assert name == "generations"
+        return self
+
+    def insert(self, rows):
+        return _Insert(self, rows)
+
+
+def flush(db, user_ids):
+    writer = HistoryWriter()
+    writer._supabase = db
+    for user_id in user_ids:
+        writer.record(user_id, "hooks", {}, ["hook"])
+    asyncio.run(writer.stop())
+
+
+def test_batch_is_written_in_one_insert():
+    db = ForeignKeyDB({"a", "b"})
+    flush(db, ["a", "b", "a"])
+    assert db.inserts == 1
+    assert [row["user_id"] for row in db.generations] == ["a", "b", "a"]
+
+
+def test_one_bad_row_only_loses_itself():
+    db = ForeignKeyDB({"a", "b"})
+    flush(db, ["a", "deleted", "b"])
+    assert [row["user_id"] for row in db.generations] == ["a", "b"]
@@ -0,0 +1,18 @@
+import os
+import statistics
+
+from bench.import_profile import DEFERRED, profile_once
+
+# Same budget as the CI example in bench/import_profile.py: median wall time
+# of a cold `import main`, interpreter start-up included
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+def test_cold_import_of_main_stays_within_budget():
+    runs = [profile_once() for _ in range(3)]
+    median_ms = statistics.median(wall for wall, _ in runs) * 1000
+    assert median_ms <= IMPORT_BUDGET_MS, f"import main took {median_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    _, modules = runs[-1]
+    eager = sorted(name for name in modules if any(name == d or name.startswith(d + ".") for d in DEFERRED))
+    assert not eager, f"imported eagerly: {', '.join(eager[:5])}"
@@ -0,0 +1,97 @@
+import os
+import csv
+import random
+
+import pytest
+
+from instant import GOAL_PHRASES, InstantEngine
+
+HOOK_CSV = os.path.join(os.path.dirname(__file__), "..", "hook.csv")
+
+
+class StubIndex:
+    """templates + lookup with TemplateIndex's ILIKE semantics, no embeddings or search."""
+
+    def __init__(self, templates):
+        self.templates = templates
+
+    def lookup(self, column, term):
+        term = (term or "").strip().lower()
+        if not term:
+            return None
+        return {i for i, row in enumerate(self.templates) if term in str(row.get(column) or "").lower()}
+
+
+def fill(text, topic="weight loss", goal="Get Followers", niche="Fitness & Health", tone="Bold"):
+    return InstantEngine(StubIndex([])).fill(text, topic, goal, niche, tone, random.Random(0))
+
+
+def test_fill_uses_the_part_of_speech_each_slot_needs():
+    assert fill("How to (insert result) without (insert pain point)") == (
+        "How to grow to 10k followers without posting to zero views"
+    )
+    assert fill("I got (insert dream result) by doing this").startswith("I got 10k followers ")
+    assert fill("From (insert before state) to (insert after state)") == "From posting to zero views to 10k followers"
+    assert fill("Don't (insert action) until you see this") == "Don't post every day until you see this"
+
+
+@pytest.mark.parametrize("template", [
+    "If you're really a (insert result)",
+    "Are you still (insert action) (insert noun) like this?",
+    "Does (insert person) (insert action) like this?",
+    "I've (insert verb) over # of (insert noun)",
+    "This (insert noun) and this (insert noun)",
+    "I am not a DIY guy/girl but (insert noun) is fun",
+    "Is (insert mind blowing fact) true?",
+])
+def test_templates_that_cannot_read_right_are_skipped(template):
+    assert fill(template) is None
+
+
+def test_plural_topic_is_not_used_where_one_thing_is_expected():
+    assert fill("This (insert noun) changed everything") == "This weight loss changed everything"
+    assert fill("This (insert noun) changed everything", topic="budgeting apps") is None
+    assert fill("3 levels of (insert noun)", topic="budgeting apps") == "3 levels of budgeting apps"
+
+
+def test_articles_follow_the_filler():
+    assert fill("Day in the life of a (insert adjective) person") == "Day in the life of an unstoppable person"
+    assert fill("Advice from an (insert title)", niche="Business & Finance") == "Advice from a business owner"
+    # The template's own articles are left alone
+    assert fill("An honest look at X days of (insert noun)").startswith("An honest look at ")
+
+
+def test_rank_puts_matching_templates_first():
+    rows = [
+        {"hook_text": "Plain hook", "psychology_triggers": "Authority", "niche_categories": "Business"},
+        {"hook_text": "Curious hook", "psychology_triggers": "Curiosity", "niche_categories": "Health/Fitness"},
+        {"hook_text": "Other hook", "psychology_triggers": "Curiosity", "niche_categories": "Business"},
+    ]
+    engine = InstantEngine(StubIndex(rows))
+    assert engine.rank("Curiosity Gap", "Fitness & Health", "bold", rng=random.Random(0))[0] == 1
+
+
+@pytest.fixture(scope="module")
+def csv_engine():
+    with open(HOOK_CSV, encoding="utf-8", errors="replace") as f:
+        rows = [{key.lower(): value for key, value in row.items()} for row in csv.DictReader(f)]
+    return InstantEngine(StubIndex(rows))
+
+
+@pytest.mark.parametrize("topic,goal,niche,tone", [
+    ("weight loss", "Get Followers", "Fitness & Health", "Bold"),
+    ("budgeting apps", "Sell Product", "Business & Finance", "Calm"),
+    ("cold email", "Generate Leads", "Marketing & Sales", "Witty"),
+    ("sourdough", "Viral Reach", "Lifestyle & Travel", "Storytelling"),
+])
+def test_generate_from_the_shipped_templates(csv_engine, topic, goal, niche, tone):
+    hooks = csv_engine.generate(topic, tone, niche, goal, "TikTok", "Curiosity Gap")
+    assert len(hooks) == 10
+    assert hooks == csv_engine.generate(topic, tone, niche, goal, "TikTok", "Curiosity Gap")
+    verb_phrases = [phrase for phrases in GOAL_PHRASES.values() for phrase in phrases[:2]] + ["get real results"]
+    for hook in hooks:
+        text = hook["hook"]
+        assert hook["source"] == "instant"
+        assert "insert" not in text.lower() and "(" not in text and "/" not in text
+        for phrase in verb_phrases:
+            assert f"a {phrase}" not in text and f"still {phrase}" not in text
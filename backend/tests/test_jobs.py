@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import jobs
+import main
+from auth import verify_token
+from jobs import JobQueue, JobStore
+
+
+def test_store_error_does_not_kill_the_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_POLL_SECONDS", 0.01)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, concurrency=1)
+    finish = store.finish
+    calls = []
+
+    def flaky_finish(job_id, status, **kwargs):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return finish(job_id, status, **kwargs)
+
+    monkeypatch.setattr(store, "finish", flaky_finish)
+
+    async def handler(job):
+        return ["hook"]
+
+    queue.register("hooks", handler)
+
+    async def go():
+        queue.start()
+        first = await queue.submit("u", "hooks", {})
+        second = await queue.submit("u", "hooks", {})
+        job = await queue.wait_until_finished(second, 5)
+        await queue.stop()
+        return first, job
+
+    first, job = asyncio.run(go())
+    # The single worker survived the failed write and went on to the next job
+    assert job["status"] == "done"
+    assert calls[0] == first
+    assert store.get(first)["status"] == "running"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    main.app.dependency_overrides[verify_token] = lambda: {"sub": "u"}
+    monkeypatch.setattr(main.job_queue, "get", _queued)
+    monkeypatch.setattr(main.job_queue, "wait_until_finished", _purged)
+    monkeypatch.setattr(main.job_queue, "wait_for_change", _purged)
+    yield TestClient(main.app)
+    main.app.dependency_overrides.pop(verify_token, None)
+
+
+async def _queued(job_id):
+    return {"id": job_id, "user_id": "u", "status": "queued", "attempts": 0, "error": None}
+
+
+async def _purged(job_id, *args):
+    return None
+
+
+def test_job_purged_during_long_poll_is_404(client):
+    response = client.get("/api/hooks/jobs/abc", params={"wait": 1})
+    assert response.status_code == 404
+
+
+def test_job_purged_during_sse_ends_with_error_event(client):
+    response = client.get("/api/hooks/jobs/abc/events")
+    assert response.status_code == 200
+    assert "event: status" in response.text
+    assert response.text.rstrip().splitlines()[-2:] == ["event: error", 'data: {"detail": "Job not found"}']
@@ -0,0 +1,129 @@
+import time
+import types
+import asyncio
+
+import pytest
+
+import llm
+from concurrency import llm_slots
+from llm import LLMClient, LLMError
+from bench.fakes import Faults, FakeModel, FakeServiceError
+
+
+class ScriptedModel(FakeModel):
+    """FakeModel whose n-th call fails or sleeps as scripted, then behaves normally."""
+
+    def __init__(self, script=(), **kwargs):
+        super().__init__(**kwargs)
+        self.script = list(script)
+        self.started = 0
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        step = self.script[self.started] if self.started < len(self.script) else None
+        self.started += 1
+        if step == "fail":
+            self.calls += 1
+            raise FakeServiceError("503 model overloaded")
+        if isinstance(step, (int, float)):
+            await asyncio.sleep(step)
+        return await super().generate_content_async(prompt, stream=stream, **kwargs)
+
+
+class StallingModel(FakeModel):
+    """Streams one chunk, then goes quiet."""
+
+    async def generate_content_async(self, prompt, stream=False, **_):
+        self.calls += 1
+
+        async def chunks():
+            yield types.SimpleNamespace(text="[")
+            await asyncio.sleep(60)
+        return chunks()
+
+
+def client(*models, **kwargs):
+    kwargs.setdefault("hedge", False)
+    kwargs.setdefault("timeout", 1)
+    return LLMClient(models, **kwargs)
+
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+
+def test_retryable_error_is_retried_on_the_same_model(monkeypatch):
+    monkeypatch.setattr(LLMClient, "_backoff", lambda self, attempt: 0)
+    model = ScriptedModel(["fail"])
+    c = client(model)
+    assert asyncio.run(c.generate("p")).text.startswith("```json")
+    assert (model.calls, c.retries, c.fallbacks) == (2, 1, 0)
+
+
+def test_fallback_is_counted_once_per_model(monkeypatch):
+    monkeypatch.setattr(LLMClient, "_backoff", lambda self, attempt: 0)
+    first = FakeModel(Faults(error_rate=1, seed=0))
+    second = FakeModel()
+    c = client(first, second, max_retries=2)
+    asyncio.run(c.generate("p"))
+    assert (first.calls, second.calls) == (3, 1)
+    assert (c.retries, c.fallbacks) == (2, 1)
+
+    failing = client(FakeModel(Faults(error_rate=1, seed=0)), FakeModel(Faults(error_rate=1, seed=0)), max_retries=1)
+    with pytest.raises(LLMError):
+        asyncio.run(failing.generate("p"))
+    assert failing.fallbacks == 1
+
+
+def test_deadline_bounds_generate():
+    c = client(FakeModel(Faults(latency_ms=5000)), FakeModel(Faults(latency_ms=5000)), timeout=0.2, deadline=0.3)
+    started = time.monotonic()
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(c.generate("p"))
+    assert raised.value.timeout
+    assert time.monotonic() - started < 1
+
+
+def test_slow_call_is_hedged(monkeypatch):
+    monkeypatch.setattr(llm, "HEDGE_MIN_DELAY_SECONDS", 0.05)
+    model = ScriptedModel([2])
+    c = client(model, hedge=True, timeout=5)
+    for _ in range(llm.HEDGE_MIN_SAMPLES):
+        c.latency.add(0.01)
+    started = time.monotonic()
+    asyncio.run(c.generate("p"))
+    assert time.monotonic() - started < 1
+    assert (model.started, c.hedges) == (2, 1)
+
+
+def test_stream_falls_back_until_it_opens():
+    c = client(FakeModel(Faults(error_rate=1, seed=0)), FakeModel(chunk_size=16))
+    assert asyncio.run(collect(c.stream("p"))).startswith("```json")
+    assert c.fallbacks == 1
+
+
+def test_stalled_stream_times_out_and_frees_its_slot():
+    c = client(StallingModel(), chunk_timeout=0.1)
+    free = llm_slots._value
+    started = time.monotonic()
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(collect(c.stream("p")))
+    assert raised.value.timeout
+    assert time.monotonic() - started < 1
+    assert llm_slots._value == free
+
+
+def test_stream_deadline_covers_the_whole_stream():
+    # Each chunk arrives well inside chunk_timeout, but the stream as a whole is too slow
+    class Trickle(FakeModel):
+        async def generate_content_async(self, prompt, stream=False, **_):
+            async def chunks():
+                for _ in range(100):
+                    await asyncio.sleep(0.05)
+                    yield types.SimpleNamespace(text="x")
+            return chunks()
+
+    c = client(Trickle(), chunk_timeout=1, deadline=0.3)
+    started = time.monotonic()
+    with pytest.raises(LLMError):
+        asyncio.run(collect(c.stream("p")))
+    assert time.monotonic() - started < 1
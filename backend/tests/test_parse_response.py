@@ -0,0 +1,40 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from metrics import PARSE_FAILURES
+from parsing import HookItem, CaptionItem
+
+
+class Blocked:
+    """A Gemini reply with no parts: .text raises like the SDK does."""
+
+    @property
+    def text(self):
+        raise ValueError("The `response.text` quick accessor only works when the response contains a valid `Part`")
+
+
+class Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+def failures(schema):
+    return PARSE_FAILURES._values.get((schema,), 0)
+
+
+@pytest.mark.parametrize("item, schema", [(HookItem, "hooks"), (CaptionItem, "captions")])
+def test_blocked_reply_is_a_parse_failure(item, schema):
+    before = failures(schema)
+    with pytest.raises(HTTPException) as raised:
+        main.parse_response(Blocked(), item, schema)
+    assert raised.value.status_code == 500
+    assert raised.value.detail == "Failed to parse AI response"
+    assert failures(schema) == before + 1
+
+
+def test_reply_parses():
+    reply = Reply(json.dumps([{"hook": "h", "caption": "c", "strategy_leak": "s"}]))
+    assert main.parse_response(reply, HookItem, "hooks")[0]["hook"] == "h"
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import pytest
+
+from paypal import PayPalClient, PayPalError, TOKEN_EXPIRY_MARGIN
+
+
+class StubPayPal:
+    """Local stand-in for the PayPal API, driven through the injectable transport."""
+
+    def __init__(self, expires_in=3600, status="COMPLETED", delay=0.0):
+        self.expires_in = expires_in
+        self.status = status
+        self.delay = delay
+        self.token_requests = 0
+        self.order_requests = 0
+
+    async def __call__(self, request):
+        if request.url.path == "/v1/oauth2/token":
+            self.token_requests += 1
+            return httpx.Response(200, json={"access_token": f"t{self.token_requests}", "expires_in": self.expires_in})
+        if request.url.path.startswith("/v2/checkout/orders/"):
+            self.order_requests += 1
+            await asyncio.sleep(self.delay)
+            return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1], "status": self.status})
+        return httpx.Response(404)
+
+    def client(self):
+        return PayPalClient("http://paypal.test", "id", "secret", transport=httpx.MockTransport(self))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_token_reused_until_expiry():
+    stub = StubPayPal(expires_in=3600)
+
+    async def go():
+        client = stub.client()
+        await client.verify_order("A", "u1")
+        await client.verify_order("B", "u1")
+        await client.aclose()
+
+    run(go())
+    assert stub.token_requests == 1
+    assert stub.order_requests == 2
+
+
+def test_token_refreshed_once_expired():
+    # Expires within the safety margin, so every call needs a new one
+    stub = StubPayPal(expires_in=TOKEN_EXPIRY_MARGIN)
+
+    async def go():
+        client = stub.client()
+        await client.verify_order("A", "u1")
+        await client.verify_order("B", "u1")
+        await client.aclose()
+
+    run(go())
+    assert stub.token_requests == 2
+
+
+def test_concurrent_and_repeat_verifications_share_one_lookup():
+    stub = StubPayPal(delay=0.05)
+
+    async def go():
+        client = stub.client()
+        results = await asyncio.gather(*(client.verify_order("A", "u1") for _ in range(5)))
+        assert await client.verify_order("A", "u1")
+        await client.aclose()
+        return results
+
+    assert run(go()) == [True] * 5
+    assert stub.order_requests == 1
+
+
+def test_cancelled_first_caller_does_not_strand_the_others():
+    stub = StubPayPal(delay=0.05)
+
+    async def go():
+        client = stub.client()
+        first = asyncio.create_task(client.verify_order("A", "u1"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(client.verify_order("A", "u1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await asyncio.wait_for(second, 1)
+        await client.aclose()
+        return result
+
+    assert run(go()) is True
+    assert stub.order_requests == 1
+
+
+def test_order_redeemed_by_another_user_is_409():
+    stub = StubPayPal()
+
+    async def go():
+        client = stub.client()
+        await client.verify_order("A", "u1")
+        with pytest.raises(PayPalError) as raised:
+            await client.verify_order("A", "u2")
+        await client.aclose()
+        return raised.value
+
+    assert run(go()).status_code == 409
+
+
+def test_unpaid_order_is_rejected():
+    stub = StubPayPal(status="CREATED")
+
+    async def go():
+        client = stub.client()
+        with pytest.raises(PayPalError) as raised:
+            await client.verify_order("A", "u1")
+        await client.aclose()
+        return raised.value
+
+    assert run(go()).status_code == 400
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from ratelimit import RateLimiter, MemoryBucketStore, SQLiteBucketStore
+
+LIMITS = {"free": (5, 1.0), "pro": (20, 1.0)}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    store = MemoryBucketStore() if request.param == "memory" else SQLiteBucketStore(str(tmp_path / "rl.sqlite3"))
+    return RateLimiter(store, plan_limits=LIMITS, global_limit=(100, 10.0))
+
+
+def test_cost_within_capacity(limiter):
+    assert asyncio.run(limiter.check("u", "pro", 15)) == 0
+    # 5 tokens left: another 15 has to wait for 10 to refill
+    assert asyncio.run(limiter.check("u", "pro", 15)) == pytest.approx(10, abs=0.5)
+
+
+def test_cost_above_capacity_is_refused_without_spending(limiter):
+    # A 25-item batch doesn't fit a 20-token bucket and must not be discounted
+    assert asyncio.run(limiter.check("u", "pro", 25)) == float("inf")
+    assert asyncio.run(limiter.check("u", "pro", 20)) == 0
+    assert asyncio.run(limiter.check("v", "free", 6)) == float("inf")
+    assert limiter.max_cost("free") == 5
+
+
+def test_enforce_rejects_oversized_batch_with_413(limiter, monkeypatch):
+    import ratelimit
+    monkeypatch.setattr(ratelimit, "known_plan", lambda user_id: "pro")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(limiter.enforce("u", cost=50))
+    assert raised.value.status_code == 413
+    # Nothing was spent: a full-bucket request still goes through
+    asyncio.run(limiter.enforce("u", cost=20))
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(limiter.enforce("u", cost=1))
+    assert raised.value.status_code == 429
+
+
+def test_global_denial_refunds_user_bucket(tmp_path):
+    limiter = RateLimiter(MemoryBucketStore(), plan_limits=LIMITS, global_limit=(25, 0.001))
+    assert asyncio.run(limiter.check("a", "pro", 20)) == 0
+    assert asyncio.run(limiter.check("b", "pro", 20)) > 0
+    assert limiter.denied_global == 1
+    # b's bucket was given back, so it only waits on the global bucket
+    assert limiter.store._buckets["user:b"][0] == pytest.approx(20)
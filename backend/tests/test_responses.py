@@ -0,0 +1,59 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from responses import CompressionMiddleware, FastJSONResponse
+
+PAYLOAD = {"hooks": [f"Hook {i}: the one thing nobody tells you" for i in range(100)]}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    def big():
+        return PAYLOAD
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"event: done\ndata: {}\n\n" * 50]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def raw(client, path, encoding):
+    # httpx would decode the body; ask for the raw bytes instead
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_brotli_when_the_client_accepts_it(client):
+    response, body = raw(client, "/big", "gzip, deflate, br")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-length"] == str(len(body))
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert FastJSONResponse(PAYLOAD).body == brotli.decompress(body)
+
+
+def test_gzip_for_everyone_else(client):
+    response, body = raw(client, "/big", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert FastJSONResponse(PAYLOAD).body == gzip.decompress(body)
+
+
+def test_small_bodies_and_streams_are_sent_as_they_are(client):
+    response, body = raw(client, "/small", "br")
+    assert "content-encoding" not in response.headers
+    assert body == b'{"ok":true}'
+    response, _ = raw(client, "/events", "br")
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,28 @@
+from search import SearchIndex
+
+ROWS = [
+    {"hook_id": "HOOK_002", "hook_text": "Stop doing (insert action)", "category": "EDUCATIONAL", "hook_length": 26},
+    {"hook_id": "HOOK_001", "hook_text": "How to (insert result) fast", "category": "AUTHORITY", "hook_length": 27},
+]
+
+
+def build(rows):
+    index = SearchIndex()
+    index.build(rows)
+    return index
+
+
+def test_digest_depends_on_content_only():
+    # Separate workers / restarts / no-op refreshes agree on the digest
+    assert build(ROWS).digest == build(list(reversed(ROWS))).digest
+    changed = [dict(ROWS[0], hook_text="Stop doing this"), ROWS[1]]
+    assert build(changed).digest != build(ROWS).digest
+
+
+def test_cursor_pages_in_hook_id_order():
+    index = build(ROWS)
+    first = index.search(limit=1)
+    assert [row["hook_id"] for row in first["items"]] == ["HOOK_001"]
+    second = index.search(cursor=first["next_cursor"], limit=1)
+    assert [row["hook_id"] for row in second["items"]] == ["HOOK_002"]
+    assert second["next_cursor"] is None
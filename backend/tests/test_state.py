@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from state import ClientNotReady, Lazy, resolve
+
+
+def recording_factory(built_on):
+    def factory():
+        built_on.append(threading.current_thread())
+        return {"client": True}
+    return factory
+
+
+def test_event_loop_never_builds_a_client():
+    built_on = []
+    client = Lazy("db", recording_factory(built_on))
+
+    async def go():
+        with pytest.raises(ClientNotReady):
+            client.get()
+        # The build it kicked off runs on a worker thread
+        while not client.ready:
+            await asyncio.sleep(0.01)
+        return client.get()
+
+    assert asyncio.run(go()) == {"client": True}
+    assert built_on and built_on[0] is not threading.main_thread()
+
+
+def test_resolve_waits_for_the_client_off_the_loop():
+    built_on = []
+    client = Lazy("db", recording_factory(built_on))
+    assert asyncio.run(resolve(client)) == {"client": True}
+    assert built_on[0] is not threading.main_thread()
+    assert asyncio.run(resolve("stand-in")) == "stand-in"
+
+
+def test_route_touching_an_unready_client_gets_503():
+    client = Lazy("db", lambda: (_ for _ in ()).throw(RuntimeError("SUPABASE_URL / SUPABASE_KEY not set")))
+    app = FastAPI()
+
+    @app.get("/users")
+    async def users():
+        return client.table("users")
+
+    response = TestClient(app).get("/users")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import templates
+from bench.fakes import FakeSupabase
+from embeddings import EmbeddingIndex
+from templates import TemplateIndex
+
+
+def test_load_prepares_off_the_event_loop(tmp_path, monkeypatch):
+    index = EmbeddingIndex(str(tmp_path / "emb.json"), dim=64)
+    monkeypatch.setattr(templates, "embedding_index", index)
+    prepared_on = []
+    prepare = index.prepare
+
+    def recording_prepare(rows):
+        prepared_on.append(threading.current_thread())
+        return prepare(rows)
+
+    monkeypatch.setattr(index, "prepare", recording_prepare)
+    template_index = TemplateIndex()
+    count = asyncio.run(template_index.load(FakeSupabase()))
+
+    assert count == len(template_index) > 0
+    assert prepared_on and prepared_on[0] is not threading.main_thread()
+    assert len(index) == len(template_index)
+    assert len(template_index.similar("weight loss fitness", k=3, psychology="curiosity")) == 3
+
+
+def test_search_index_is_swapped_in_by_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(templates, "embedding_index", EmbeddingIndex(str(tmp_path / "emb.json"), dim=64))
+    search = templates.search_index.__class__()
+    monkeypatch.setattr(templates, "search_index", search)
+    prepare = search.prepare
+    prepared_on = []
+    monkeypatch.setattr(search, "prepare", lambda rows: prepared_on.append(threading.current_thread()) or prepare(rows))
+
+    count = asyncio.run(TemplateIndex().load(FakeSupabase()))
+    assert prepared_on[0] is not threading.main_thread()
+    assert len(search) == count and search.digest
+    assert search.search("money")["total"] > 0
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from webhooks import SeenSet, UserSyncBatcher
+
+EVENT = {"type": "user.updated", "data": {"id": "user_1", "primary_email_address_id": "e1",
+                                          "email_addresses": [{"id": "e1", "email_address": "a@b.co"}]}}
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    monkeypatch.setattr(main, "verify_event", lambda payload, headers, secret: EVENT)
+    monkeypatch.setattr(main, "seen_webhooks", SeenSet())
+    monkeypatch.setattr(main, "user_sync", UserSyncBatcher())
+    client = TestClient(main.app)
+    return lambda svix_id: client.post("/api/webhooks/clerk", content=b"{}", headers={"svix-id": svix_id})
+
+
+def test_redelivery_of_an_accepted_event_is_a_duplicate(webhook, monkeypatch):
+    async def invalidate(user_id, plan=None):
+        pass
+
+    monkeypatch.setattr(main.user_profiles, "invalidate", invalidate)
+    assert webhook("msg_1").json() == {"status": "ok"}
+    assert webhook("msg_1").json() == {"status": "ok", "duplicate": True}
+    assert main.user_sync.stats()["pending"] == 1
+
+
+def test_failed_delivery_is_processed_again_on_retry(webhook, monkeypatch):
+    calls = []
+
+    async def invalidate(user_id, plan=None):
+        calls.append(user_id)
+        if len(calls) == 1:
+            raise ConnectionError("pubsub unavailable")
+
+    monkeypatch.setattr(main.user_profiles, "invalidate", invalidate)
+    assert webhook("msg_1").status_code == 500
+    # svix retries with the same id: processed, not dropped as a duplicate
+    assert webhook("msg_1").json() == {"status": "ok"}
+    assert calls == ["user_1", "user_1"]
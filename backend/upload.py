@@ -1,37 +1,263 @@
-import pandas as pd
+"""
+Stream hook templates from CSV or XLSX into Supabase `hook_templates`.
+
+    python upload.py                       # hook.csv
+    python upload.py hooks.xlsx --concurrency 8
+    python upload.py big.csv --restart     # ignore a previous checkpoint
+
+Rows are read lazily (csv module / openpyxl read-only mode) and upserted
+on hook_id, so reruns never duplicate templates. Several batches are in
+flight at once and the batch size adapts to how fast Supabase answers.
+Progress is checkpointed next to the source file; an interrupted run
+picks up after the last fully uploaded row.
+"""
 import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+
 from dotenv import load_dotenv
 from supabase import create_client
 
 load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
 
-def migrate_data():
-    file_path = "hook.csv"
-    
+from concurrency import run_db  # noqa: E402
+
+TABLE = "hook_templates"
+MIN_BATCH = 50
+MAX_BATCH = 5000
+
+
+def _column(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+
+def _clean(row):
+    """Normalize one source row; None if it has nothing to import."""
+    record = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        record[_column(key)] = None if value == "" else value
+    if not record.get("hook_id") or not record.get("hook_text"):
+        return None
+    if "uses_variables" in record and isinstance(record["uses_variables"], str):
+        record["uses_variables"] = {"yes": True, "no": False}.get(record["uses_variables"].lower())
+    if record.get("hook_length") is not None:
+        try:
+            record["hook_length"] = int(float(record["hook_length"]))
+        except (TypeError, ValueError):
+            record["hook_length"] = None
+    return record
+
+
+def read_csv(path, encoding):
+    with open(path, newline="", encoding=encoding) as f:
+        yield from csv.DictReader(f)
+
+
+def read_xlsx(path, sheet=None):
+    """Rows of the first sheet whose header has Hook_ID (or `sheet`)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
     try:
-        df = pd.read_csv(file_path, encoding='latin1')
-        
-        df.columns = [col.lower().replace(' ', '_') for col in df.columns]
+        for worksheet in workbook.worksheets:
+            if sheet and worksheet.title != sheet:
+                continue
+            rows = worksheet.iter_rows(values_only=True)
+            header = [_column(h) if h is not None else None for h in next(rows, ())]
+            if "hook_id" not in header:
+                continue
+            for values in rows:
+                yield dict(zip(header, values))
+            return
+        raise ValueError(f"No sheet with a Hook_ID column in {path}")
+    finally:
+        workbook.close()
+
+
+def read_rows(path, encoding="latin1", sheet=None):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return read_xlsx(path, sheet)
+    return read_csv(path, encoding)
+
+
+class Checkpoint:
+    """
+    Index of the first row not yet confirmed uploaded. Batches finish out
+    of order, so only the contiguous prefix of finished batches counts.
+    """
+
+    def __init__(self, source):
+        self.path = source + ".checkpoint.json"
+        stat = os.stat(source)
+        self.fingerprint = {"source": os.path.abspath(source), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.committed = 0
+        self._finished = {}
 
-        df = df.dropna(subset=['hook_text'])
-        
-        if 'uses_variables' in df.columns:
-            df['uses_variables'] = df['uses_variables'].map({'Yes': True, 'No': False})
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if saved.get("fingerprint") != self.fingerprint:
+            print("Source file changed since the checkpoint; starting over.")
+            return 0
+        self.committed = saved.get("committed", 0)
+        return self.committed
 
-        data_to_upload = df.to_dict(orient='records')
+    def finished(self, start, end):
+        self._finished[start] = end
+        advanced = False
+        while self.committed in self._finished:
+            self.committed = self._finished.pop(self.committed)
+            advanced = True
+        if advanced:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"fingerprint": self.fingerprint, "committed": self.committed}, f)
+            os.replace(tmp, self.path)
 
-        print(f"🚀 Found {len(data_to_upload)} professional hooks. Starting upload...")
-        
-        for i in range(0, len(data_to_upload), 100):
-            batch = data_to_upload[i:i+100]
-            supabase.table("hook_templates").insert(batch).execute()
-            print(f"Uploaded hooks {i} to {i + len(batch)}")
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
 
-        print("✅ Success! All 437 hooks with Niche and Audience data are live.")
 
+class AdaptiveBatcher:
+    """Grow batches while Supabase answers quickly, shrink when it slows or fails."""
+
+    def __init__(self, size, target_seconds):
+        self.size = size
+        self.target = target_seconds
+
+    def record(self, rows, seconds):
+        if seconds < self.target / 2 and rows >= self.size:
+            self.size = min(MAX_BATCH, int(self.size * 1.5))
+        elif seconds > self.target:
+            self.size = max(MIN_BATCH, self.size // 2)
+
+    def failed(self):
+        self.size = max(MIN_BATCH, self.size // 2)
+
+
+async def upload_batch(supabase, rows, retries):
+    # One statement can't upsert the same hook_id twice
+    unique = list({row["hook_id"]: row for row in rows}.values())
+    for attempt in range(retries + 1):
+        try:
+            await run_db(supabase.table(TABLE).upsert(unique, on_conflict="hook_id"))
+            return
+        except Exception:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+
+async def import_file(supabase, path, concurrency=4, batch_size=500, target_seconds=1.0,
+                      retries=3, encoding="latin1", sheet=None, restart=False):
+    checkpoint = Checkpoint(path)
+    if restart:
+        checkpoint.clear()
+    resume_at = 0 if restart else checkpoint.load()
+    if resume_at:
+        print(f"Resuming after row {resume_at}.")
+
+    sizer = AdaptiveBatcher(batch_size, target_seconds)
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    errors = []
+    uploaded = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    async def run(start, rows):
+        nonlocal uploaded
+        try:
+            batch_started = time.perf_counter()
+            await upload_batch(supabase, rows, retries)
+            sizer.record(len(rows), time.perf_counter() - batch_started)
+            uploaded += len(rows)
+            checkpoint.finished(start, start + len(rows))
+            elapsed = time.perf_counter() - started
+            print(f"  {checkpoint.committed} rows done, {uploaded / elapsed:,.0f} rows/s (batch size {sizer.size})")
+        except Exception as e:
+            sizer.failed()
+            errors.append(e)
+        finally:
+            slots.release()
+
+    batch, batch_start = [], resume_at
+    for index, raw in enumerate(read_rows(path, encoding, sheet)):
+        if index < resume_at:
+            continue
+        if errors:
+            break
+        record = _clean(raw)
+        if record is None:
+            skipped += 1
+        else:
+            batch.append(record)
+        if len(batch) >= sizer.size:
+            await slots.acquire()
+            pending.add(asyncio.create_task(run(batch_start, batch)))
+            # Row indices, not record counts, so skipped rows stay covered
+            batch, batch_start = [], index + 1
+            pending = {t for t in pending if not t.done()}
+
+    if batch and not errors:
+        await slots.acquire()
+        pending.add(asyncio.create_task(run(batch_start, batch)))
+    await asyncio.gather(*pending)
+
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"Import stopped after {checkpoint.committed} rows: {errors[0]}") from errors[0]
+    checkpoint.clear()
+    return uploaded, skipped, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert hook templates into Supabase")
+    parser.add_argument("source", nargs="?", default="hook.csv", help="CSV or XLSX file")
+    parser.add_argument("--sheet", help="XLSX sheet name (default: first with a Hook_ID column)")
+    parser.add_argument("--encoding", default="latin1", help="CSV encoding")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight")
+    parser.add_argument("--batch-size", type=int, default=500, help="starting batch size")
+    parser.add_argument("--target-ms", type=int, default=1000, help="batch latency the sizer aims for")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint")
+    args = parser.parse_args()
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    print(f"Importing {args.source} into {TABLE}...")
+    try:
+        uploaded, skipped, elapsed = asyncio.run(import_file(
+            supabase, args.source,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            target_seconds=args.target_ms / 1000,
+            retries=args.retries,
+            encoding=args.encoding,
+            sheet=args.sheet,
+            restart=args.restart,
+        ))
     except Exception as e:
-        print(f"❌ Error during migration: {e}")
+        print(f"Error during import: {e}")
+        print("Rerun the same command to resume from the checkpoint.")
+        raise SystemExit(1)
+
+    print(f"Done: {uploaded} hooks upserted ({skipped} skipped) in {elapsed:.1f}s, "
+          f"{uploaded / elapsed if elapsed else 0:,.0f} rows/s.")
+    print("POST /api/admin/templates/refresh to load them without waiting for the TTL.")
+
 
 if __name__ == "__main__":
-    migrate_data()
+    main()
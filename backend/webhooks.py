@@ -0,0 +1,159 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict
+
+from concurrency import run_db
+from logs import get_logger
+from metrics import registry
+
+# -------------------------------------------------------------------
+#  CLERK WEBHOOK INGESTION
+#  The endpoint verifies the signature, drops svix-ids it has already
+#  seen and acks right away (a delivery that fails before it's queued
+#  gets a 500 and its svix-id is forgotten, so svix's retry goes through). UserSyncBatcher keeps the latest email per
+#  user_id and writes them to `users` in one multi-row upsert every
+#  WEBHOOK_FLUSH_MS or WEBHOOK_BATCH_SIZE users, so a redelivery storm
+#  costs a handful of DB round trips instead of one per event.
+# -------------------------------------------------------------------
+
+log = get_logger("webhooks")
+
+WEBHOOK_SEEN_SIZE = int(os.getenv("WEBHOOK_SEEN_SIZE", "100000"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+WEBHOOK_FLUSH_MS = int(os.getenv("WEBHOOK_FLUSH_MS", "250"))
+
+WEBHOOK_EVENTS = registry.counter(
+    "hookflow_webhook_events_total", "Clerk webhook deliveries by outcome", ("outcome",)
+)
+
+_verifiers = {}
+
+
+class WebhookRejected(Exception):
+    """Bad or unsigned delivery; `status_code` goes back to Clerk."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def verify_event(payload, headers, secret):
+    """Check the svix signature and return the decoded event."""
+    if not headers.get("svix-id") or not headers.get("svix-timestamp") or not headers.get("svix-signature"):
+        raise WebhookRejected("Missing svix headers")
+    if not secret:
+        raise WebhookRejected("Webhook secret not configured", status_code=500)
+
+    # svix is slow to import; the warm-up in state.py usually loads it first
+    from svix.webhooks import Webhook, WebhookVerificationError
+
+    verifier = _verifiers.get(secret)
+    if verifier is None:
+        verifier = _verifiers[secret] = Webhook(secret)
+    try:
+        verifier.verify(payload, headers)
+    except WebhookVerificationError:
+        raise WebhookRejected("Invalid signature")
+    except Exception as e:
+        raise WebhookRejected(f"Verification failed: {e}")
+    # Newer svix versions return None from verify(), so decode ourselves
+    return json.loads(payload)
+
+
+def user_row(data):
+    """users row (id + primary email) from a user.created/updated payload."""
+    email_addresses = data.get("email_addresses") or []
+    primary_email_id = data.get("primary_email_address_id")
+    email = next(
+        (e.get("email_address") for e in email_addresses if e.get("id") == primary_email_id), ""
+    )
+    # Fallback if primary id search fails but list exists
+    if not email and email_addresses:
+        email = email_addresses[0].get("email_address")
+    return {"user_id": data.get("id"), "email": email or ""}
+
+
+class SeenSet:
+    """Bounded LRU of svix-ids already accepted."""
+
+    def __init__(self, maxsize=WEBHOOK_SEEN_SIZE):
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+
+    def add(self, key):
+        """True if `key` is new (and remember it), False for a duplicate."""
+        if key in self._ids:
+            self._ids.move_to_end(key)
+            return False
+        self._ids[key] = None
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+        return True
+
+    def discard(self, key):
+        """Forget `key` (its delivery failed), so a retry counts as new."""
+        self._ids.pop(key, None)
+
+
+class UserSyncBatcher:
+    def __init__(self, batch_size=WEBHOOK_BATCH_SIZE, flush_ms=WEBHOOK_FLUSH_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        # user_id -> latest row; later events for a user replace earlier ones
+        self._pending = {}
+        self._full = asyncio.Event()
+        self._task = None
+        self._supabase = None
+        self.flushed_rows = 0
+        self.coalesced = 0
+
+    def record(self, row):
+        if not row.get("user_id"):
+            return
+        if row["user_id"] in self._pending:
+            self.coalesced += 1
+        self._pending[row["user_id"]] = row
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    def start(self, supabase):
+        self._supabase = supabase
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        try:
+            await run_db(self._supabase.table("users").upsert(rows, on_conflict="user_id"))
+            self.flushed_rows += len(rows)
+            log.info("Synced users to Supabase", extra={"rows": len(rows)})
+        except Exception as e:
+            # Already acked to Clerk, so keep the rows for the next flush
+            # (unless a newer event for the same user arrived meanwhile)
+            for row in rows:
+                self._pending.setdefault(row["user_id"], row)
+            log.error("Failed to sync users to DB (will retry)", extra={"rows": len(rows), "error": str(e)})
+
+    def stats(self):
+        return {"pending": len(self._pending), "flushed_rows": self.flushed_rows, "coalesced": self.coalesced}
+
+
+seen_webhooks = SeenSet()
+user_sync = UserSyncBatcher()
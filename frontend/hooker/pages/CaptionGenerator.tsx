@@ -5,7 +5,7 @@ import { Button } from '../components/Button';
 import { LoadingTracker } from '../components/LoadingTracker';
 import { PLATFORMS, TONES } from '../constants';
 import { Platform, Tone, GeneratedCaption } from '../types';
-import { generateCaptions } from '../services/geminiService';
+import { streamCaptions } from '../services/geminiService';
 
 export const CaptionGenerator: React.FC = () => {
   const [loading, setLoading] = useState(false);
@@ -31,6 +31,7 @@ export const CaptionGenerator: React.FC = () => {
   const handleGenerate = async () => {
     if (!topic.trim()) return;
     setLoading(true);
+    setResults([]);
     try {
       const token = await getToken();
       if (!token) {
@@ -39,8 +40,8 @@ export const CaptionGenerator: React.FC = () => {
         return;
       }
 
-      const captions = await generateCaptions({ platform, topic, tone, token });
-      setResults(captions);
+      // Captions are rendered one by one as the backend streams them
+      await streamCaptions({ platform, topic, tone, token }, (caption) => setResults(prev => [...prev, caption]));
     } catch (error: any) {
       console.error(error);
       if (error.message === "INSUFFICIENT_CREDITS") {
@@ -164,18 +165,18 @@ export const CaptionGenerator: React.FC = () => {
           </div>
         )}
 
-        {loading && (
+        {loading && !results.length && (
           <div className="flex h-full items-center justify-center animate-in fade-in duration-300">
             <LoadingTracker />
           </div>
         )}
 
-        {results.length > 0 && !loading && (
+        {results.length > 0 && (
           <div className="space-y-10 max-w-4xl mx-auto animate-in slide-in-from-bottom-8 duration-700">
             <div className="flex items-center justify-between border-b border-slate-200 dark:border-white/5 pb-8">
               <div>
                 <h3 className="text-3xl font-black text-slate-900 dark:text-white tracking-tight">Generated Captions</h3>
-                <p className="text-slate-500 dark:text-neutral-500 font-medium">5 variations generated for "{topic.substring(0, 30)}..."</p>
+                <p className="text-slate-500 dark:text-neutral-500 font-medium">{results.length} variations {loading ? 'generating' : 'generated'} for "{topic.substring(0, 30)}..."</p>
               </div>
             </div>
 
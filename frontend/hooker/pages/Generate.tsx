@@ -7,7 +7,7 @@ import { HookCard } from '../components/HookCard';
 import { LoadingTracker } from '../components/LoadingTracker';
 import { PLATFORMS, NICHES, PSYCHOLOGIES, TONES, GOALS } from '../constants';
 import { Platform, HookPsychology, Tone, GeneratedHook, HookGoal } from '../types';
-import { generateHooks, getUserDashboard } from '../services/geminiService';
+import { streamHooks, getUserDashboard } from '../services/geminiService';
 import { jsPDF } from "jspdf";
 import { PRO_PSYCHOLOGIES } from '../constants';
 
@@ -57,6 +57,7 @@ export const Generate: React.FC = () => {
   const handleGenerate = async () => {
     if (!topic.trim()) return;
     setLoading(true);
+    setResults([]);
     try {
       const token = await getToken();
       if (!token) {
@@ -65,7 +66,8 @@ export const Generate: React.FC = () => {
         return;
       }
 
-      const hooks = await generateHooks({
+      // Hooks are rendered one by one as the backend streams them
+      await streamHooks({
         platform,
         niche,
         psychology,
@@ -73,8 +75,7 @@ export const Generate: React.FC = () => {
         topic,
         goal,
         token
-      });
-      setResults(hooks);
+      }, (hook) => setResults(prev => [...prev, hook]));
     } catch (error: any) {
       console.error("Failed to generate hooks:", error);
       if (error.message === "INSUFFICIENT_CREDITS") {
@@ -315,18 +316,18 @@ export const Generate: React.FC = () => {
           </div>
         )}
 
-        {loading && (
+        {loading && !results.length && (
           <div className="flex h-full items-center justify-center animate-in fade-in duration-300">
             <LoadingTracker />
           </div>
         )}
 
-        {results.length > 0 && !loading && (
+        {results.length > 0 && (
           <div className="space-y-10 max-w-6xl mx-auto animate-in slide-in-from-bottom-8 duration-700">
             <div className="flex items-center justify-between border-b border-slate-200 dark:border-white/5 pb-8">
               <div>
                 <h3 className="text-3xl font-black text-slate-900 dark:text-white tracking-tight">Success Engine</h3>
-                <p className="text-slate-500 dark:text-neutral-500 font-medium">10 variations generated for "{topic.substring(0, 30)}..."</p>
+                <p className="text-slate-500 dark:text-neutral-500 font-medium">{results.length} variations {loading ? 'generating' : 'generated'} for "{topic.substring(0, 30)}..."</p>
               </div>
               <div className="flex space-x-3">
                 <Button
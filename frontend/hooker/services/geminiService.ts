@@ -46,7 +46,12 @@ export async function generateHooks(params: {
     throw new Error("Invalid response format from AI service");
   }
 
-  return rawResults.map((item: any, index: number) => ({
+  return rawResults.map((item: any, index: number) => toGeneratedHook(item, index, params));
+}
+
+function toGeneratedHook(item: any, index: number, params: { platform: Platform; psychology: HookPsychology; tone: Tone; goal: HookGoal }): GeneratedHook {
+  const { platform, psychology, tone, goal } = params;
+  return {
     id: `${Date.now()}-${index}`,
     text: item.hook || item.text || item.content || item.hook_text || "",
     caption: item.caption || "",
@@ -55,7 +60,93 @@ export async function generateHooks(params: {
     tone: tone,
     goal: goal,
     explanation: item.strategy_leak || item.explanation || item.analysis || item.strategy || "No analysis provided."
-  }));
+  } as GeneratedHook;
+}
+
+function toGeneratedCaption(item: any, params: { platform: Platform; tone: Tone }): GeneratedCaption {
+  return {
+    text: item.text || item.caption || item.content || "",
+    hashtags: Array.isArray(item.hashtags) ? item.hashtags : [],
+    tone: params.tone,
+    platform: params.platform
+  } as GeneratedCaption;
+}
+
+/**
+ * Reads a Server-Sent Events response from the backend and calls `onItem`
+ * for every "item" event. EventSource can't send the Authorization header,
+ * so the stream is read from fetch directly.
+ */
+async function readEventStream(url: string, token: string, onItem: (item: any) => void): Promise<void> {
+  const response = await fetch(url, {
+    method: 'GET',
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Accept': 'text/event-stream',
+    },
+  });
+
+  if (!response.ok || !response.body) {
+    const errData = await response.json().catch(() => ({}));
+    if (response.status === 402) {
+      throw new Error("INSUFFICIENT_CREDITS");
+    }
+    throw new Error(errData.detail || errData.error || response.statusText || 'Failed to reach backend');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'item') onItem(payload);
+      else if (event === 'error') throw new Error(payload.detail || 'AI Generation failed');
+      else if (event === 'done') return;
+    }
+  }
+}
+
+/**
+ * Streaming version of generateHooks: `onHook` fires for each hook as soon
+ * as the backend emits it. Resolves with the full list.
+ */
+export async function streamHooks(params: {
+  platform: Platform;
+  niche: string;
+  psychology: HookPsychology;
+  tone: Tone;
+  topic: string;
+  goal: HookGoal;
+  token: string;
+}, onHook: (hook: GeneratedHook) => void): Promise<GeneratedHook[]> {
+  const { platform, niche, psychology, tone, topic, goal, token } = params;
+  const queryParams = new URLSearchParams({ topic, tone, niche, goal, platform, psychology });
+  const hooks: GeneratedHook[] = [];
+
+  await readEventStream(`${API_BASE_URL}/api/hooks/generate/stream?${queryParams.toString()}`, token, (item) => {
+    const hook = toGeneratedHook(item, hooks.length, params);
+    hooks.push(hook);
+    onHook(hook);
+  });
+  return hooks;
 }
 
 export async function generateCaptions(params: {
@@ -90,12 +181,25 @@ export async function generateCaptions(params: {
 
   const rawResults = await response.json();
 
-  return rawResults.map((item: any) => ({
-    text: item.text || item.caption || item.content || "",
-    hashtags: Array.isArray(item.hashtags) ? item.hashtags : [],
-    tone: tone,
-    platform: platform
-  }));
+  return rawResults.map((item: any) => toGeneratedCaption(item, params));
+}
+
+export async function streamCaptions(params: {
+  platform: Platform;
+  topic: string;
+  tone: Tone;
+  token: string;
+}, onCaption: (caption: GeneratedCaption) => void): Promise<GeneratedCaption[]> {
+  const { platform, topic, tone, token } = params;
+  const queryParams = new URLSearchParams({ topic, tone, platform });
+  const captions: GeneratedCaption[] = [];
+
+  await readEventStream(`${API_BASE_URL}/api/captions/generate/stream?${queryParams.toString()}`, token, (item) => {
+    const caption = toGeneratedCaption(item, params);
+    captions.push(caption);
+    onCaption(caption);
+  });
+  return captions;
 }
 
 export async function getUserDashboard(token: string): Promise<UserDashboardData> {
@@ -41,6 +41,8 @@ export interface UserDashboardData {
   stats: {
     plan: string;
     credits: number;
+    total_generated?: number;
   };
   history: any[];
+  next_cursor?: string | null;
 }